@@ -1,144 +1,261 @@
-from flask import jsonify
+import json
+import time
+import queue
+import threading
+from flask import jsonify, request, Response, stream_with_context
 from bson.objectid import ObjectId
+from utils.event_bus import event_bus
+from utils.blob_store import get_blob_store
+from utils.evaluation_status import ANALYSIS_FIELDS, get_status
+
+# Blobs are content-addressed, so a reference always points at the same bytes
+BLOB_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+def format_event(event, data, event_id=None):
+    """Format one Server-Sent Events message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
 
 def register_analysis_routes(app):
     """Register routes for different types of analysis"""
     
-    @app.route('/api/seo/<evaluation_id>', methods=['GET'])
-    def get_seo_analysis(evaluation_id):
+    # Each open event stream holds a server thread for up to SSE_MAX_SECONDS;
+    # capping them per process keeps threads free for every other request
+    stream_slots = threading.BoundedSemaphore(app.config['SSE_MAX_STREAMS'])
+    
+    def cached_report_response(entry):
+        """
+        Serve a cached report, answering If-None-Match with 304 and sending
+        the stored gzip body as-is to clients that accept it
+        """
+        if request.if_none_match.contains(entry.etag):
+            response = Response(status=304)
+        elif 'gzip' in request.accept_encodings:
+            response = Response(entry.body_gzip, mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(entry.body(), mimetype='application/json')
+        response.set_etag(entry.etag)
+        response.vary.add('Accept-Encoding')
+        return response
+    
+    def get_single_analysis(evaluation_id, stage, response_key, pending_message):
+        """
+        Return one analysis sub-object, reading the compact progress record
+        first so pending polls never load the evaluation document
+        """
         try:
-            evaluation = app.db.evaluations.find_one({"_id": ObjectId(evaluation_id)})
-            if not evaluation:
+            object_id = ObjectId(evaluation_id)
+            status = get_status(app.db, object_id)
+            if not status:
                 return jsonify({"error": "Evaluation not found"}), 404
             
             # Check if analysis exists
-            if 'seo_analysis' not in evaluation:
+            if stage not in status.get('stages', {}):
                 return jsonify({
                     "status": "pending",
-                    "message": "SEO analysis is not yet complete"
+                    "message": pending_message
                 }), 202
             
-            return jsonify({
-                "status": "success",
-                "evaluationId": evaluation_id,
-                "seoAnalysis": evaluation['seo_analysis']
-            })
-        except Exception as e:
-            return jsonify({"error": str(e)}), 500
-
-    @app.route('/api/mobile/<evaluation_id>', methods=['GET'])
-    def get_mobile_analysis(evaluation_id):
-        try:
-            evaluation = app.db.evaluations.find_one({"_id": ObjectId(evaluation_id)})
+            field = ANALYSIS_FIELDS[stage]
+            evaluation = app.db.evaluations.find_one({"_id": object_id}, {field: 1})
             if not evaluation:
                 return jsonify({"error": "Evaluation not found"}), 404
             
-            # Check if analysis exists
-            if 'mobile_analysis' not in evaluation:
-                return jsonify({
-                    "status": "pending",
-                    "message": "Mobile friendliness analysis is not yet complete"
-                }), 202
-            
             return jsonify({
                 "status": "success",
                 "evaluationId": evaluation_id,
-                "mobileAnalysis": evaluation['mobile_analysis']
+                response_key: evaluation.get(field)
             })
         except Exception as e:
             return jsonify({"error": str(e)}), 500
+    
+    @app.route('/api/seo/<evaluation_id>', methods=['GET'])
+    def get_seo_analysis(evaluation_id):
+        return get_single_analysis(
+            evaluation_id, 'seo', 'seoAnalysis',
+            "SEO analysis is not yet complete"
+        )
+
+    @app.route('/api/mobile/<evaluation_id>', methods=['GET'])
+    def get_mobile_analysis(evaluation_id):
+        return get_single_analysis(
+            evaluation_id, 'mobile', 'mobileAnalysis',
+            "Mobile friendliness analysis is not yet complete"
+        )
 
     @app.route('/api/performance/<evaluation_id>', methods=['GET'])
     def get_performance_analysis(evaluation_id):
-        try:
-            evaluation = app.db.evaluations.find_one({"_id": ObjectId(evaluation_id)})
-            if not evaluation:
-                return jsonify({"error": "Evaluation not found"}), 404
-            
-            # Check if analysis exists
-            if 'performance_analysis' not in evaluation:
-                return jsonify({
-                    "status": "pending",
-                    "message": "Performance analysis is not yet complete"
-                }), 202
-            
-            return jsonify({
-                "status": "success",
-                "evaluationId": evaluation_id,
-                "performanceAnalysis": evaluation['performance_analysis']
-            })
-        except Exception as e:
-            return jsonify({"error": str(e)}), 500
+        return get_single_analysis(
+            evaluation_id, 'performance', 'performanceAnalysis',
+            "Performance analysis is not yet complete"
+        )
 
     @app.route('/api/accessibility/<evaluation_id>', methods=['GET'])
     def get_accessibility_analysis(evaluation_id):
+        return get_single_analysis(
+            evaluation_id, 'accessibility', 'accessibilityAnalysis',
+            "Accessibility analysis is not yet complete"
+        )
+
+    @app.route('/api/llm-improvements/<evaluation_id>', methods=['GET'])
+    def get_llm_improvements(evaluation_id):
+        return get_single_analysis(
+            evaluation_id, 'llm', 'llmAnalysis',
+            "LLM-based improvement analysis is not yet complete"
+        )
+
+    @app.route('/api/evaluations/<evaluation_id>/status', methods=['GET'])
+    def get_evaluation_status(evaluation_id):
         try:
-            evaluation = app.db.evaluations.find_one({"_id": ObjectId(evaluation_id)})
-            if not evaluation:
+            status = get_status(app.db, ObjectId(evaluation_id))
+            if not status:
                 return jsonify({"error": "Evaluation not found"}), 404
             
-            # Check if analysis exists
-            if 'accessibility_analysis' not in evaluation:
-                return jsonify({
-                    "status": "pending",
-                    "message": "Accessibility analysis is not yet complete"
-                }), 202
-            
             return jsonify({
                 "status": "success",
                 "evaluationId": evaluation_id,
-                "accessibilityAnalysis": evaluation['accessibility_analysis']
+                "evaluationStatus": status.get('status'),
+                "analysisComplete": status.get('analysis_complete', False),
+                "completedStages": list(status.get('stages', {})),
+                "error": status.get('error')
             })
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
-    @app.route('/api/llm-improvements/<evaluation_id>', methods=['GET'])
-    def get_llm_improvements(evaluation_id):
+    @app.route('/api/evaluations/<evaluation_id>/events', methods=['GET'])
+    def stream_evaluation_events(evaluation_id):
+        """
+        Push a Server-Sent Event for every stage as it completes
+
+        The event id is the comma-separated list of stages delivered so far,
+        so a client reconnecting with Last-Event-ID only receives the rest.
+        """
         try:
-            evaluation = app.db.evaluations.find_one({"_id": ObjectId(evaluation_id)})
-            if not evaluation:
-                return jsonify({"error": "Evaluation not found"}), 404
+            object_id = ObjectId(evaluation_id)
+        except Exception as e:
+            return jsonify({"error": str(e)}), 400
+        
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId', '')
+        heartbeat = app.config['SSE_HEARTBEAT_SECONDS']
+        max_duration = app.config['SSE_MAX_SECONDS']
+        
+        if not stream_slots.acquire(blocking=False):
+            # Clients fall back to polling the status endpoint
+            response = jsonify({
+                "error": "Too many open event streams",
+                "statusUrl": f"/api/evaluations/{evaluation_id}/status",
+                "retryAfter": heartbeat
+            })
+            response.status_code = 503
+            response.headers['Retry-After'] = str(heartbeat)
+            return response
+        
+        # Subscribe before reading the status record so no update falls in between
+        subscription = event_bus.subscribe(evaluation_id)
+        status = get_status(app.db, object_id)
+        if not status:
+            event_bus.unsubscribe(evaluation_id, subscription)
+            stream_slots.release()
+            return jsonify({"error": "Evaluation not found"}), 404
+        
+        def generate():
+            sent = [stage for stage in last_event_id.split(',') if stage]
             
-            # Check if analysis exists
-            if 'llm_analysis' not in evaluation:
-                return jsonify({
-                    "status": "pending",
-                    "message": "LLM-based improvement analysis is not yet complete"
-                }), 202
+            def emit(event):
+                messages = []
+                for stage, completed_at in event.get('stages', {}).items():
+                    if stage in sent:
+                        continue
+                    sent.append(stage)
+                    messages.append(format_event('stage', {
+                        "evaluationId": evaluation_id,
+                        "stage": stage,
+                        "completedAt": completed_at
+                    }, ",".join(sent)))
+                if event.get('status') == 'complete':
+                    messages.append(format_event('complete', {
+                        "evaluationId": evaluation_id,
+                        "completedStages": sent
+                    }))
+                elif event.get('status') == 'error':
+                    messages.append(format_event('failed', {
+                        "evaluationId": evaluation_id,
+                        "error": event.get('error')
+                    }))
+                return messages, event.get('status') in ('complete', 'error')
             
-            return jsonify({
-                "status": "success",
-                "evaluationId": evaluation_id,
-                "llmAnalysis": evaluation['llm_analysis']
-            })
-        except Exception as e:
-            return jsonify({"error": str(e)}), 500
+            try:
+                yield f"retry: {heartbeat * 1000}\n\n"
+                messages, finished = emit(status)
+                yield from messages
+                deadline = time.monotonic() + max_duration
+                while not finished and time.monotonic() < deadline:
+                    try:
+                        event = subscription.get(timeout=heartbeat)
+                    except queue.Empty:
+                        if not event_bus.cross_process:
+                            # Progress made in another process only reaches this
+                            # one through Mongo, so catch up from the status record
+                            event = get_status(app.db, object_id) or {}
+                        else:
+                            event = {}
+                        messages, finished = emit(event)
+                        yield from messages or [": heartbeat\n\n"]
+                        continue
+                    messages, finished = emit(event)
+                    yield from messages
+            finally:
+                event_bus.unsubscribe(evaluation_id, subscription)
+        
+        response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+        # Runs when the server closes the response, even if the stream never started
+        response.call_on_close(stream_slots.release)
+        response.headers['Cache-Control'] = 'no-cache'
+        # Keep reverse proxies from buffering the stream
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
 
     @app.route('/api/full-report/<evaluation_id>', methods=['GET'])
     def get_full_report(evaluation_id):
         try:
-            evaluation = app.db.evaluations.find_one({"_id": ObjectId(evaluation_id)})
-            if not evaluation:
+            # Completed reports never change, so they are served from memory
+            cached = app.report_cache.get(evaluation_id)
+            if cached is not None:
+                return cached_report_response(cached)
+            
+            object_id = ObjectId(evaluation_id)
+            status = get_status(app.db, object_id)
+            if not status:
                 return jsonify({"error": "Evaluation not found"}), 404
             
             # Check if all analyses are complete
-            all_analyses = ['seo_analysis', 'mobile_analysis', 
-                           'performance_analysis', 'accessibility_analysis', 
-                           'llm_analysis']
-            
-            missing_analyses = [analysis for analysis in all_analyses if analysis not in evaluation]
+            all_analyses = list(ANALYSIS_FIELDS.values())
+            completed_stages = status.get('stages', {})
+            completed_analyses = [field for stage, field in ANALYSIS_FIELDS.items() if stage in completed_stages]
+            missing_analyses = [analysis for analysis in all_analyses if analysis not in completed_analyses]
             
             if missing_analyses:
                 pending_analyses = ", ".join(a.replace("_analysis", "") for a in missing_analyses)
                 return jsonify({
                     "status": "pending",
                     "message": f"Some analyses are not yet complete: {pending_analyses}",
-                    "completedAnalyses": [a for a in all_analyses if a in evaluation],
+                    "completedAnalyses": completed_analyses,
                     "pendingAnalyses": missing_analyses
                 }), 202
             
+            projection = dict.fromkeys(all_analyses, 1)
+            projection.update({"url": 1, "timestamp": 1})
+            evaluation = app.db.evaluations.find_one({"_id": object_id}, projection)
+            if not evaluation:
+                return jsonify({"error": "Evaluation not found"}), 404
+            
             # Return the full report with all analyses
-            return jsonify({
+            report = {
                 "status": "success",
                 "evaluationId": evaluation_id,
                 "url": evaluation['url'],
@@ -149,6 +266,52 @@ def register_analysis_routes(app):
                 "performanceAnalysis": evaluation.get('performance_analysis', {}),
                 "accessibilityAnalysis": evaluation.get('accessibility_analysis', {}),
                 "llmAnalysis": evaluation.get('llm_analysis', {})
-            })
+            }
+            entry = app.report_cache.put(evaluation_id, app.json.dumps(report).encode('utf-8'))
+            return cached_report_response(entry)
         except Exception as e:
-            return jsonify({"error": str(e)}), 500
\ No newline at end of file
+            return jsonify({"error": str(e)}), 500
+
+    @app.route('/api/evaluations/<evaluation_id>/screenshot', methods=['GET'])
+    def get_evaluation_screenshot(evaluation_id):
+        try:
+            evaluation = app.db.evaluations.find_one(
+                {"_id": ObjectId(evaluation_id)},
+                {"screenshot.screenshot_ref": 1}
+            )
+            if not evaluation:
+                return jsonify({"error": "Evaluation not found"}), 404
+            
+            ref = evaluation.get('screenshot', {}).get('screenshot_ref')
+            if not ref:
+                return jsonify({"error": "Screenshot not available"}), 404
+            
+            return Response(
+                get_blob_store(app.db).load_screenshot(ref),
+                mimetype=ref['content_type'],
+                headers={"Cache-Control": BLOB_CACHE_CONTROL}
+            )
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    @app.route('/api/evaluations/<evaluation_id>/html', methods=['GET'])
+    def get_evaluation_html(evaluation_id):
+        try:
+            evaluation = app.db.evaluations.find_one(
+                {"_id": ObjectId(evaluation_id)},
+                {"html.html_ref": 1}
+            )
+            if not evaluation:
+                return jsonify({"error": "Evaluation not found"}), 404
+            
+            ref = evaluation.get('html', {}).get('html_ref')
+            if not ref:
+                return jsonify({"error": "HTML not available"}), 404
+            
+            return Response(
+                get_blob_store(app.db).load_html(ref),
+                mimetype='text/plain',
+                headers={"Cache-Control": BLOB_CACHE_CONTROL}
+            )
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
@@ -2,7 +2,38 @@ from flask import request, jsonify
 from bson.objectid import ObjectId
 from datetime import datetime
 from api.services.analysis_service import AnalysisService
+from urllib.parse import urlsplit
 from utils.queue_publisher import publish_evaluation   
+from utils.evaluation_status import (
+    ANALYSIS_FIELDS, create_status, create_statuses, get_batch_progress, claim_stage_retry
+)
+from utils.url_utils import normalize_url
+from utils.evaluation_scheduler import INTERACTIVE, BATCH, SchedulerSaturated
+from services.rule_engine import DEFAULT_PROFILE, get_rule_profiles
+
+def saturated_response(error):
+    """429 telling the client when the evaluation queue should have room again"""
+    response = jsonify({
+        "error": str(error),
+        "retryAfter": error.retry_after
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def requested_rule_profile(data):
+    """
+    The rule profile named in a request body, or None for the default
+
+    Raises:
+        ValueError: If the profile does not exist
+    """
+    rule_profile = data.get('ruleProfile')
+    if rule_profile is None or rule_profile == DEFAULT_PROFILE:
+        return None
+    if not isinstance(rule_profile, str) or rule_profile not in get_rule_profiles():
+        raise ValueError(f"Unknown rule profile: {rule_profile}")
+    return rule_profile
 
 def register_evaluation_routes(app):
     """Register routes for website evaluation"""
@@ -17,33 +48,69 @@ def register_evaluation_routes(app):
             return jsonify({"error": "URL is required"}), 400
         
         url = data['url']
+        if not isinstance(url, str) or not url.strip():
+            return jsonify({"error": "URL must be a non-empty string"}), 400
+        try:
+            normalized_url = normalize_url(url)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid URL: {str(e)}"}), 400
         user_id = data.get('userId')  
+        force_refresh = bool(data.get('forceRefresh', False))
+        try:
+            rule_profile = requested_rule_profile(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Claim a queue slot before creating anything, so an overloaded
+        # service answers 429 instead of growing its backlog
+        reservation = None
+        if app.config.get('EVALUATION_DISPATCH') != 'queue':
+            try:
+                reservation = app.scheduler.reserve(INTERACTIVE)
+            except SchedulerSaturated as e:
+                return saturated_response(e)
         
         # Create initial record
         initial_record = {
             "url": url,
+            "normalized_url": normalized_url,
             "timestamp": datetime.utcnow().isoformat(),
             "status": "processing"
         }
         
         if user_id:
             initial_record['userId'] = user_id
+        if rule_profile:
+            initial_record['rule_profile'] = rule_profile
         
-        # Insert initial record to get an ID
-        result = app.db.evaluations.insert_one(initial_record)
-        evaluation_id = str(result.inserted_id)
-        
-        # Publish the evaluation message to RabbitMQ so that a consumer could process this task
-        # publish_evaluation(evaluation_id, url, user_id)
+        try:
+            # Insert initial record to get an ID
+            result = app.db.evaluations.insert_one(initial_record)
+            evaluation_id = str(result.inserted_id)
+            
+            # Compact progress record that polling endpoints read instead of the evaluation
+            create_status(app.db, result.inserted_id, url, initial_record['timestamp'])
+        except Exception:
+            if reservation is not None:
+                reservation.cancel()
+            raise
         
-        # Start background analysis via thread pool as before
-        app.executor.submit(
-            analysis_service.analyze_site_background,
-            url, 
-            evaluation_id, 
-            user_id,
-            app.db.evaluations
-        )
+        if reservation is None:
+            # Hand the evaluation to the RabbitMQ workers (see worker.py)
+            publish_evaluation(evaluation_id, url, user_id, force_refresh, rule_profile=rule_profile)
+        else:
+            # Run the analysis on this process's scheduler, fair across users
+            reservation.submit(
+                user_id,
+                None,
+                analysis_service.analyze_site_background,
+                url, 
+                evaluation_id, 
+                user_id,
+                app.db.evaluations,
+                force_refresh,
+                rule_profile
+            )
         
         # Return immediately with the evaluation ID
         return jsonify({
@@ -52,4 +119,148 @@ def register_evaluation_routes(app):
             "evaluationId": evaluation_id,
             "url": url,
             "timestamp": initial_record['timestamp']
-        })
\ No newline at end of file
+        })
+    
+    @app.route('/api/evaluations/<evaluation_id>/retry-llm', methods=['POST'])
+    def retry_llm(evaluation_id):
+        """Re-run only the LLM stage of an evaluation whose LLM call failed"""
+        try:
+            object_id = ObjectId(evaluation_id)
+            evaluation = app.db.evaluations.find_one({"_id": object_id}, {"url": 1, "userId": 1})
+            if not evaluation:
+                return jsonify({"error": "Evaluation not found"}), 404
+            
+            reservation = None
+            if app.config.get('EVALUATION_DISPATCH') != 'queue':
+                reservation = app.scheduler.reserve(INTERACTIVE)
+            
+            # Analyzer results are the LLM's input, so they must all be stored
+            analyzer_stages = [stage for stage in ANALYSIS_FIELDS if stage != 'llm']
+            if not claim_stage_retry(app.db, object_id, 'llm', requires=analyzer_stages):
+                if reservation is not None:
+                    reservation.cancel()
+                return jsonify({"error": "LLM analysis is not in a failed state"}), 409
+            
+            if reservation is None:
+                publish_evaluation(evaluation_id, evaluation['url'], stage='llm')
+            else:
+                reservation.submit(
+                    evaluation.get('userId'),
+                    None,
+                    analysis_service.retry_llm_stage,
+                    evaluation_id,
+                    app.db.evaluations
+                )
+            
+            return jsonify({
+                "status": "success",
+                "message": "LLM analysis restarted",
+                "evaluationId": evaluation_id
+            }), 202
+        except SchedulerSaturated as e:
+            return saturated_response(e)
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+    
+    @app.route('/api/evaluate/batch', methods=['POST'])
+    def evaluate_batch():
+        data = request.json
+        
+        urls = data.get('urls') if data else None
+        if not isinstance(urls, list) or not urls:
+            return jsonify({"error": "A non-empty list of URLs is required"}), 400
+        if not all(isinstance(url, str) and url.strip() for url in urls):
+            return jsonify({"error": "Every URL must be a non-empty string"}), 400
+        if len(urls) > app.config['BATCH_MAX_URLS']:
+            return jsonify({"error": f"A batch may contain at most {app.config['BATCH_MAX_URLS']} URLs"}), 400
+        normalized_urls = []
+        for url in urls:
+            try:
+                normalized_urls.append(normalize_url(url))
+            except ValueError as e:
+                return jsonify({"error": f"Invalid URL {url}: {str(e)}"}), 400
+        
+        user_id = data.get('userId')
+        force_refresh = bool(data.get('forceRefresh', False))
+        try:
+            rule_profile = requested_rule_profile(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        batch_id = ObjectId()
+        timestamp = datetime.utcnow().isoformat()
+        
+        # The whole batch is admitted or rejected
+        reservation = None
+        if app.config.get('EVALUATION_DISPATCH') != 'queue':
+            try:
+                reservation = app.scheduler.reserve(BATCH, len(urls))
+            except SchedulerSaturated as e:
+                return saturated_response(e)
+        
+        records = []
+        for url, normalized_url in zip(urls, normalized_urls):
+            record = {
+                "url": url,
+                "normalized_url": normalized_url,
+                "timestamp": timestamp,
+                "status": "processing",
+                "batch_id": batch_id
+            }
+            if user_id:
+                record['userId'] = user_id
+            if rule_profile:
+                record['rule_profile'] = rule_profile
+            records.append(record)
+        
+        try:
+            # One round trip for the whole batch; insert_many fills in each _id
+            app.db.evaluations.insert_many(records)
+            create_statuses(app.db, records)
+        except Exception:
+            if reservation is not None:
+                reservation.cancel()
+            raise
+        
+        evaluation_ids = [str(record['_id']) for record in records]
+        if reservation is None:
+            # Workers bound concurrency through their prefetch and pool size
+            for evaluation_id, url in zip(evaluation_ids, urls):
+                publish_evaluation(evaluation_id, url, user_id, force_refresh, rule_profile=rule_profile)
+        else:
+            for record, evaluation_id in zip(records, evaluation_ids):
+                reservation.submit(
+                    user_id,
+                    urlsplit(record['normalized_url']).hostname or '',
+                    analysis_service.analyze_site_background,
+                    record['url'], evaluation_id, user_id, app.db.evaluations, force_refresh, rule_profile
+                )
+        
+        return jsonify({
+            "status": "success",
+            "message": "Batch evaluation started",
+            "batchId": str(batch_id),
+            "evaluationIds": evaluation_ids,
+            "count": len(evaluation_ids),
+            "timestamp": timestamp
+        })
+    
+    @app.route('/api/evaluate/batch/<batch_id>', methods=['GET'])
+    def get_batch(batch_id):
+        try:
+            counts = get_batch_progress(app.db, ObjectId(batch_id))
+            if not counts:
+                return jsonify({"error": "Batch not found"}), 404
+            
+            total = sum(counts.values())
+            finished = counts.get('complete', 0) + counts.get('error', 0)
+            return jsonify({
+                "status": "success",
+                "batchId": batch_id,
+                "total": total,
+                "complete": counts.get('complete', 0),
+                "failed": counts.get('error', 0),
+                "processing": total - finished,
+                "finished": finished == total
+            })
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
@@ -1,10 +1,21 @@
-from flask import jsonify, request
+import base64
+from flask import jsonify, request, Response
 from services.seo_service import SeoService
 from services.mobile_service import MobileService
 from services.performance_service import PerformanceService
 from services.accessibility_service import AccessibilityService
 from services.llm_service import LLMService
+from services.llm_gateway import get_llm_gateway
 from services.site_service import SiteService
+from utils.llm_cache import get_llm_cache
+from utils.metrics import metrics, METRICS_ENABLED, PROMETHEUS_CONTENT_TYPE
+
+def _jsonable_screenshot(result):
+    """Copy of a capture_screenshot result with the image bytes base64 encoded"""
+    if isinstance(result.get('screenshot'), bytes):
+        result = dict(result, screenshot=base64.b64encode(result['screenshot']).decode('utf-8'))
+    return result
+
 
 def register_health_routes(app):
     """Register health check routes"""
@@ -17,6 +28,38 @@ def register_health_routes(app):
             "version": "1.0.0"
         })
     
+    @app.route('/api/cache/stats', methods=['GET'])
+    def cache_stats():
+        """Hit/miss counters of this process's report and LLM caches"""
+        return jsonify({
+            "status": "success",
+            "reportCache": app.report_cache.stats(),
+            "llmCache": get_llm_cache(app.db).stats()
+        })
+    
+    @app.route('/api/llm/stats', methods=['GET'])
+    def llm_stats():
+        """In-flight calls, rate limiting and retries of this process's LLM gateway"""
+        return jsonify({
+            "status": "success",
+            "llmGateway": get_llm_gateway().stats()
+        })
+    
+    @app.route('/api/scheduler/stats', methods=['GET'])
+    def scheduler_stats():
+        """Queue depth, running evaluations and queue waits per priority lane"""
+        return jsonify({
+            "status": "success",
+            "scheduler": app.scheduler.stats()
+        })
+    
+    @app.route('/metrics', methods=['GET'])
+    def prometheus_metrics():
+        """Stage, Mongo write and LLM call histograms plus queue and pool gauges of this process"""
+        if not METRICS_ENABLED:
+            return jsonify({"error": "Metrics are disabled"}), 404
+        return Response(metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+    
     # Test endpoint for SiteService remains unchanged
     @app.route('/api/test/site-service', methods=['POST'])
     def test_site_service():
@@ -34,9 +77,10 @@ def register_health_routes(app):
         if function == 'fetch_html':
             result = service.fetch_html(url)
         elif function == 'capture_screenshot':
-            result = service.capture_screenshot(url)
+            result = _jsonable_screenshot(service.capture_screenshot(url))
         else:  # Default to full evaluation
-            result = service.evaluate_site(url)
+            result = service.evaluate_site(url, data.get('mode'))
+            result['screenshot'] = _jsonable_screenshot(result['screenshot'])
             
         return jsonify({
             "status": "success",
@@ -84,11 +128,12 @@ def register_health_routes(app):
             html_result = site_service.fetch_html(url)
             html_content = html_result.get("html", "")
             
-        screenshot = data.get('screenshot', '')
+        # Screenshots are posted base64 encoded
+        screenshot = base64.b64decode(data.get('screenshot', ''))
         if not screenshot:
             site_service = SiteService()
             screenshot_result = site_service.capture_screenshot(url)
-            screenshot = screenshot_result.get("screenshot", "")
+            screenshot = screenshot_result.get("screenshot", b"")
             
         service = MobileService()
         result = service.analyze(html_content, screenshot, url)
@@ -155,13 +200,14 @@ def register_health_routes(app):
         url = data.get('url', 'https://example.com')
         # For LLM testing, auto-fetch missing html content and screenshot
         html_content = data.get('html', '')
-        screenshot = data.get('screenshot', '')
+        # Screenshots are posted base64 encoded
+        screenshot = base64.b64decode(data.get('screenshot', ''))
         if not html_content or not screenshot:
             site_service = SiteService()
             if not html_content:
-                html_content = site_service.fetch_html(url)
+                html_content = site_service.fetch_html(url).get("html", "")
             if not screenshot:
-                screenshot = site_service.capture_screenshot(url)
+                screenshot = site_service.capture_screenshot(url).get("screenshot", b"")
                 
         # Optional previous analyses
         seo_analysis = data.get('seo_analysis', {})
@@ -1,26 +1,394 @@
 from bson.objectid import ObjectId
-from datetime import datetime
+from datetime import datetime, timedelta
 import concurrent.futures
+import os
+import time
 from services.site_service import SiteService
-from services.seo_service import SeoService
-from services.mobile_service import MobileService
-from services.performance_service import PerformanceService
-from services.accessibility_service import AccessibilityService
+from services.html_document import HtmlDocument
 from services.llm_service import LLMService
+from services.analysis_pool import get_analysis_pool, analyze_document
+from utils.blob_store import get_blob_store
+from utils.evaluation_status import ANALYSIS_FIELDS, mark_stages_complete, mark_failed
+from utils.inflight_registry import get_inflight_registry, get_follower_waits
+from utils.llm_cache import get_llm_cache
+from utils.tracing import Trace, span, update_with_trace
+from utils.url_utils import normalize_url
+
+# How long a completed evaluation may be reused when the page has not changed
+REEVALUATION_FRESHNESS_SECONDS = int(os.getenv("REEVALUATION_FRESHNESS_SECONDS", 24 * 60 * 60))
+
+# Fields copied from a prior evaluation when its page is unchanged
+REUSABLE_FIELDS = list(ANALYSIS_FIELDS.values()) + ['html', 'screenshot', 'content_hash', 'validators']
+
+def _completed(result):
+    """A future that has already resolved to result"""
+    future = concurrent.futures.Future()
+    future.set_result(result)
+    return future
 
 class AnalysisService:
     """Service to coordinate all analysis tasks"""
     
     def __init__(self):
-        # Initialize all analysis services
+        # Initialize all analysis services; the analyzers themselves live
+        # in services.analysis_pool so worker processes can build their own
         self.site_service = SiteService()
-        self.seo_service = SeoService()
-        self.mobile_service = MobileService() 
-        self.performance_service = PerformanceService()
-        self.accessibility_service = AccessibilityService()
         self.llm_service = LLMService()
     
-    def analyze_site_background(self, url, evaluation_id, user_id, evaluations_collection):
+    def _externalize_payloads(self, site_data, blob_store):
+        """
+        Return a copy of site_data with the raw HTML and screenshot bytes
+        replaced by blob store references
+        """
+        stored = dict(site_data)
+        html_data = dict(site_data.get('html', {}))
+        screenshot_data = dict(site_data.get('screenshot', {}))
+        
+        try:
+            if html_data.get('html'):
+                html_data['html_ref'] = blob_store.store_html(html_data.pop('html'))
+            if screenshot_data.get('screenshot'):
+                screenshot_data['screenshot_ref'] = blob_store.store_screenshot(screenshot_data.pop('screenshot'))
+        except Exception as e:
+            # Never fall back to inlining megabytes into the evaluation document
+            print(f"Error storing evaluation payloads: {str(e)}")
+            html_data.pop('html', None)
+            screenshot_data.pop('screenshot', None)
+            stored['storage_error'] = str(e)
+        
+        stored['html'] = html_data
+        stored['screenshot'] = screenshot_data
+        return stored
+    
+    def _find_prior_evaluation(self, url, evaluation_id, evaluations_collection, rule_profile=None):
+        """
+        Return the latest completed evaluation of the same normalized URL,
+        scored with the same rule profile, within the freshness window,
+        projected to the reusable fields
+        """
+        if REEVALUATION_FRESHNESS_SECONDS <= 0:
+            return None
+        cutoff = (datetime.utcnow() - timedelta(seconds=REEVALUATION_FRESHNESS_SECONDS)).isoformat()
+        return evaluations_collection.find_one(
+            {
+                "normalized_url": normalize_url(url),
+                # None also matches evaluations stored without a profile
+                "rule_profile": rule_profile,
+                "analysis_complete": True,
+                "timestamp": {"$gte": cutoff},
+                "_id": {"$ne": ObjectId(evaluation_id)}
+            },
+            dict.fromkeys(REUSABLE_FIELDS, 1),
+            sort=[("timestamp", -1)]
+        )
+    
+    def _reuse_prior_evaluation(self, url, evaluation_id, evaluations_collection, trace=None, rule_profile=None):
+        """
+        Copy a prior evaluation's results if the page has not changed since
+        
+        Sends a conditional GET with the prior response's validators; a 304
+        or an identical content hash means the prior analyses still apply.
+        
+        Returns:
+            tuple: (True if the prior results were reused, the fetch_html
+            result of a changed page so the pipeline need not fetch it again,
+            or None)
+        """
+        prior = self._find_prior_evaluation(url, evaluation_id, evaluations_collection, rule_profile)
+        if not prior:
+            return False, None
+        
+        validators = prior.get('validators') or {}
+        html_result = self.site_service.fetch_html(
+            url,
+            etag=validators.get('etag'),
+            last_modified=validators.get('last_modified')
+        )
+        unchanged = html_result['status'] == 'not_modified' or (
+            html_result['status'] == 'success'
+            and prior.get('content_hash')
+            and html_result.get('content_hash') == prior['content_hash']
+        )
+        if not unchanged:
+            return False, html_result if html_result['status'] == 'success' else None
+        
+        self._copy_results(
+            prior, [evaluation_id], evaluations_collection, trace=trace, reused_from=str(prior['_id'])
+        )
+        return True, None
+    
+    def _copy_results(self, source, evaluation_ids, evaluations_collection, trace=None, **extra):
+        """Copy the reusable fields of a completed evaluation to other evaluations"""
+        copied = {field: source[field] for field in REUSABLE_FIELDS if field in source}
+        copied.update(extra)
+        copied.update({
+            "analysis_complete": True,
+            "analysis_timestamp": datetime.utcnow().isoformat()
+        })
+        object_ids = [ObjectId(evaluation_id) for evaluation_id in evaluation_ids]
+        evaluations_collection.update_many(
+            {"_id": {"$in": object_ids}}, update_with_trace({"$set": copied}, trace)
+        )
+        for object_id in object_ids:
+            mark_stages_complete(
+                evaluations_collection.database,
+                object_id,
+                ['fetch', 'screenshot'] + list(ANALYSIS_FIELDS),
+                analysis_complete=True
+            )
+    
+    def _fan_out_results(self, leader_id, follower_ids, evaluations_collection):
+        """Give evaluations that coalesced onto a leader the leader's outcome"""
+        projection = dict.fromkeys(REUSABLE_FIELDS, 1)
+        projection.update({"analysis_complete": 1, "analysis_error": 1})
+        leader = evaluations_collection.find_one({"_id": ObjectId(leader_id)}, projection)
+        
+        if leader and leader.get('analysis_complete'):
+            self._copy_results(leader, follower_ids, evaluations_collection, coalesced_with=leader_id)
+            return
+        
+        error = (leader or {}).get('analysis_error') or "Coalesced evaluation did not complete"
+        evaluations_collection.update_many(
+            {"_id": {"$in": [ObjectId(follower_id) for follower_id in follower_ids]}},
+            {"$set": {
+                "analysis_error": error,
+                "analysis_complete": False,
+                "coalesced_with": leader_id
+            }}
+        )
+        for follower_id in follower_ids:
+            mark_failed(evaluations_collection.database, ObjectId(follower_id), error)
+    
+    def analyze_site_background(self, url, evaluation_id, user_id, evaluations_collection, force_refresh=False,
+                                rule_profile=None):
+        """
+        Analyze a site, or attach to an evaluation of the same URL already in flight
+        
+        Concurrent submissions of one normalized URL (and rule profile and
+        force_refresh) coalesce: the first runs the pipeline and, when it
+        finishes, copies its results (or its error) to every evaluation that
+        attached while it was running. A forced refresh never joins a leader
+        that may reuse an older evaluation.
+        
+        Args:
+            url: Website URL to analyze
+            evaluation_id: MongoDB ObjectId of the evaluation record
+            user_id: Optional user ID
+            evaluations_collection: MongoDB collection for evaluations
+            force_refresh: Re-run everything even if a fresh prior evaluation
+                of the same page is still valid
+            rule_profile: Name of the rule profile the analyzers score with
+                (None: default)
+        
+        Returns:
+            concurrent.futures.Future: Completes once the evaluation (and any
+            evaluations coalesced onto it) has its final results; for a
+            follower, once the leader's outcome has been copied to it. The LLM
+            stage runs through the LLM gateway, so this returns before it
+            finishes instead of blocking the calling thread on Gemini.
+        """
+        db = evaluations_collection.database
+        registry = get_inflight_registry(db)
+        key = normalize_url(url)
+        if rule_profile:
+            # Scores differ between profiles, so only identical requests coalesce
+            key = f"{key} {rule_profile}"
+        if force_refresh:
+            key = f"{key} refresh"
+        if registry.join(key, evaluation_id) is not None:
+            # The leader fans its results out to this evaluation; if it does so
+            # before the wait is registered, the progress record shows it
+            return get_follower_waits(db).wait(evaluation_id)
+        
+        llm_stage = None
+        # Stage spans and Mongo writes of this evaluation, stored on its document
+        trace = Trace()
+        try:
+            with trace.activate():
+                llm_stage = self._run_analysis(
+                    url, evaluation_id, user_id, evaluations_collection, force_refresh, trace, rule_profile
+                )
+        finally:
+            if llm_stage is None:
+                self._release_inflight(registry, key, evaluation_id, evaluations_collection)
+            else:
+                llm_stage.add_done_callback(
+                    lambda _: self._release_inflight(registry, key, evaluation_id, evaluations_collection)
+                )
+        return llm_stage or _completed(None)
+    
+    def _release_inflight(self, registry, key, evaluation_id, evaluations_collection):
+        """Close the evaluation's in-flight entry and fan its outcome out to followers"""
+        follower_ids = registry.finish(key, evaluation_id)
+        if follower_ids:
+            error = None
+            try:
+                self._fan_out_results(evaluation_id, follower_ids, evaluations_collection)
+            except Exception as e:
+                print(f"Error fanning out coalesced results: {str(e)}")
+                error = e
+            # Followers waiting in this process; others see their progress records
+            get_follower_waits(evaluations_collection.database).resolve(follower_ids, error)
+    
+    def _record_stage(self, evaluation_id, evaluations_collection, stage, result, elapsed, trace):
+        """Persist one stage's result and timing and mark the stage complete"""
+        trace.record(stage, elapsed, outcome='error' if 'error' in result else 'ok')
+        evaluations_collection.update_one(
+            {"_id": ObjectId(evaluation_id)},
+            update_with_trace({"$set": {
+                ANALYSIS_FIELDS[stage]: result,
+                f"stage_timings.{stage}": round(elapsed, 3)
+            }}, trace)
+        )
+        mark_stages_complete(evaluations_collection.database, ObjectId(evaluation_id), [stage])
+    
+    def _run_llm_stage(self, url, evaluation_id, evaluations_collection, html_content, screenshot,
+                       analyses, trace, screenshot_mime_type="image/png", condensed=None):
+        """
+        Start the LLM stage on completed analyzer results; it finishes the evaluation
+        
+        A failure is recorded on the evaluation (llm_error) without touching
+        the analyzer results, so the stage can be retried on its own.
+        html_content may be raw HTML or an HtmlDocument; condensed is the
+        (text, stats) result of condense_html when it was already computed.
+        
+        Returns:
+            concurrent.futures.Future: Resolves to True if the LLM stage
+            succeeded, once its outcome has been recorded
+        """
+        started = time.perf_counter()
+        try:
+            report_future = self.llm_service.submit_analysis(
+                html_content,
+                screenshot,
+                url,
+                analyses.get('seo'),
+                analyses.get('mobile'),
+                analyses.get('performance'),
+                analyses.get('accessibility'),
+                screenshot_mime_type=screenshot_mime_type,
+                cache=get_llm_cache(evaluations_collection.database),
+                condensed=condensed
+            )
+        except Exception as e:
+            trace.record('llm', time.perf_counter() - started, outcome='error')
+            self._record_llm_failure(evaluation_id, evaluations_collection, e, trace)
+            return _completed(False)
+        
+        stage_future = concurrent.futures.Future()
+        
+        def record(future):
+            try:
+                # Runs on the gateway's callback pool; attribute the writes to this evaluation
+                with trace.activate():
+                    stage_future.set_result(
+                        self._record_llm_result(evaluation_id, evaluations_collection, future, started, trace)
+                    )
+            except Exception as e:
+                print(f"Error recording LLM analysis: {str(e)}")
+                stage_future.set_result(False)
+        
+        report_future.add_done_callback(record)
+        return stage_future
+    
+    def _record_llm_failure(self, evaluation_id, evaluations_collection, exc, trace):
+        error = f"LLM analysis failed: {str(exc)}"
+        print(error)
+        evaluations_collection.update_one(
+            {"_id": ObjectId(evaluation_id)},
+            update_with_trace({"$set": {
+                "llm_error": str(exc),
+                "analysis_error": error,
+                "analysis_complete": False
+            }}, trace)
+        )
+        mark_failed(evaluations_collection.database, ObjectId(evaluation_id), error)
+    
+    def _record_llm_result(self, evaluation_id, evaluations_collection, report_future, started, trace):
+        """Persist the LLM report (or its failure) and complete the evaluation"""
+        elapsed = time.perf_counter() - started
+        try:
+            llm_analysis = report_future.result()
+        except Exception as e:
+            trace.record('llm', elapsed, outcome='error')
+            self._record_llm_failure(evaluation_id, evaluations_collection, e, trace)
+            return False
+        
+        # Size of what was sent: the condensed page and the screenshot tiles
+        input_stats = llm_analysis.get('input_stats') or {}
+        trace.record(
+            'llm',
+            elapsed,
+            input_stats.get('condensed_chars', 0) + (input_stats.get('screenshot') or {}).get('sent_bytes', 0),
+            outcome='cached' if (llm_analysis.get('cache') or {}).get('hit') else 'ok'
+        )
+        evaluations_collection.update_one(
+            {"_id": ObjectId(evaluation_id)},
+            update_with_trace({
+                "$set": {
+                    "llm_analysis": llm_analysis,
+                    "stage_timings.llm": round(elapsed, 3),
+                    "analysis_complete": True,
+                    "analysis_timestamp": datetime.utcnow().isoformat()
+                },
+                "$unset": {"llm_error": "", "analysis_error": ""}
+            }, trace)
+        )
+        mark_stages_complete(
+            evaluations_collection.database,
+            ObjectId(evaluation_id),
+            ['llm'],
+            analysis_complete=True
+        )
+        return True
+    
+    def retry_llm_stage(self, evaluation_id, evaluations_collection):
+        """
+        Re-run only the LLM stage of an evaluation whose analyzers completed
+        
+        The page HTML and screenshot are loaded back from the blob store.
+        
+        Args:
+            evaluation_id: MongoDB ObjectId of the evaluation record
+            evaluations_collection: MongoDB collection for evaluations
+        
+        Returns:
+            concurrent.futures.Future: Completes once the outcome is recorded
+        """
+        trace = Trace()
+        try:
+            projection = dict.fromkeys(ANALYSIS_FIELDS.values(), 1)
+            projection.update({"url": 1, "html.html_ref": 1, "screenshot.screenshot_ref": 1})
+            evaluation = evaluations_collection.find_one({"_id": ObjectId(evaluation_id)}, projection)
+            
+            blob_store = get_blob_store(evaluations_collection.database)
+            html_ref = evaluation.get('html', {}).get('html_ref')
+            screenshot_ref = evaluation.get('screenshot', {}).get('screenshot_ref')
+            html_content = blob_store.load_html(html_ref) if html_ref else ''
+            screenshot = blob_store.load_screenshot(screenshot_ref) if screenshot_ref else b''
+            analyses = {stage: evaluation.get(field) for stage, field in ANALYSIS_FIELDS.items() if stage != 'llm'}
+            
+            return self._run_llm_stage(
+                evaluation['url'],
+                evaluation_id,
+                evaluations_collection,
+                html_content,
+                screenshot,
+                analyses,
+                trace,
+                screenshot_mime_type=screenshot_ref['content_type'] if screenshot_ref else "image/png"
+            )
+        except Exception as e:
+            print(f"Error retrying LLM analysis: {str(e)}")
+            evaluations_collection.update_one(
+                {"_id": ObjectId(evaluation_id)},
+                {"$set": {"analysis_error": str(e), "analysis_complete": False}}
+            )
+            mark_failed(evaluations_collection.database, ObjectId(evaluation_id), str(e))
+            return _completed(False)
+    
+    def _run_analysis(self, url, evaluation_id, user_id, evaluations_collection, force_refresh=False, trace=None,
+                      rule_profile=None):
         """
         Performs all analyses in background after initial request
         
@@ -29,73 +397,92 @@ class AnalysisService:
             evaluation_id: MongoDB ObjectId of the evaluation record
             user_id: Optional user ID
             evaluations_collection: MongoDB collection for evaluations
+            force_refresh: Re-run everything even if a fresh prior evaluation
+                of the same page is still valid
+            trace: Trace collecting the evaluation's stage breakdown
+            rule_profile: Name of the rule profile the analyzers score with
+        
+        Returns:
+            concurrent.futures.Future or None: The pending LLM stage, or
+            None if the evaluation already finished (reused or failed)
         """
+        trace = trace or Trace()
         try:
-            # Get base site data (HTML and screenshot)
-            site_data = self.site_service.evaluate_site(url)
+            # Skip the whole pipeline when a recent evaluation is still valid
+            reused, fetched = False, None
+            if not force_refresh:
+                reused, fetched = self._reuse_prior_evaluation(
+                    url, evaluation_id, evaluations_collection, trace, rule_profile
+                )
+            if reused:
+                return None
+            
+            # Get base site data (HTML and screenshot), reusing the page the
+            # conditional GET just downloaded
+            fetch_started = time.perf_counter()
+            site_data = self.site_service.evaluate_site(url, html_result=fetched)
             
             # Add user ID if provided
             if user_id:
                 site_data['userId'] = user_id
                 
-            # Update the evaluation with full site data
-            evaluations_collection.update_one(
-                {"_id": ObjectId(evaluation_id)},
-                {"$set": site_data}
-            )
-            
             # Get HTML and screenshot for analysis
             html_data = site_data.get('html', {})
             html_content = html_data.get('html', '')
             screenshot_data = site_data.get('screenshot', {})
-            screenshot = screenshot_data.get('screenshot', '')
+            screenshot = screenshot_data.get('screenshot', b'')
             
-            # Run all analyses concurrently
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                # Start all analyses tasks
-                seo_future = executor.submit(self.seo_service.analyze, html_content, url)
-                mobile_future = executor.submit(self.mobile_service.analyze, html_content, screenshot, url)
-                performance_future = executor.submit(self.performance_service.analyze, html_content, url)
-                accessibility_future = executor.submit(self.accessibility_service.analyze, html_content, url)
-                
-                # Get results as they complete
-                seo_analysis = seo_future.result()
-                mobile_analysis = mobile_future.result()
-                performance_analysis = performance_future.result()
-                accessibility_analysis = accessibility_future.result()
-                
-                # Run LLM analysis with all other results
-                llm_analysis = self.llm_service.analyze(
-                    html_content,
-                    screenshot,
-                    url,
-                    seo_analysis,
-                    mobile_analysis,
-                    performance_analysis,
-                    accessibility_analysis
-                )
-                
-                # Update the evaluation with all analysis results
-                evaluations_collection.update_one(
-                    {"_id": ObjectId(evaluation_id)},
-                    {"$set": {
-                        "seo_analysis": seo_analysis,
-                        "mobile_analysis": mobile_analysis,
-                        "performance_analysis": performance_analysis,
-                        "accessibility_analysis": accessibility_analysis,
-                        "llm_analysis": llm_analysis,
-                        "analysis_complete": True,
-                        "analysis_timestamp": datetime.utcnow().isoformat()
-                    }}
-                )
+            # Remember what identifies this version of the page for later
+            # conditional re-evaluations
+            site_data['content_hash'] = html_data.get('content_hash')
+            site_data['validators'] = self.site_service.cache_validators(html_data)
+            
+            # Update the evaluation with site data, keeping only references
+            # to the HTML and screenshot stored in the blob store
+            blob_store = get_blob_store(evaluations_collection.database)
+            stored = self._externalize_payloads(site_data, blob_store)
+            stored['stage_timings'] = {'fetch': round(time.perf_counter() - fetch_started, 3)}
+            evaluations_collection.update_one({"_id": ObjectId(evaluation_id)}, update_with_trace({"$set": stored}, trace))
+            mark_stages_complete(evaluations_collection.database, ObjectId(evaluation_id), ['fetch', 'screenshot'])
+            
+            # Parse and analyse the page in a worker process (or in this
+            # thread with ANALYSIS_POOL=thread), persisting each result so
+            # its endpoint stops answering 202 right away
+            def record(stage, result, elapsed):
+                self._record_stage(evaluation_id, evaluations_collection, stage, result, elapsed, trace)
+            
+            pool = get_analysis_pool()
+            html_bytes = len(html_content.encode('utf-8'))
+            # The whole step, including waiting for and talking to a worker process
+            with span('analysis') as analysis_span:
+                analysis_span.bytes = html_bytes
+                if pool is None:
+                    results, condensed, timings = analyze_document(
+                        HtmlDocument(html_content, rule_profile=rule_profile), url, on_stage=record
+                    )
+                else:
+                    results, condensed, timings = pool.analyze(html_content, url, rule_profile, on_stage=record)
+            analyses = {stage: result for stage, (result, _) in results.items()}
+            trace.record('parse', timings['parse'], html_bytes)
+            trace.record('walk', timings['walk'])
+            trace.record('condense', timings['condense'])
+            
+            # The LLM stage handles its own failures so it can be retried alone;
+            # it reuses the condensed page from the analysis step
+            return self._run_llm_stage(
+                url, evaluation_id, evaluations_collection, html_content, screenshot, analyses, trace,
+                condensed=condensed
+            )
                 
         except Exception as e:
             # Log error and update evaluation with error status
             print(f"Error in background analysis: {str(e)}")
             evaluations_collection.update_one(
                 {"_id": ObjectId(evaluation_id)},
-                {"$set": {
+                update_with_trace({"$set": {
                     "analysis_error": str(e),
                     "analysis_complete": False
-                }}
-            )
\ No newline at end of file
+                }}, trace)
+            )
+            mark_failed(evaluations_collection.database, ObjectId(evaluation_id), str(e))
+            return None
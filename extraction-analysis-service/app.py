@@ -2,10 +2,12 @@ from flask import Flask
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
-import concurrent.futures
 from api.routes import register_routes
 from config.mongodb import init_db
 from utils.json_encoder import CustomJSONEncoder
+from utils.report_cache import ReportCache
+from utils.evaluation_scheduler import EvaluationScheduler
+from utils.event_bus import event_bus
 
 # Load environment variables
 load_dotenv()
@@ -19,6 +21,16 @@ def create_app(test_config=None):
         SECRET_KEY=os.environ.get('SECRET_KEY', 'dev'),
         MONGODB_URI=os.environ.get('MONGODB_URI', 'mongodb://localhost:27017/'),
         MAX_WORKERS=int(os.environ.get('MAX_WORKERS', 10)),
+        EVALUATION_QUEUE_MAX_DEPTH=int(os.environ.get('EVALUATION_QUEUE_MAX_DEPTH', 200)),
+        BATCH_QUEUE_MAX_DEPTH=int(os.environ.get('BATCH_QUEUE_MAX_DEPTH', 20000)),
+        REPORT_CACHE_MAX_BYTES=int(os.environ.get('REPORT_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+        SSE_HEARTBEAT_SECONDS=int(os.environ.get('SSE_HEARTBEAT_SECONDS', 15)),
+        SSE_MAX_SECONDS=int(os.environ.get('SSE_MAX_SECONDS', 300)),
+        SSE_MAX_STREAMS=int(os.environ.get('SSE_MAX_STREAMS', 8)),
+        EVALUATION_DISPATCH=os.environ.get('EVALUATION_DISPATCH', 'executor'),
+        BATCH_MAX_URLS=int(os.environ.get('BATCH_MAX_URLS', 5000)),
+        BATCH_MAX_CONCURRENCY=int(os.environ.get('BATCH_MAX_CONCURRENCY', 8)),
+        BATCH_PER_HOST_CONCURRENCY=int(os.environ.get('BATCH_PER_HOST_CONCURRENCY', 2)),
         DEBUG=os.environ.get('FLASK_ENV', 'production') == 'development',
     )
     
@@ -29,17 +41,29 @@ def create_app(test_config=None):
     # Set up CORS
     CORS(app)
     
-    # Initialize executor for background tasks
-    app.executor = concurrent.futures.ThreadPoolExecutor(
-        max_workers=app.config['MAX_WORKERS']
+    # Background evaluations: interactive submissions ahead of batch runs,
+    # with bounded queues that turn overload into 429 responses
+    app.scheduler = EvaluationScheduler(
+        app.config['MAX_WORKERS'],
+        app.config['EVALUATION_QUEUE_MAX_DEPTH'],
+        app.config['BATCH_QUEUE_MAX_DEPTH'],
+        app.config['BATCH_MAX_CONCURRENCY'],
+        app.config['BATCH_PER_HOST_CONCURRENCY']
     )
     
+    # In-process cache of completed full reports
+    app.report_cache = ReportCache(app.config['REPORT_CACHE_MAX_BYTES'])
+    
     # Set up custom JSON encoder
     app.json_encoder = CustomJSONEncoder
     
     # Initialize database
     app.db = init_db(app.config['MONGODB_URI'])
     
+    # Relay progress from queue workers and other API processes to event
+    # streams; the listener starts with the first stream in each process
+    event_bus.relay_changes(app.db)
+    
     # Register all routes
     register_routes(app)
     
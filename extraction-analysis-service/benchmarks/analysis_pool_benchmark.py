@@ -0,0 +1,65 @@
+"""
+Compare analysis throughput on request threads with the process pool, and
+how long a request-handling thread waits for the GIL meanwhile.
+
+Run from the service root:
+
+    python -m benchmarks.analysis_pool_benchmark --pages 16 --size-kb 500 --threads 8
+"""
+import argparse
+import time
+import threading
+import concurrent.futures
+from benchmarks.parse_benchmark import build_page
+from services.html_document import HtmlDocument
+from services.analysis_pool import AnalysisPool, analyze_document, ANALYSIS_PROCESSES
+
+
+def probe_latency(stop, samples):
+    """Stand-in for a request handler: record how late a 10ms sleep wakes up"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        time.sleep(0.01)
+        samples.append(time.perf_counter() - start - 0.01)
+
+
+def run(label, analyze, pages, threads):
+    stop = threading.Event()
+    samples = []
+    probe = threading.Thread(target=probe_latency, args=(stop, samples), daemon=True)
+    probe.start()
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(analyze, pages))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    probe.join()
+    worst = max(samples) * 1000 if samples else 0.0
+    print(f"{label:<28} {len(pages) / elapsed:8.1f} pages/s   worst handler delay {worst:7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=16, help='Pages to analyse per scenario')
+    parser.add_argument('--size-kb', type=int, default=500, help='Size of each synthetic page in KB')
+    parser.add_argument('--threads', type=int, default=8, help='Evaluation threads submitting pages')
+    parser.add_argument('--processes', type=int, default=ANALYSIS_PROCESSES, help='Analysis worker processes')
+    args = parser.parse_args()
+
+    pages = [build_page(args.size_kb * 1024) for _ in range(args.pages)]
+    url = 'https://example.org/'
+    print(f"{args.pages} pages of {args.size_kb}KB, {args.threads} threads, {args.processes} processes")
+
+    run("threads (ANALYSIS_POOL=thread)", lambda html: analyze_document(HtmlDocument(html), url), pages, args.threads)
+
+    pool = AnalysisPool(args.processes)
+    # Spawn the workers outside the measurement
+    pool.analyze(pages[0], url)
+    try:
+        run("process pool", lambda html: pool.analyze(html, url), pages, args.threads)
+    finally:
+        pool.close()
+
+
+if __name__ == '__main__':
+    main()
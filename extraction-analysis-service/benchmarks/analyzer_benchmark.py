@@ -0,0 +1,203 @@
+"""
+Time the four analyzers over the versioned HTML corpus, on their own and
+together on one shared document, and report throughput and peak memory.
+
+Each run builds a fresh HtmlDocument, so the times include parsing and the
+single tree walk the analyzers share. "parse" is that parse alone; "all" is
+one parse plus the four analyzers, as an evaluation runs them. Peak memory
+is measured with tracemalloc in a separate, untimed run.
+
+Run from the service root:
+
+    python -m benchmarks.analyzer_benchmark --sizes small median --repeat 5
+    python -m benchmarks.analyzer_benchmark --save baseline.json
+    python -m benchmarks.analyzer_benchmark --compare baseline.json --threshold 10
+
+With --compare the exit status is 1 when any scenario's best time is more
+than --threshold percent slower than the baseline. The best of several runs
+is compared rather than the median because it is the least disturbed by
+other load on the machine.
+"""
+import gc
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import tracemalloc
+from datetime import datetime
+from benchmarks.corpus import load_corpus, CORPUS_VERSION, SIZE_CLASSES, FIXTURES
+from services.html_document import HtmlDocument, HTML_PARSER
+from services.seo_service import SeoService
+from services.mobile_service import MobileService
+from services.performance_service import PerformanceService
+from services.accessibility_service import AccessibilityService
+
+MB = 1024 * 1024
+
+seo = SeoService()
+mobile = MobileService()
+performance = PerformanceService()
+accessibility = AccessibilityService()
+
+
+def run_all(html, url):
+    document = HtmlDocument(html)
+    return [
+        seo.analyze(document, url),
+        mobile.analyze(document, None, url),
+        performance.analyze(document, url),
+        accessibility.analyze(document, url),
+    ]
+
+
+SCENARIOS = {
+    'parse': lambda html, url: HtmlDocument(html),
+    'seo': lambda html, url: [seo.analyze(html, url)],
+    'mobile': lambda html, url: [mobile.analyze(html, None, url)],
+    'performance': lambda html, url: [performance.analyze(html, url)],
+    'accessibility': lambda html, url: [accessibility.analyze(html, url)],
+    'all': run_all,
+}
+
+
+def check(scenario, fixture, results):
+    """The analyzers catch their own errors; a benchmark of the error path is worthless"""
+    if scenario == 'parse':
+        return
+    for result in results:
+        if 'error' in result:
+            raise RuntimeError(f"{scenario} failed on {fixture.name}: {result['error']}")
+
+
+def measure(scenario, fixture, repeat, memory):
+    func = SCENARIOS[scenario]
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        results = func(fixture.html, fixture.url)
+        times.append(time.perf_counter() - start)
+        check(scenario, fixture, results)
+        del results
+
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func(fixture.html, fixture.url)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "median": statistics.median(times),
+        "min": min(times),
+        "size": fixture.size,
+        "peak_bytes": peak,
+    }
+
+
+def run(fixtures, scenarios, repeat, memory):
+    # Warm imports and caches outside the measurement
+    for scenario in scenarios:
+        SCENARIOS[scenario](fixtures[0].html, fixtures[0].url)
+
+    print(f"{'fixture':<22} {'scenario':<14} {'median':>10} {'min':>10} {'pages/s':>9} {'MB/s':>7} {'peak MB':>8}")
+    results = {}
+    for fixture in fixtures:
+        for scenario in scenarios:
+            result = measure(scenario, fixture, repeat, memory)
+            results[f"{fixture.name}/{scenario}"] = result
+            peak = f"{result['peak_bytes'] / MB:8.1f}" if result['peak_bytes'] is not None else f"{'-':>8}"
+            print(f"{fixture.name:<22} {scenario:<14} {result['median'] * 1000:8.1f}ms {result['min'] * 1000:8.1f}ms "
+                  f"{1 / result['median']:9.2f} {fixture.size / MB / result['median']:7.2f} {peak}")
+
+    print(f"\n{'scenario':<14} {'pages/s':>9} {'MB/s':>7}  (whole corpus)")
+    for scenario in scenarios:
+        entries = [results[f"{fixture.name}/{scenario}"] for fixture in fixtures]
+        seconds = sum(entry['median'] for entry in entries)
+        size = sum(entry['size'] for entry in entries)
+        print(f"{scenario:<14} {len(entries) / seconds:9.2f} {size / MB / seconds:7.2f}")
+    return results
+
+
+def compare(results, baseline, threshold, noise_ms):
+    """
+    Print each scenario's change against the baseline
+
+    Returns:
+        list: Keys of the scenarios that are more than threshold percent
+            (and more than noise_ms) slower
+    """
+    regressions = []
+    print(f"\n{'fixture/scenario (best)':<38} {'baseline':>10} {'current':>10} {'change':>8}")
+    for key, result in results.items():
+        previous = baseline['results'].get(key)
+        if previous is None:
+            print(f"{key:<38} {'-':>10} {result['min'] * 1000:8.1f}ms      new")
+            continue
+        change = (result['min'] / previous['min'] - 1) * 100
+        slower = change > threshold and (result['min'] - previous['min']) * 1000 > noise_ms
+        if slower:
+            regressions.append(key)
+        print(f"{key:<38} {previous['min'] * 1000:8.1f}ms {result['min'] * 1000:8.1f}ms "
+              f"{change:+7.1f}%{'  REGRESSION' if slower else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='*', choices=SIZE_CLASSES, help='Size classes to run (default all)')
+    parser.add_argument('--fixtures', nargs='*', choices=list(FIXTURES), help='Fixtures to run (default all)')
+    parser.add_argument('--scenarios', nargs='*', choices=list(SCENARIOS), default=list(SCENARIOS),
+                        help='Scenarios to run (default all)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per scenario')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the tracemalloc peak memory run')
+    parser.add_argument('--save', metavar='PATH', help='Write the results to PATH as a baseline')
+    parser.add_argument('--compare', metavar='PATH', help='Compare against the baseline at PATH')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Percent slowdown that fails --compare')
+    parser.add_argument('--noise-ms', type=float, default=1.0,
+                        help='Ignore slowdowns smaller than this many milliseconds')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as handle:
+            baseline = json.load(handle)
+        if baseline.get('corpus_version') != CORPUS_VERSION:
+            sys.exit(f"Baseline was recorded on corpus v{baseline.get('corpus_version')}, "
+                     f"this is v{CORPUS_VERSION}; record a new baseline")
+
+    fixtures = load_corpus(args.sizes, args.fixtures)
+    if not fixtures:
+        sys.exit("No fixtures selected")
+    print(f"Corpus v{CORPUS_VERSION}: {len(fixtures)} fixtures, parser {HTML_PARSER}, "
+          f"Python {platform.python_version()}, {args.repeat} runs each")
+    results = run(fixtures, args.scenarios, args.repeat, not args.no_memory)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as handle:
+            json.dump({
+                "corpus_version": CORPUS_VERSION,
+                "created": datetime.utcnow().isoformat(),
+                "python": platform.python_version(),
+                "machine": platform.platform(),
+                "parser": HTML_PARSER,
+                "repeat": args.repeat,
+                "results": results
+            }, handle, indent=2)
+        print(f"\nBaseline written to {args.save}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold, args.noise_ms)
+        if regressions:
+            print(f"\n{len(regressions)} scenarios are more than {args.threshold:g}% slower than the baseline")
+            sys.exit(1)
+        print(f"\nNo scenario is more than {args.threshold:g}% slower than the baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Compare the estimated prompt tokens of raw page HTML with the condensed
+skeleton sent to the LLM, and the time condensing takes.
+
+Run from the service root:
+
+    python -m benchmarks.condense_benchmark --size-kb 50 500 2000
+    python -m benchmarks.condense_benchmark --file page.html
+"""
+import argparse
+import time
+from benchmarks.parse_benchmark import build_page
+from services.html_document import HtmlDocument
+from services.html_condenser import condense_html, estimate_tokens, LLM_HTML_TOKEN_BUDGET
+
+
+def report(label, html):
+    document = HtmlDocument(html)
+    start = time.perf_counter()
+    condensed, stats = condense_html(document)
+    elapsed = time.perf_counter() - start
+    raw_tokens = estimate_tokens(html)
+    print(f"{label:<24} {raw_tokens:>10} {stats['condensed_tokens']:>10} "
+          f"{raw_tokens / max(stats['condensed_tokens'], 1):7.1f}x {elapsed * 1000:9.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-kb', type=int, nargs='*', default=[50, 500, 2000], help='Synthetic page sizes in KB')
+    parser.add_argument('--file', nargs='*', default=[], help='HTML files to condense instead')
+    args = parser.parse_args()
+
+    print(f"Token budget: {LLM_HTML_TOKEN_BUDGET}")
+    print(f"{'page':<24} {'raw tokens':>10} {'condensed':>10} {'ratio':>8} {'condense':>11}")
+    if args.file:
+        for path in args.file:
+            with open(path, encoding='utf-8', errors='replace') as handle:
+                report(path[-24:], handle.read())
+        return
+    for size in args.size_kb:
+        report(f"synthetic {size}KB", build_page(size * 1024))
+
+
+if __name__ == '__main__':
+    main()
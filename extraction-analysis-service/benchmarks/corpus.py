@@ -0,0 +1,476 @@
+"""
+Versioned HTML corpus for the analyzer benchmarks.
+
+Each fixture is built deterministically from a seeded generator modelled on
+a common page shape (landing page, SPA shell, article, product page,
+hydrated SPA, category listing, table-heavy report), so every machine
+benchmarks byte-identical input without storing megabytes in git. The
+SHA-256 of every fixture is pinned below; changing a generator without
+bumping CORPUS_VERSION and the checksums fails loudly instead of silently
+invalidating stored baselines.
+
+Write the fixtures to disk, or print fresh checksums after a change:
+
+    python -m benchmarks.corpus --write /tmp/corpus
+    python -m benchmarks.corpus --checksums
+"""
+import os
+import json
+import zlib
+import random
+import hashlib
+import argparse
+
+CORPUS_VERSION = 1
+
+SIZE_CLASSES = ('small', 'median', '2mb', '10mb')
+
+WORDS = (
+    "the of and to in is for on with as by at from that this it are be or an was "
+    "page site product data report service customer order account price shipping "
+    "return policy design mobile search results analysis performance content team "
+    "update release feature support guide review rating quality delivery payment "
+    "secure fast simple modern global local market business value growth insight"
+).split()
+
+FIRST_NAMES = ["Ana", "Ben", "Chen", "Dana", "Eli", "Fatima", "Goran", "Hana", "Ivan", "Jun"]
+CITIES = ["Berlin", "Lagos", "Lima", "Osaka", "Pune", "Quebec", "Seoul", "Toronto", "Warsaw", "Zurich"]
+
+
+def _words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def _sentence(rng, low=8, high=24):
+    text = _words(rng, rng.randint(low, high))
+    return text[0].upper() + text[1:] + "."
+
+
+def _paragraph(rng, sentences=4):
+    return " ".join(_sentence(rng) for _ in range(rng.randint(2, sentences)))
+
+
+def _head(title, description=None, extra=''):
+    meta = f'<meta name="description" content="{description}">' if description else ''
+    return (
+        '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">'
+        f'<title>{title}</title>{meta}'
+        '<meta name="viewport" content="width=device-width, initial-scale=1">'
+        f'{extra}</head>'
+    )
+
+
+def _nav(rng, links=6):
+    items = "".join(
+        f'<li class="nav-item"><a class="nav-link" href="/{_words(rng, 1)}">{_words(rng, 1).title()}</a></li>'
+        for _ in range(links)
+    )
+    return (
+        '<header class="site-header"><nav class="navbar navbar-expand-lg" role="navigation">'
+        f'<a class="navbar-brand" href="/"><img src="/img/logo.svg" alt="Logo" width="120" height="32"></a>'
+        f'<ul class="navbar-nav">{items}</ul>'
+        '<button class="btn btn-sm" aria-label="Menu">&#9776;</button></nav></header>'
+    )
+
+
+def _footer(rng):
+    columns = "".join(
+        f'<div class="col-6 col-md-3"><h4>{_words(rng, 2).title()}</h4><ul>'
+        + "".join(f'<li><a href="/{_words(rng, 1)}/{n}">{_words(rng, 2)}</a></li>' for n in range(5))
+        + '</ul></div>'
+        for _ in range(4)
+    )
+    return (
+        f'<footer class="site-footer"><div class="container"><div class="row">{columns}</div>'
+        '<p class="small">&copy; 2024 Example Corp. All rights reserved.</p></div></footer>'
+    )
+
+
+def _fill(parts, target_bytes, block, tail_bytes=0):
+    """Append block() results to parts until the page reaches target_bytes"""
+    size = sum(len(part) for part in parts) + tail_bytes
+    while size < target_bytes:
+        chunk = block()
+        parts.append(chunk)
+        size += len(chunk)
+
+
+def landing_page(rng, target_bytes):
+    """Marketing landing page: hero, feature cards, signup form"""
+    parts = [
+        _head("Example - Analytics for modern teams", _sentence(rng, 14, 20),
+              '<link rel="stylesheet" href="/css/site.css">'
+              '<style>.hero{padding:64px 0}.card{border-radius:8px}</style>'
+              '<script src="/js/analytics.js" async></script>'),
+        '<body>', _nav(rng),
+        '<main><section class="hero container"><h1>Analytics for modern teams</h1>'
+        f'<p class="lead">{_paragraph(rng, 2)}</p>'
+        '<a class="btn btn-primary btn-lg" href="/signup">Start free trial</a>'
+        '<img src="/img/hero.png" alt="" width="1200" height="600"></section>'
+        '<section class="features container"><div class="row">',
+    ]
+    tail = (
+        '</div></section><section class="signup container"><h2>Stay in the loop</h2>'
+        '<form action="/subscribe" method="post"><input type="email" name="email" placeholder="Email">'
+        '<button type="submit" class="btn btn-primary">Subscribe</button></form></section></main>'
+        + _footer(rng) + '</body></html>'
+    )
+
+    def block():
+        # About half the icons are missing alt text, as on many real landing pages
+        alt = f' alt="{_words(rng, 2)}"' if rng.random() < 0.5 else ''
+        return (
+            '<div class="col-12 col-md-4"><div class="card p-4">'
+            f'<img src="/img/icon-{rng.randint(1, 40)}.svg"{alt} width="48" height="48">'
+            f'<h3>{_words(rng, 3).title()}</h3><p style="font-size: 14px">{_paragraph(rng, 3)}</p>'
+            f'<a href="/features/{rng.randint(1, 99)}" class="small">Learn more</a></div></div>'
+        )
+
+    _fill(parts, target_bytes, block, len(tail))
+    parts.append(tail)
+    return "".join(parts)
+
+
+def spa_shell(rng, target_bytes):
+    """Unrendered single-page app: an empty root, preloads and script bundles"""
+    preloads = "".join(
+        f'<link rel="modulepreload" href="/assets/chunk-{rng.getrandbits(32):08x}.js">'
+        for _ in range(12)
+    )
+    parts = [
+        _head("App", None,
+              '<link rel="icon" href="/favicon.ico">'
+              f'<link rel="stylesheet" href="/assets/index-{rng.getrandbits(32):08x}.css">'
+              + preloads +
+              f'<script type="module" crossorigin src="/assets/index-{rng.getrandbits(32):08x}.js"></script>'),
+        '<body><noscript>You need to enable JavaScript to run this app.</noscript><div id="root"></div>',
+        '<script>window.__CONFIG__=',
+    ]
+    tail = ';</script></body></html>'
+    config = {}
+    size = sum(len(part) for part in parts) + len(tail) + 2
+    while size < target_bytes:
+        key = f"feature_{len(config)}"
+        config[key] = {"enabled": rng.random() < 0.5, "rollout": rng.randint(0, 100), "label": _words(rng, 4)}
+        size += len(json.dumps({key: config[key]}))
+    parts.append(json.dumps(config, separators=(',', ':')))
+    parts.append(tail)
+    return "".join(parts)
+
+
+def article_page(rng, target_bytes):
+    """Long-form blog article with figures, code samples, sidebar and comments"""
+    parts = [
+        _head(f"{_words(rng, 6).title()} | Example Blog", _sentence(rng, 18, 24),
+              '<link rel="canonical" href="https://blog.example.org/posts/example">'
+              '<meta property="og:title" content="Example article">'
+              '<link rel="stylesheet" href="/css/blog.min.css">'
+              '<script src="/js/vendor.js"></script>'),
+        '<body>', _nav(rng),
+        '<div class="container"><div class="row"><main class="col-md-8"><article>'
+        f'<h1>{_words(rng, 7).title()}</h1><p class="byline">By {rng.choice(FIRST_NAMES)}</p>',
+    ]
+    sidebar = "".join(
+        f'<li><a href="/posts/{rng.randint(100, 999)}">{_words(rng, 5)}</a></li>' for _ in range(10)
+    )
+    tail = (
+        '</article><section id="comments"><h2>Comments</h2>'
+        '<form><textarea name="comment"></textarea><input name="name" placeholder="Name">'
+        '<button>Post</button></form></section></main>'
+        f'<aside class="col-md-4"><h2>Related</h2><ul>{sidebar}</ul></aside></div></div>'
+        + _footer(rng) + '</body></html>'
+    )
+
+    def block():
+        section = [f'<h2>{_words(rng, 5).title()}</h2>']
+        for _ in range(rng.randint(3, 6)):
+            section.append(
+                f'<p>{_paragraph(rng, 5)} <a href="https://{rng.choice(WORDS)}.example.com/">{_words(rng, 2)}</a> '
+                f'{_paragraph(rng, 3)}</p>'
+            )
+        roll = rng.random()
+        if roll < 0.3:
+            section.append(
+                f'<figure><img src="/img/post-{rng.randint(1, 500)}.jpg" alt="{_words(rng, 4)}" '
+                f'loading="lazy" width="800" height="450"><figcaption>{_sentence(rng)}</figcaption></figure>'
+            )
+        elif roll < 0.5:
+            section.append(f'<pre><code class="language-python">def {rng.choice(WORDS)}():\n    return {rng.randint(0, 99)}</code></pre>')
+        elif roll < 0.6:
+            section.append(f'<blockquote><p>{_paragraph(rng, 2)}</p></blockquote>')
+        return "".join(section)
+
+    _fill(parts, target_bytes, block, len(tail))
+    parts.append(tail)
+    return "".join(parts)
+
+
+def product_page(rng, target_bytes):
+    """E-commerce product page: JSON-LD, gallery, variant form, tabs, reviews"""
+    structured = json.dumps({
+        "@context": "https://schema.org", "@type": "Product", "name": "Trail running shoe",
+        "offers": {"@type": "Offer", "price": "129.00", "priceCurrency": "EUR"},
+    })
+    # Only the first gallery image is loaded eagerly
+    gallery = "".join(
+        f'<img src="/media/shoe-{n}.webp" srcset="/media/shoe-{n}-640.webp 640w, /media/shoe-{n}-1280.webp 1280w" '
+        f'alt="Shoe view {n}"' + (' loading="lazy">' if n else '>')
+        for n in range(6)
+    )
+    options = "".join(f'<option value="{size}">EU {size}</option>' for size in range(36, 48))
+    parts = [
+        _head("Trail running shoe - Example Store", _sentence(rng, 16, 22),
+              f'<script type="application/ld+json">{structured}</script>'
+              '<link rel="stylesheet" href="/static/store.css">'
+              '<link rel="stylesheet" href="/static/vendor.min.css">'
+              '<script src="/static/store.js"></script><script src="/static/reviews.js" defer></script>'),
+        '<body>', _nav(rng, 9),
+        '<main class="container"><nav aria-label="breadcrumb"><ol class="breadcrumb">'
+        '<li><a href="/">Home</a></li><li><a href="/shoes">Shoes</a></li><li>Trail</li></ol></nav>'
+        f'<div class="row"><div class="col-md-7 gallery">{gallery}</div><div class="col-md-5">'
+        '<h1>Trail running shoe</h1><p class="price">&euro;129.00</p>'
+        f'<form action="/cart" method="post"><label for="size">Size</label><select id="size" name="size">{options}</select>'
+        '<input type="number" name="quantity" value="1"><button class="btn btn-primary">Add to cart</button></form>'
+        '</div></div><div role="tablist"><button role="tab" aria-selected="true">Details</button>'
+        '<button role="tab">Reviews</button></div><section role="tabpanel"><h2>Reviews</h2>',
+    ]
+    recommendations = "".join(
+        f'<div class="card"><a href="/p/{rng.randint(1000, 9999)}"><img src="/media/rec-{n}.webp">'
+        f'<span>{_words(rng, 3)}</span></a></div>'
+        for n in range(8)
+    )
+    tail = (
+        f'</section><section class="recommendations"><h2>You may also like</h2>{recommendations}</section></main>'
+        + _footer(rng) + '</body></html>'
+    )
+
+    def block():
+        stars = rng.randint(1, 5)
+        return (
+            f'<div class="review" itemprop="review"><div class="stars" aria-label="{stars} out of 5">'
+            + '&#9733;' * stars +
+            f'</div><h3>{_words(rng, 4).title()}</h3><p>{_paragraph(rng, 3)}</p>'
+            f'<p class="meta"><small style="font-size: 11px">{rng.choice(FIRST_NAMES)}, {rng.choice(CITIES)}</small></p>'
+            '<button class="helpful" style="padding: 2px">Helpful</button></div>'
+        )
+
+    _fill(parts, target_bytes, block, len(tail))
+    parts.append(tail)
+    return "".join(parts)
+
+
+def _listing_card(rng):
+    return (
+        f'<div class="col-6 col-lg-3"><div class="card product-card" data-sku="{rng.getrandbits(40):010x}">'
+        f'<a href="/p/{rng.randint(10000, 99999)}"><img class="card-img-top" src="/media/p{rng.randint(1, 9999)}.webp" '
+        f'alt="{_words(rng, 3)}" loading="lazy" width="300" height="300"></a>'
+        f'<div class="card-body"><h3 class="card-title h6">{_words(rng, 4).title()}</h3>'
+        f'<p class="price">&euro;{rng.randint(5, 500)}.{rng.randint(0, 99):02d}</p>'
+        '<button class="btn btn-outline-primary btn-sm">Add</button></div></div></div>'
+    )
+
+
+def hydrated_spa(rng, target_bytes):
+    """Server-rendered SPA: rendered cards plus the serialized state it hydrates from"""
+    parts = [
+        _head("Discover | Example", _sentence(rng, 14, 20),
+              '<link rel="preload" href="/_next/static/css/app.css" as="style">'
+              '<link rel="stylesheet" href="/_next/static/css/app.css">'
+              '<script src="/_next/static/chunks/main.js" defer></script>'),
+        '<body><div id="__next">', _nav(rng),
+        '<main class="container"><h1>Discover</h1><div class="row">',
+    ]
+    state = {"props": {"pageProps": {"items": []}}, "page": "/discover", "buildId": f"{rng.getrandbits(48):012x}"}
+    items = state["props"]["pageProps"]["items"]
+    head_bytes = sum(len(part) for part in parts)
+    # Roughly a third of the page is markup and the rest the serialized state
+    markup_bytes = head_bytes
+    state_bytes = 0
+    while markup_bytes + state_bytes < target_bytes:
+        if markup_bytes < target_bytes / 3:
+            card = _listing_card(rng)
+            parts.append(card)
+            markup_bytes += len(card)
+        item = {
+            "id": rng.getrandbits(40), "title": _words(rng, 4), "summary": _sentence(rng),
+            "price": rng.randint(500, 50000), "tags": [rng.choice(WORDS) for _ in range(4)],
+            "seller": {"name": rng.choice(FIRST_NAMES), "city": rng.choice(CITIES)},
+        }
+        items.append(item)
+        state_bytes += len(json.dumps(item)) + 1
+    parts.append('</div></main>' + _footer(rng) + '</div>')
+    parts.append('<script id="__NEXT_DATA__" type="application/json">')
+    parts.append(json.dumps(state, separators=(',', ':')))
+    parts.append('</script></body></html>')
+    return "".join(parts)
+
+
+def category_listing(rng, target_bytes):
+    """Category page: faceted filter form and a long grid of product cards"""
+    facets = "".join(
+        f'<div class="form-check"><input class="form-check-input" type="checkbox" id="f{n}" name="brand">'
+        f'<label class="form-check-label" for="f{n}">{_words(rng, 1).title()}</label></div>'
+        for n in range(24)
+    )
+    parts = [
+        _head("Shoes - Example Store", _sentence(rng, 16, 22),
+              '<link rel="stylesheet" href="https://cdn.example.net/bootstrap/5.3/bootstrap.min.css">'
+              '<link rel="stylesheet" href="/static/store.css"><script src="/static/store.js"></script>'),
+        '<body>', _nav(rng, 9),
+        f'<div class="container-fluid"><div class="row"><aside class="col-md-3"><form>{facets}'
+        '<input type="range" name="price" min="0" max="500"><button>Apply</button></form></aside>'
+        '<main class="col-md-9"><h1>Shoes</h1><div class="row">',
+    ]
+    pages = "".join(f'<li class="page-item"><a class="page-link" href="?page={n}">{n}</a></li>' for n in range(1, 11))
+    tail = (
+        f'</div><nav><ul class="pagination">{pages}</ul></nav></main></div></div>'
+        + _footer(rng) + '</body></html>'
+    )
+    _fill(parts, target_bytes, lambda: _listing_card(rng), len(tail))
+    parts.append(tail)
+    return "".join(parts)
+
+
+def table_report(rng, target_bytes):
+    """Admin-style data export: a few wide tables of thousands of rows"""
+    columns = ["Order", "Customer", "City", "Date", "Items", "Total", "Status", "Actions"]
+    header = "".join(f'<th scope="col">{name}</th>' for name in columns)
+    parts = [
+        _head("Orders report - Example Admin", None,
+              '<link rel="stylesheet" href="/admin/admin.css"><script src="/admin/admin.js"></script>'),
+        '<body>', _nav(rng, 4),
+        '<main class="container-fluid"><h1>Orders report</h1>',
+    ]
+    tail = '</main></body></html>'
+    statuses = ["paid", "pending", "shipped", "refunded", "cancelled"]
+    rows_per_table = 2000
+    state = {"rows": rows_per_table, "table": 0}
+
+    def block():
+        chunk = []
+        if state["rows"] >= rows_per_table:
+            if state["table"]:
+                chunk.append('</tbody></table>')
+            state["table"] += 1
+            state["rows"] = 0
+            chunk.append(
+                f'<table class="table table-striped table-sm"><caption>Region {state["table"]}</caption>'
+                f'<thead><tr>{header}</tr></thead><tbody>'
+            )
+        order = rng.randint(100000, 999999)
+        status = rng.choice(statuses)
+        chunk.append(
+            f'<tr><td><a href="/admin/orders/{order}">#{order}</a></td>'
+            f'<td>{rng.choice(FIRST_NAMES)} {rng.choice(FIRST_NAMES)}son</td><td>{rng.choice(CITIES)}</td>'
+            f'<td>2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}</td><td>{rng.randint(1, 12)}</td>'
+            f'<td style="text-align: right">{rng.randint(5, 2000)}.{rng.randint(0, 99):02d}</td>'
+            f'<td><span class="badge badge-{status}">{status}</span></td>'
+            f'<td><button class="btn btn-link btn-sm" title="Edit">&#9998;</button></td></tr>'
+        )
+        state["rows"] += 1
+        return "".join(chunk)
+
+    _fill(parts, target_bytes, block, len(tail) + len('</tbody></table>'))
+    parts.append('</tbody></table>' + tail)
+    return "".join(parts)
+
+
+KB = 1024
+MB = 1024 * 1024
+
+# name -> (size class, generator, target size in bytes)
+FIXTURES = {
+    'small-landing': ('small', landing_page, 24 * KB),
+    'small-spa-shell': ('small', spa_shell, 6 * KB),
+    'median-article': ('median', article_page, 90 * KB),
+    'median-product': ('median', product_page, 140 * KB),
+    'median-spa-hydrated': ('median', hydrated_spa, 200 * KB),
+    '2mb-category-listing': ('2mb', category_listing, 2 * MB),
+    '2mb-table-report': ('2mb', table_report, 2 * MB),
+    '10mb-spa-hydrated': ('10mb', hydrated_spa, 10 * MB),
+    '10mb-table-report': ('10mb', table_report, 10 * MB),
+}
+
+# SHA-256 of each fixture at CORPUS_VERSION
+CHECKSUMS = {
+    'small-landing': 'ff435b134ac59a09f8b3ff90712b5fa6f956ec9f596c4771cf35580dfa8d4e33',
+    'small-spa-shell': '7d9ba754fa93aad168d780885d0126946150f2a206608356160eb25e2590d0c7',
+    'median-article': '3fdebfd743d85911a8a924a9efc84cb444724e77be04d732342552faef8035a7',
+    'median-product': '65c575ab6832fc1cb51267a50518e3642059b0d683ccee6cd6cc0bf6cc603f77',
+    'median-spa-hydrated': '6ab528feb75592d38dcfc4f184dbaff8fc49f5ce7b658304541810c253b67dbb',
+    '2mb-category-listing': 'fa968586d3450df584f37aad3e6c97e1e49d7c06f866466a8dab6080af22f60f',
+    '2mb-table-report': '0a14c8341aa8a3a65af2968bccbb6b1c3a2ee2b881392864a35811b60c7cb52d',
+    '10mb-spa-hydrated': 'c83c1b2727dfb337f69d93ac75bc7645422f4331fec2e3d53f785b9d9f719f87',
+    '10mb-table-report': 'e8898495cce7ca4f2f12a2b75d46ac3bd653eeaebd4d816c54da6db297ef1800',
+}
+
+
+class Fixture:
+    """One corpus page"""
+
+    def __init__(self, name, size_class, html):
+        self.name = name
+        self.size_class = size_class
+        self.html = html
+        self.size = len(html.encode('utf-8'))
+        self.url = f"https://{name}.example.org/"
+
+
+def build_fixture(name):
+    """Generate a fixture's HTML; the seed is derived from its name"""
+    size_class, generator, target_bytes = FIXTURES[name]
+    rng = random.Random(zlib.crc32(f"{CORPUS_VERSION}:{name}".encode()))
+    return generator(rng, target_bytes)
+
+
+def load_corpus(size_classes=None, names=None):
+    """
+    Build the corpus fixtures and check them against the pinned checksums
+
+    Args:
+        size_classes: Only fixtures of these size classes (default all)
+        names: Only fixtures with these names (default all)
+
+    Returns:
+        list: Fixture objects, in FIXTURES order
+
+    Raises:
+        ValueError: When a fixture no longer matches its checksum
+    """
+    fixtures = []
+    for name, (size_class, _, _) in FIXTURES.items():
+        if size_classes and size_class not in size_classes:
+            continue
+        if names and name not in names:
+            continue
+        html = build_fixture(name)
+        digest = hashlib.sha256(html.encode('utf-8')).hexdigest()
+        if CHECKSUMS.get(name) != digest:
+            raise ValueError(
+                f"Corpus fixture {name} does not match corpus v{CORPUS_VERSION}; "
+                "bump CORPUS_VERSION and update CHECKSUMS after changing a generator"
+            )
+        fixtures.append(Fixture(name, size_class, html))
+    return fixtures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--write', metavar='DIR', help='Write every fixture to DIR/<name>.html')
+    parser.add_argument('--checksums', action='store_true', help='Print the CHECKSUMS of the current generators')
+    args = parser.parse_args()
+
+    for name in FIXTURES:
+        html = build_fixture(name)
+        if args.checksums:
+            print(f"    '{name}': '{hashlib.sha256(html.encode('utf-8')).hexdigest()}',")
+        else:
+            print(f"{name:<24} {FIXTURES[name][0]:>6} {len(html) / KB:10.1f}KB")
+        if args.write:
+            os.makedirs(args.write, exist_ok=True)
+            with open(os.path.join(args.write, f"{name}.html"), 'w', encoding='utf-8') as handle:
+                handle.write(html)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Compare per-fetch latency of bare requests.get calls with the shared,
+pooled HTTP client used by SiteService.fetch_html.
+
+Without --url a local keep-alive server is started, which shows the TCP
+setup saved per fetch; against a real HTTPS site the savings also include
+DNS and TLS. Run from the service root:
+
+    python -m benchmarks.fetch_benchmark --fetches 200
+    python -m benchmarks.fetch_benchmark --url https://example.com/ --fetches 20
+"""
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from benchmarks.parse_benchmark import build_page
+from services.http_client import HttpClient
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Headers and body are separate writes
+    body = b''
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_local_server(page_bytes):
+    _KeepAliveHandler.body = build_page(page_bytes).encode()
+    server = ThreadingHTTPServer(('localhost', 0), _KeepAliveHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://localhost:{server.server_address[1]}/"
+
+
+def time_fetches(fetch, url, fetches):
+    """Return the mean seconds per fetch"""
+    fetch(url)  # Warm up so one-off imports and first connections are not counted
+    start = time.perf_counter()
+    for _ in range(fetches):
+        fetch(url)
+    return (time.perf_counter() - start) / fetches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Page to fetch (default: a local keep-alive server)')
+    parser.add_argument('--fetches', type=int, default=200, help='Fetches per scenario')
+    parser.add_argument('--page-kb', type=int, default=64, help='Size of the local page in KB')
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server, url = start_local_server(args.page_kb * 1024)
+    print(f"Fetching {url} {args.fetches} times per scenario")
+
+    client = HttpClient()
+    scenarios = [
+        ("requests.get (new pool per call)", lambda target: requests.get(target, timeout=30).content),
+        ("shared HttpClient", lambda target: client.get(target).content),
+    ]
+
+    baseline = None
+    for name, fetch in scenarios:
+        elapsed = time_fetches(fetch, url, args.fetches)
+        baseline = baseline or elapsed
+        print(f"{name:<40} {elapsed * 1000:8.2f}ms  {baseline / elapsed:5.1f}x")
+
+    client.close()
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
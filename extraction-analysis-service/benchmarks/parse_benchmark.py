@@ -0,0 +1,153 @@
+"""
+Compare the end-to-end parse cost of one evaluation before and after the
+analyzers started sharing a single parsed document.
+
+With --parity, instead check that the shared parser scores the versioned
+corpus exactly like html.parser did. Parsers repair broken markup
+differently (stray end tags, unclosed elements, misnested tables), so on
+malformed pages the analyzer figures and scores may shift; those samples
+are reported but do not fail the check. Run from the service root:
+
+    python -m benchmarks.parse_benchmark --size-mb 2 --repeat 3
+    python -m benchmarks.parse_benchmark --parity --sizes small median 2mb
+"""
+import sys
+import argparse
+import time
+from bs4 import BeautifulSoup
+from benchmarks.corpus import load_corpus, SIZE_CLASSES
+from services.analysis_pool import analyze_document
+from services.html_document import HtmlDocument, HTML_PARSER
+
+ANALYZER_COUNT = 4  # SEO, mobile, performance and accessibility
+
+# Fields that differ between any two runs
+VOLATILE_FIELDS = ('timestamp', 'execution_time')
+
+# Broken markup that parsers are known to repair differently
+MALFORMED_SAMPLES = {
+    'unclosed-elements': '<html><body><h1>Title<p>Text <b>bold <img src="a.png"><div>more</body>',
+    'stray-end-tags': '<html><body></div><h1>One</h1></h1><p>Text</span></p><iframe src="/x"></body></html>',
+    'misnested-table': '<table><tr><td>Cell<div><h1>Heading</h1></td><p style="font-size: 10px">Text</p></table>',
+    'content-after-html': '<html><body><p>Text</p></body></html><h1>Late</h1><img src="late.png">',
+}
+
+
+def build_page(target_bytes):
+    """Build a synthetic page of roughly target_bytes with a realistic tag mix"""
+    head = (
+        '<!DOCTYPE html><html lang="en"><head><title>Benchmark page</title>'
+        '<meta name="viewport" content="width=device-width, initial-scale=1">'
+        '<meta name="description" content="Synthetic page used to benchmark HTML parsing.">'
+        '<link rel="stylesheet" href="/static/app.min.css">'
+        '<script src="/static/app.js"></script></head><body><header><nav>'
+        '<a href="/">Home</a><a href="/about">About</a></nav></header><main>'
+    )
+    block = (
+        '<section class="container"><div class="row"><div class="col-md-6">'
+        '<h2>Section heading</h2><p style="font-size: 12px">Lorem ipsum dolor sit amet, '
+        'consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore.</p>'
+        '<img src="/img/photo.jpg" alt="Photo" loading="lazy">'
+        '<a href="https://example.org/page">External link</a></div>'
+        '<form><label for="q">Search</label><input id="q" name="q"><button>Go</button></form>'
+        '</div></section>'
+    )
+    tail = '</main><footer>Footer</footer></body></html>'
+    repeats = max(1, (target_bytes - len(head) - len(tail)) // len(block))
+    return head + block * repeats + tail
+
+
+def time_best(func, repeat):
+    """Return the best wall-clock time of func over repeat runs"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def scored_fields(html, parser):
+    """Analyzer results of a page parsed with parser, without the volatile fields"""
+    results, _, _ = analyze_document(HtmlDocument(html, parser=parser), 'https://example.com/')
+    return {
+        stage: {key: value for key, value in result.items() if key not in VOLATILE_FIELDS}
+        for stage, (result, _) in results.items()
+    }
+
+
+def differences(html):
+    """Fields whose values differ between html.parser and the shared parser"""
+    reference = scored_fields(html, 'html.parser')
+    shared = scored_fields(html, HTML_PARSER)
+    return [
+        f"{stage}.{key}: {reference[stage].get(key)!r} -> {shared[stage].get(key)!r}"
+        for stage in reference
+        for key in sorted(set(reference[stage]) | set(shared[stage]))
+        if reference[stage].get(key) != shared[stage].get(key)
+    ]
+
+
+def check_parity(size_classes):
+    """
+    Compare analyzer output under html.parser and HTML_PARSER
+
+    Returns:
+        bool: True if every corpus fixture scored the same
+    """
+    print(f"Parity of {HTML_PARSER} with html.parser")
+    same = True
+    for fixture in load_corpus(size_classes):
+        changed = differences(fixture.html)
+        same = same and not changed
+        print(f"  {fixture.name:<24} {'same' if not changed else 'DIFFERENT'}")
+        for line in changed:
+            print(f"      {line}")
+    print("Malformed samples (differences expected, not failures)")
+    for name, html in MALFORMED_SAMPLES.items():
+        changed = differences(html)
+        print(f"  {name:<24} {'same' if not changed else f'{len(changed)} fields differ'}")
+        for line in changed:
+            print(f"      {line}")
+    return same
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=float, default=2.0, help='Size of the synthetic page in MB')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per scenario (best is reported)')
+    parser.add_argument('--parity', action='store_true',
+                        help='Check analyzer output against html.parser instead of timing; exits 1 on corpus differences')
+    parser.add_argument('--sizes', nargs='*', choices=SIZE_CLASSES, help='Corpus size classes for --parity (default all)')
+    args = parser.parse_args()
+
+    if args.parity:
+        if HTML_PARSER == 'html.parser':
+            sys.exit("HTML_PARSER is html.parser; nothing to compare")
+        sys.exit(0 if check_parity(args.sizes) else 1)
+
+    html = build_page(int(args.size_mb * 1024 * 1024))
+    print(f"Page size: {len(html) / 1024 / 1024:.2f}MB, shared parser: {HTML_PARSER}")
+
+    def per_analyzer():
+        # Previous behaviour: every analyzer built its own html.parser soup
+        for _ in range(ANALYZER_COUNT):
+            BeautifulSoup(html, 'html.parser')
+
+    scenarios = [
+        (f"{ANALYZER_COUNT}x html.parser (per analyzer)", per_analyzer),
+        ("1x html.parser (shared)", lambda: HtmlDocument(html, parser='html.parser')),
+    ]
+    if HTML_PARSER != 'html.parser':
+        scenarios.append((f"1x {HTML_PARSER} (shared)", lambda: HtmlDocument(html)))
+
+    baseline = None
+    for name, func in scenarios:
+        elapsed = time_best(func, args.repeat)
+        baseline = baseline or elapsed
+        print(f"{name:<40} {elapsed:8.3f}s  {baseline / elapsed:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
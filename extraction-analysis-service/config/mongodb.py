@@ -1,12 +1,16 @@
 from pymongo import MongoClient
+from utils.tracing import MongoWriteListener
 
 def init_db(mongo_uri):
     """Initialize MongoDB connection and return database"""
-    client = MongoClient(mongo_uri)
+    # Times every write for /metrics and the evaluation's stage breakdown
+    client = MongoClient(mongo_uri, event_listeners=[MongoWriteListener()])
     db = client.site_evaluator
     
     # Ensure indexes for better query performance
     db.evaluations.create_index("userId")
     db.evaluations.create_index("url")
+    db.evaluations.create_index([("normalized_url", 1), ("timestamp", -1)])
+    db.evaluation_status.create_index([("batch_id", 1), ("status", 1)])
     
     return db
\ No newline at end of file
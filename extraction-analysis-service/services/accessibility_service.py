@@ -1,5 +1,141 @@
-from bs4 import BeautifulSoup
+import time
 from datetime import datetime
+from services.html_document import HtmlDocument
+from services.dom_walker import Collector, register_collector
+from services.rule_engine import Rule, register_rule, score_rules, IMAGES_WITHOUT_ALT
+
+LANDMARK_TAGS = ('header', 'nav', 'main', 'footer', 'aside')
+FORM_CONTROL_TAGS = ('input', 'select', 'textarea')
+# Inputs that need no label: hidden ones are never presented, and submit
+# and reset buttons are named by their value or the browser's default
+UNLABELLED_INPUT_TYPES = ('hidden', 'submit', 'reset')
+
+
+@register_collector
+class AccessibilityFacts(Collector):
+    """Accessibility facts gathered during the shared tree walk"""
+
+    name = 'accessibility'
+    tags = None  # role attributes can appear on any element
+    wants_text = True
+
+    def __init__(self):
+        self.html_tag = None
+        self.images = []
+        self.ids = set()
+        self.label_fors = set()
+        # Controls not named by their own attributes or an enclosing
+        # <label>: (id, aria-labelledby ids), resolved once the walk is done
+        self.unresolved_controls = []
+        self.form_control_count = 0
+        self.landmarks = set()
+        self.body_text_length = 0
+        self.has_aria_roles = False
+        self._body = None
+        self._in_body = False
+        self._open_labels = 0
+
+    @property
+    def has_body(self):
+        return self._body is not None
+
+    def start(self, tag):
+        name = tag.name
+        if not self.has_aria_roles and tag.get('role') is not None:
+            self.has_aria_roles = True
+        tag_id = tag.get('id')
+        if tag_id:
+            self.ids.add(tag_id)
+
+        if name in FORM_CONTROL_TAGS:
+            self._add_control(tag, tag_id)
+        elif name == 'img':
+            self.images.append(tag)
+        elif name == 'label':
+            self._open_labels += 1
+            label_for = tag.get('for')
+            if label_for:
+                self.label_fors.add(label_for)
+        elif name in LANDMARK_TAGS:
+            self.landmarks.add(name)
+        elif name == 'html':
+            if self.html_tag is None:
+                self.html_tag = tag
+        elif name == 'body':
+            if self._body is None:
+                self._body = tag
+                self._in_body = True
+
+    def end(self, tag):
+        name = tag.name
+        if name == 'label':
+            self._open_labels -= 1
+        elif tag is self._body:
+            self._in_body = False
+
+    def text(self, string):
+        if self._in_body:
+            self.body_text_length += len(string.strip())
+
+    def _add_control(self, tag, tag_id):
+        """Count a form control and keep it for resolution unless it names itself"""
+        named_by = ('aria-label', 'title')
+        if tag.name == 'input':
+            input_type = (tag.get('type') or 'text').strip().lower()
+            if input_type in UNLABELLED_INPUT_TYPES:
+                return
+            # Buttons and image buttons are named by their value and alt text
+            if input_type == 'button':
+                named_by += ('value',)
+            elif input_type == 'image':
+                named_by += ('alt',)
+        self.form_control_count += 1
+        if self._open_labels or any((tag.get(attr) or '').strip() for attr in named_by):
+            return
+        self.unresolved_controls.append((tag_id, (tag.get('aria-labelledby') or '').split()))
+
+    def unlabelled_control_count(self):
+        """
+        Count form controls without an accessible name
+
+        A control is labelled by an enclosing <label>, a <label for> its id
+        anywhere on the page, aria-labelledby pointing at an element of the
+        page, or its own aria-label or title. Labels and referenced elements
+        may come after the control, so this runs after the walk, with one
+        set lookup per control.
+        """
+        return sum(
+            1 for control_id, labelled_by in self.unresolved_controls
+            if not (control_id and control_id in self.label_fors)
+            and not any(reference in self.ids for reference in labelled_by)
+        )
+
+
+for _rule in (
+    Rule('accessibility.lang-missing', 'accessibility', 'high', 15, "The <html> tag is missing a 'lang' attribute.",
+         lambda v: not v['lang']),
+    Rule('accessibility.images-missing-alt', 'accessibility', 'medium', 10,
+         "{count} out of {total} images are missing alt text.",
+         lambda v: v['total'] > 0 and v['count'] / v['total'] * 100 > 20, elements=IMAGES_WITHOUT_ALT),
+    Rule('accessibility.form-labels', 'accessibility', 'medium', 10,
+         "{form_issue_count} form elements are missing associated labels.",
+         lambda v: v['form_issue_count'] > 0),
+    Rule('accessibility.landmarks-missing', 'accessibility', 'low', 5,
+         "Missing landmark/semantic regions: {missing_landmarks}.",
+         lambda v: v['missing_landmark_count'] > 0, scale='missing_landmark_count'),
+    # Sufficient color contrast and readable text are more complex to check;
+    # here we simply check if <body> contains a significant amount of text
+    Rule('accessibility.little-text', 'accessibility', 'low', 5,
+         "Page has very little text, which may affect content comprehension.",
+         lambda v: v['has_body'] and v['body_text_length'] < 200),
+    # Best practice rather than a strict WCAG requirement, and semantic HTML
+    # may be enough, so it reports without deducting
+    Rule('accessibility.no-aria-roles', 'accessibility', 'low', 0,
+         "No ARIA roles found. Consider using ARIA where semantic HTML is insufficient.",
+         lambda v: not v['has_aria_roles']),
+):
+    register_rule(_rule)
+
 
 class AccessibilityService:
     """
@@ -11,104 +147,45 @@ class AccessibilityService:
         Analyze accessibility aspects of a website.
 
         Args:
-            html_content (str): HTML content of the page.
+            html_content (str | HtmlDocument): HTML content of the page, or a
+                parsed document shared with the other analyzers.
             url (str): URL of the page.
 
         Returns:
             dict: Accessibility analysis results.
         """
-        start_time = datetime.utcnow()
-        soup = BeautifulSoup(html_content, 'html.parser')
-        issues = []
-        score = 100
+        start_time = time.perf_counter()
+        document = HtmlDocument.from_content(html_content)
+        facts = document.facts(AccessibilityFacts.name)
 
         # 1. Language attribute on <html> (WCAG 3.1.1)
-        html_tag = soup.find('html')
+        html_tag = facts.html_tag
         lang = html_tag.get('lang') if html_tag else None
-        if not lang:
-            issues.append({
-                "severity": "high",
-                "message": "The <html> tag is missing a 'lang' attribute."
-            })
-            score -= 15
 
         # 2. Images should have alt text (WCAG 1.1.1)
-        images = soup.find_all('img')
+        images = facts.images
         total_images = len(images)
         images_missing_alt = [img for img in images if not img.get('alt', '').strip()]
-        if total_images > 0:
-            percent_missing = (len(images_missing_alt) / total_images) * 100
-            if percent_missing > 20:
-                issues.append({
-                    "severity": "medium",
-                    "message": f"{len(images_missing_alt)} out of {total_images} images are missing alt text."
-                })
-                score -= 10
-
-        # 3. Form elements should have associated labels (WCAG 1.3.1 & 2.5.3)
-        forms = soup.find_all('form')
-        form_issue_count = 0
-        for form in forms:
-            inputs = form.find_all(['input', 'select', 'textarea'])
-            for input_elem in inputs:
-                input_id = input_elem.get('id')
-                label = None
-                if input_id:
-                    label = form.find('label', attrs={'for': input_id})
-                if not label:
-                    # Alternatively, check if input is wrapped by a label
-                    parent = input_elem.find_parent('label')
-                    if parent:
-                        label = parent
-                if not label:
-                    form_issue_count += 1
-
-        if form_issue_count > 0:
-            issues.append({
-                "severity": "medium",
-                "message": f"{form_issue_count} form elements are missing associated labels."
-            })
-            score -= 10
+
+        # 3. Form elements should have associated labels (WCAG 1.3.1 & 2.5.3),
+        # inside a <form> or not
+        form_issue_count = facts.unlabelled_control_count()
 
         # 4. Landmark and semantic elements (WCAG 2.4.1)
-        landmarks = {
-            "header": soup.find('header'),
-            "nav": soup.find('nav'),
-            "main": soup.find('main'),
-            "footer": soup.find('footer'),
-            "aside": soup.find('aside')
-        }
-        missing_landmarks = [key for key, val in landmarks.items() if not val]
-        if missing_landmarks:
-            issues.append({
-                "severity": "low",
-                "message": f"Missing landmark/semantic regions: {', '.join(missing_landmarks)}."
-            })
-            score -= 5 * len(missing_landmarks)
-
-        # 5. Ensure sufficient color contrast and readable text is more complex;
-        # Here, we simply check if <body> contains a significant amount of text.
-        body = soup.find('body')
-        if body:
-            text_content = body.get_text(strip=True)
-            if len(text_content) < 200:  # Example heuristic
-                issues.append({
-                    "severity": "low",
-                    "message": "Page has very little text, which may affect content comprehension."
-                })
-                score -= 5
-
-        # 6. ARIA roles on interactive elements (best practice, not a strict WCAG requirement)
-        aria_elements = soup.find_all(attrs={"role": True})
-        if not aria_elements:
-            issues.append({
-                "severity": "low",
-                "message": "No ARIA roles found. Consider using ARIA where semantic HTML is insufficient."
-            })
-            # Not subtracting heavily since semantic HTML might be used.
-
-        # Bound score between 0 and 100
-        score = max(0, min(100, score))
+        missing_landmarks = [key for key in LANDMARK_TAGS if key not in facts.landmarks]
+
+        # 5. Text in <body> and 6. ARIA roles are read straight from the facts.
+        # Issues and score come from the active rules of the document's profile
+        issues, score = score_rules(document, 'accessibility', {
+            "lang": lang,
+            "form_issue_count": form_issue_count,
+            "missing_landmarks": ', '.join(missing_landmarks),
+            "missing_landmark_count": len(missing_landmarks),
+            "has_body": facts.has_body,
+            "body_text_length": facts.body_text_length,
+            "has_aria_roles": facts.has_aria_roles,
+        })
+
         if score >= 90:
             rating = "Excellent"
         elif score >= 80:
@@ -120,16 +197,14 @@ class AccessibilityService:
         else:
             rating = "Very Poor"
 
-        end_time = datetime.utcnow()
-        execution_time = (end_time - start_time).total_seconds()
-
         return {
-            "timestamp": end_time.isoformat(),
-            "execution_time": execution_time,
+            "timestamp": datetime.utcnow().isoformat(),
+            "execution_time": time.perf_counter() - start_time,
             "score": score,
             "rating": rating,
             "total_images": total_images,
             "missing_image_alts": len(images_missing_alt),
+            "form_controls": facts.form_control_count,
             "form_issue_count": form_issue_count,
             "issues": issues
         }
\ No newline at end of file
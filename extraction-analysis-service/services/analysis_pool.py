@@ -0,0 +1,325 @@
+import os
+import sys
+import time
+import queue
+import atexit
+import itertools
+import threading
+import multiprocessing
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory, resource_tracker
+from services.html_document import HtmlDocument
+from services.html_condenser import condense_html
+from services.seo_service import SeoService
+from services.mobile_service import MobileService
+from services.performance_service import PerformanceService
+from services.accessibility_service import AccessibilityService
+
+# process: analyse in a pool of worker processes, thread: in the calling thread
+ANALYSIS_POOL = os.getenv("ANALYSIS_POOL", "process")
+# Processes on this host that each run an analysis pool: gunicorn workers
+# (WEB_CONCURRENCY) or worker.py processes, which set it themselves. The
+# default pool size splits the host's cores between them.
+ANALYSIS_POOLS_PER_HOST = int(os.getenv("ANALYSIS_POOLS_PER_HOST", os.getenv("WEB_CONCURRENCY", 1)))
+ANALYSIS_PROCESSES = int(os.getenv(
+    "ANALYSIS_PROCESSES", max(1, (os.cpu_count() or 2) // max(1, ANALYSIS_POOLS_PER_HOST))
+))
+
+# Imported once by the fork server so new workers start with them loaded
+PRELOAD_MODULES = [
+    'bs4',
+    'services.html_document',
+    'services.html_condenser',
+    'services.seo_service',
+    'services.mobile_service',
+    'services.performance_service',
+    'services.accessibility_service',
+    'services.analysis_pool',
+]
+
+# Analyzer instances of the current process, built once per worker
+_analyzers = None
+# Queue a worker sends finished stages back on, set by _init_worker
+_updates = None
+
+
+def _get_analyzers():
+    global _analyzers
+    if _analyzers is None:
+        _analyzers = {
+            'seo': SeoService(),
+            'mobile': MobileService(),
+            'performance': PerformanceService(),
+            'accessibility': AccessibilityService(),
+        }
+    return _analyzers
+
+
+def analyze_document(document, url, on_stage=None):
+    """
+    Run the four analyzers over one parsed document and condense it for the LLM
+
+    The analyzers share the document's single tree walk, so running them
+    one after another costs the same as running them on threads. The walk
+    runs up front so each analyzer's time is its own.
+
+    Args:
+        document: HtmlDocument of the page
+        url: URL of the page
+        on_stage: Optional callable(stage, result, seconds) called as each
+            analyzer finishes
+
+    Returns:
+        tuple: ({stage: (result, seconds)}, (condensed html, condense stats),
+        {"parse", "walk", "condense": seconds})
+    """
+    analyzers = _get_analyzers()
+    document.walk()
+    results = {}
+    for stage in ('seo', 'mobile', 'performance', 'accessibility'):
+        started = time.perf_counter()
+        if stage == 'mobile':
+            result = analyzers[stage].analyze(document, None, url)
+        else:
+            result = analyzers[stage].analyze(document, url)
+        results[stage] = (result, time.perf_counter() - started)
+        if on_stage is not None:
+            on_stage(stage, result, results[stage][1])
+    started = time.perf_counter()
+    condensed = condense_html(document)
+    timings = {
+        "parse": document.parse_seconds,
+        "walk": document.walk_seconds,
+        "condense": time.perf_counter() - started,
+    }
+    return results, condensed, timings
+
+
+def _attach_segment(name):
+    """
+    Open the parent's shared memory segment without taking ownership of it
+
+    The parent creates and unlinks the segment. Before Python 3.13 attaching
+    also registers it with the resource tracker, as if the worker owned it.
+    A worker with its own tracker then warns about a leak, or unlinks the
+    segment a second time, when it exits. Unregistering afterwards is no
+    better: forkserver workers share the parent's tracker, so that would
+    drop the parent's own registration. The attach therefore skips the
+    registration. Workers run one job at a time, so swapping the function
+    out briefly is safe.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _analyze_shared(name, size, url, rule_profile=None, job_id=None):
+    """
+    Worker entry point: read the page from shared memory and analyse it
+
+    With a job_id, each analyzer's result is also sent to the parent as
+    soon as it is ready, ahead of the complete return value.
+    """
+    segment = _attach_segment(name)
+    try:
+        html = bytes(segment.buf[:size]).decode('utf-8')
+    finally:
+        segment.close()
+    on_stage = None
+    if job_id is not None and _updates is not None:
+        def on_stage(stage, result, seconds):
+            _updates.put((job_id, stage, result, seconds))
+    return analyze_document(HtmlDocument(html, rule_profile=rule_profile), url, on_stage=on_stage)
+
+
+def _init_worker(updates):
+    global _updates
+    _updates = updates
+    _get_analyzers()
+
+
+def _warm_up():
+    _get_analyzers()
+    return os.getpid()
+
+
+class AnalysisPool:
+    """
+    Long-lived pool of analysis worker processes.
+
+    Parsing and walking the tree is pure-Python CPU work that serializes on
+    the GIL when run on threads, so each evaluation is analysed in one
+    worker process instead. Workers are started from a fork server that
+    has the analyzers preloaded and build their analyzer instances once.
+    The page HTML is handed over through a shared memory segment rather
+    than pickled through the pool's pipe; only the small result dicts come
+    back. Each analyzer's result is also streamed back over a queue as it
+    finishes, so callers can persist stages one by one. A crashed worker
+    breaks the pool, which is rebuilt on next use.
+    """
+
+    def __init__(self, processes=None):
+        self.processes = processes or ANALYSIS_PROCESSES
+        self._executor = None
+        self._updates = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self._job_ids = itertools.count()
+        # job id -> queue.Queue of (stage, result, seconds) for its caller
+        self._jobs = {}
+        self.restarts = 0
+
+    def _context(self):
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('forkserver')
+            context.set_forkserver_preload(PRELOAD_MODULES)
+            return context
+        return multiprocessing.get_context('spawn')
+
+    def start(self):
+        """Start the worker processes and build their analyzers (idempotent)"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Analysis pool is closed")
+            if self._executor is None:
+                context = self._context()
+                # One queue per executor: a worker killed mid-put can leave
+                # it unusable, and the executor is replaced then anyway
+                self._updates = context.Queue()
+                threading.Thread(
+                    target=self._dispatch, args=(self._updates,), name="analysis-pool-updates", daemon=True
+                ).start()
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(self._updates,)
+                )
+                # Workers are otherwise spawned on first submit; start them all now
+                for _ in range(self.processes):
+                    self._executor.submit(_warm_up)
+            return self._executor
+
+    def _dispatch(self, updates):
+        """Route streamed stage results to the jobs waiting for them"""
+        while True:
+            try:
+                message = updates.get()
+            except (EOFError, OSError):
+                return
+            if message is None:
+                return
+            job_id, stage, result, seconds = message
+            with self._lock:
+                job = self._jobs.get(job_id)
+            # Jobs that already returned have delivered every stage
+            if job is not None:
+                job.put((stage, result, seconds))
+
+    def _stop_dispatch(self):
+        """Stop the dispatcher of the executor being dropped; called with the lock held"""
+        updates, self._updates = self._updates, None
+        if updates is not None:
+            updates.put(None)
+
+    def _reset(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+                self.restarts += 1
+                self._stop_dispatch()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def analyze(self, html, url, rule_profile=None, on_stage=None):
+        """
+        Analyse a page in a worker process, blocking until it is done
+
+        Args:
+            html: Raw page HTML
+            url: URL of the page
+            rule_profile: Name of the rule profile to score with (None: default)
+            on_stage: Optional callable(stage, result, seconds), called on
+                this thread as each analyzer finishes in the worker
+
+        Returns:
+            tuple: Same as analyze_document
+        """
+        data = (html or '').encode('utf-8')
+        segment = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+        job_id = None
+        try:
+            segment.buf[:len(data)] = data
+            executor = self.start()
+            stages = queue.Queue()
+            if on_stage is not None:
+                with self._lock:
+                    job_id = next(self._job_ids)
+                    self._jobs[job_id] = stages
+            try:
+                future = executor.submit(_analyze_shared, segment.name, len(data), url, rule_profile, job_id)
+                if on_stage is None:
+                    return future.result()
+                return self._stream(future, stages, on_stage)
+            except BrokenProcessPool:
+                print("Analysis worker died, restarting the analysis pool")
+                self._reset(executor)
+                raise
+        finally:
+            if job_id is not None:
+                with self._lock:
+                    self._jobs.pop(job_id, None)
+            segment.close()
+            segment.unlink()
+
+    @staticmethod
+    def _stream(future, stages, on_stage):
+        """Pass streamed stages to on_stage until the job's result is in"""
+        future.add_done_callback(lambda _: stages.put(None))
+        delivered = set()
+        for stage, result, seconds in iter(stages.get, None):
+            delivered.add(stage)
+            on_stage(stage, result, seconds)
+        results, condensed, timings = future.result()
+        # The result can overtake the last stages on the queue
+        for stage, (result, seconds) in results.items():
+            if stage not in delivered:
+                on_stage(stage, result, seconds)
+        return results, condensed, timings
+
+    def stats(self):
+        return {"mode": 'process', "processes": self.processes, "restarts": self.restarts}
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            executor, self._executor = self._executor, None
+            self._stop_dispatch()
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_analysis_pool():
+    """
+    Return the process-wide analysis pool, or None when ANALYSIS_POOL=thread.
+
+    Created lazily, like the browser pool, so forked server workers each
+    start their own worker processes.
+    """
+    global _pool
+    if ANALYSIS_POOL != 'process':
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = AnalysisPool()
+            atexit.register(_pool.close)
+        return _pool
@@ -0,0 +1,239 @@
+import os
+import asyncio
+import concurrent.futures
+import atexit
+import threading
+from playwright.async_api import async_playwright
+from utils.metrics import metrics
+
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", 2))
+BROWSER_CONTEXTS_PER_BROWSER = int(os.getenv("BROWSER_CONTEXTS_PER_BROWSER", 2))
+BROWSER_CONTEXT_MAX_PAGES = int(os.getenv("BROWSER_CONTEXT_MAX_PAGES", 20))
+BROWSER_ACQUIRE_TIMEOUT = float(os.getenv("BROWSER_ACQUIRE_TIMEOUT", 60))
+
+
+class _BrowserSlot:
+    """One browser process shared by several context slots"""
+
+    def __init__(self, index):
+        self.index = index
+        self.browser = None
+        self.launch_lock = asyncio.Lock()
+        self.restarts = 0
+
+
+class _ContextSlot:
+    """A browser context that serves pages until it is recycled"""
+
+    def __init__(self, browser_slot):
+        self.browser_slot = browser_slot
+        self.context = None
+        self.pages_served = 0
+
+
+class BrowserPool:
+    """
+    Long-lived pool of Playwright browsers and contexts.
+
+    All Playwright objects live on a dedicated event loop thread. Worker
+    threads borrow a page through run(), which schedules a coroutine on that
+    loop and blocks until it finishes, so no caller ever launches its own
+    browser. Contexts are recycled after a number of pages, and browsers
+    that crash or disconnect are relaunched on next use.
+    """
+
+    def __init__(self, size=None, contexts_per_browser=None, max_pages_per_context=None,
+                 context_options=None, launch_options=None):
+        self.size = size or BROWSER_POOL_SIZE
+        self.contexts_per_browser = contexts_per_browser or BROWSER_CONTEXTS_PER_BROWSER
+        self.max_pages_per_context = max_pages_per_context or BROWSER_CONTEXT_MAX_PAGES
+        self.context_options = context_options or {}
+        self.launch_options = launch_options or {}
+
+        self._loop = None
+        self._thread = None
+        self._playwright = None
+        self._browsers = []
+        self._idle = None
+        self._in_use = 0
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+    def start(self):
+        """Start the event loop thread and launch the browsers (idempotent)"""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(
+                target=self._loop.run_forever, name="browser-pool", daemon=True
+            )
+            self._thread.start()
+            try:
+                asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+            except Exception:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread = None
+                raise
+
+    async def _start(self):
+        self._playwright = await async_playwright().start()
+        self._browsers = []
+        self._idle = asyncio.Queue()
+        try:
+            for index in range(self.size):
+                browser_slot = _BrowserSlot(index)
+                self._browsers.append(browser_slot)
+                await self._ensure_browser(browser_slot)
+                for _ in range(self.contexts_per_browser):
+                    self._idle.put_nowait(_ContextSlot(browser_slot))
+        except Exception:
+            await self._shutdown()
+            raise
+
+    async def _ensure_browser(self, browser_slot):
+        """Launch the slot's browser, or relaunch it if it crashed"""
+        async with browser_slot.launch_lock:
+            browser = browser_slot.browser
+            if browser is not None and browser.is_connected():
+                return browser
+            if browser is not None:
+                browser_slot.restarts += 1
+                print(f"Browser {browser_slot.index} disconnected, relaunching")
+            browser_slot.browser = await self._playwright.chromium.launch(**self.launch_options)
+            return browser_slot.browser
+
+    async def _ensure_context(self, slot):
+        browser = await self._ensure_browser(slot.browser_slot)
+        context = slot.context
+        # A relaunched browser invalidates every context it used to own
+        if context is not None and context.browser is not browser:
+            slot.context = context = None
+        if context is None:
+            slot.context = await browser.new_context(**self.context_options)
+            slot.pages_served = 0
+        return slot.context
+
+    async def _recycle_context(self, slot):
+        context, slot.context = slot.context, None
+        if context is not None:
+            try:
+                await context.close()
+            except Exception as e:
+                print(f"Error closing browser context: {str(e)}")
+
+    async def _run(self, fn, acquire_timeout):
+        slot = await asyncio.wait_for(self._idle.get(), timeout=acquire_timeout)
+        self._in_use += 1
+        page = None
+        try:
+            context = await self._ensure_context(slot)
+            page = await context.new_page()
+            return await fn(page)
+        except Exception:
+            # The context may be in a bad state (crashed tab, dead browser)
+            page = None
+            await self._recycle_context(slot)
+            raise
+        finally:
+            if page is not None:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+                slot.pages_served += 1
+                if slot.pages_served >= self.max_pages_per_context:
+                    await self._recycle_context(slot)
+            self._in_use -= 1
+            self._idle.put_nowait(slot)
+
+    def run(self, fn, timeout=None, acquire_timeout=None):
+        """
+        Borrow a page, run fn(page) on the pool's event loop and return its result
+
+        Args:
+            fn: Async callable taking a Playwright page
+            timeout: Optional overall timeout in seconds for the caller
+            acquire_timeout: Seconds to wait for a free context
+
+        Returns:
+            Whatever fn returns; exceptions raised by fn propagate to the caller
+        """
+        if self._closed:
+            raise RuntimeError("Browser pool is closed")
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(
+            self._run(fn, acquire_timeout or BROWSER_ACQUIRE_TIMEOUT), self._loop
+        )
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            # Stop the work on the loop so the context goes back to the pool
+            future.cancel()
+            raise
+
+    def stats(self):
+        """Return a snapshot of pool usage"""
+        return {
+            "browsers": len(self._browsers),
+            "connected_browsers": sum(
+                1 for slot in self._browsers if slot.browser is not None and slot.browser.is_connected()
+            ),
+            "browser_restarts": sum(slot.restarts for slot in self._browsers),
+            "contexts": self.size * self.contexts_per_browser,
+            "pages_in_use": self._in_use,
+        }
+
+    async def _shutdown(self):
+        for browser_slot in self._browsers:
+            if browser_slot.browser is not None:
+                try:
+                    await browser_slot.browser.close()
+                except Exception:
+                    pass
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def close(self):
+        """Close all browsers and stop the event loop thread"""
+        with self._start_lock:
+            self._closed = True
+            if self._thread is None:
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(30)
+            except Exception as e:
+                print(f"Error shutting down browser pool: {str(e)}")
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(5)
+            self._thread = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool(**options):
+    """
+    Return the process-wide browser pool, creating it on first use.
+
+    The pool is created lazily so that forked server workers (gunicorn
+    --preload) each start their own event loop thread after the fork.
+    Options only apply to the call that creates the pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(**options)
+            atexit.register(_pool.close)
+        return _pool
+
+
+def _pool_gauge(key):
+    # Read the pool without creating it, as options only apply on creation
+    return lambda: _pool.stats()[key] if _pool is not None else None
+
+
+metrics.gauge('browser_pages_in_use', 'Pooled browser pages currently borrowed', _pool_gauge('pages_in_use'))
+metrics.gauge('browsers_connected', 'Pooled browser processes currently connected', _pool_gauge('connected_browsers'))
@@ -0,0 +1,114 @@
+from bs4.element import Tag, NavigableString, CData
+
+# Same string types BeautifulSoup's get_text() considers, so text-based
+# facts match what the analyzers computed from soup.get_text()
+TEXT_TYPES = (NavigableString, CData)
+
+_REGISTRY = {}
+
+
+class Collector:
+    """
+    Gathers facts for one analyzer during the shared tree walk.
+
+    Subclasses set `name`, optionally restrict `tags` to the tag names they
+    care about (None means every tag) and set `wants_text` to receive text
+    nodes. The walker calls start/end for each matching tag and text for
+    every visible string, in document order.
+    """
+
+    name = None
+    tags = None
+    wants_text = False
+
+    def start(self, tag):
+        pass
+
+    def end(self, tag):
+        pass
+
+    def text(self, string):
+        pass
+
+
+def register_collector(cls):
+    """Class decorator that adds a collector to the shared walk"""
+    _REGISTRY[cls.name] = cls
+    return cls
+
+
+def registered_collectors():
+    """Return the registered collector classes keyed by name"""
+    return dict(_REGISTRY)
+
+
+def attr_matches(tag, attr, value):
+    """
+    Match an attribute the way BeautifulSoup's find_all(attrs=...) does:
+    multi-valued attributes (class, rel) match on any single value or on
+    the space-joined string.
+    """
+    actual = tag.get(attr)
+    if actual is None:
+        return False
+    if isinstance(actual, (list, tuple)):
+        return value in actual or ' '.join(actual) == value
+    return actual == value
+
+
+def attr_text(tag, attr):
+    """Return an attribute as a single string, joining multi-valued attributes"""
+    actual = tag.get(attr)
+    if isinstance(actual, (list, tuple)):
+        return ' '.join(actual)
+    return actual
+
+
+class DomWalker:
+    """Walks a parsed tree once and feeds every node to a set of collectors"""
+
+    def __init__(self, collectors):
+        self.collectors = list(collectors)
+        self._generic = [c for c in self.collectors if c.tags is None]
+        self._by_tag = {}
+        for collector in self.collectors:
+            for name in collector.tags or ():
+                self._by_tag.setdefault(name, []).append(collector)
+        self._text = [c for c in self.collectors if c.wants_text]
+        self._dispatch = {}
+
+    def _handlers(self, name):
+        handlers = self._dispatch.get(name)
+        if handlers is None:
+            handlers = self._by_tag.get(name, []) + self._generic
+            self._dispatch[name] = handlers
+        return handlers
+
+    def walk(self, root):
+        """
+        Visit every node under root in document order.
+
+        Uses an explicit stack rather than recursion so deeply nested pages
+        cannot hit the interpreter's recursion limit.
+        """
+        text_collectors = self._text
+        stack = [iter(root.contents)]
+        open_tags = []
+        while stack:
+            for node in stack[-1]:
+                if isinstance(node, Tag):
+                    for collector in self._handlers(node.name):
+                        collector.start(node)
+                    open_tags.append(node)
+                    stack.append(iter(node.contents))
+                    break
+                if text_collectors and type(node) in TEXT_TYPES:
+                    for collector in text_collectors:
+                        collector.text(node)
+            else:
+                stack.pop()
+                if open_tags:
+                    tag = open_tags.pop()
+                    for collector in self._handlers(tag.name):
+                        collector.end(tag)
+        return self.collectors
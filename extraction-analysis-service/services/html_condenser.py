@@ -0,0 +1,271 @@
+import os
+import re
+from collections import Counter
+from services.html_document import HtmlDocument
+from services.dom_walker import Collector, DomWalker, attr_text
+
+# Estimated tokens of page HTML sent to the LLM
+LLM_HTML_TOKEN_BUDGET = int(os.getenv("LLM_HTML_TOKEN_BUDGET", 6000))
+
+# Subtrees that carry no information the LLM can act on
+SKIPPED_TAGS = ('script', 'style', 'svg', 'noscript', 'template', 'canvas', 'math')
+# Containers kept as indented lines; other containers are flattened away
+CONTAINER_TAGS = (
+    'header', 'nav', 'main', 'footer', 'aside', 'section', 'article',
+    'form', 'fieldset', 'table', 'dialog', 'details'
+)
+# Elements rendered with their text on one line
+TEXT_TAGS = (
+    'title', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'a', 'button', 'label',
+    'li', 'th', 'td', 'summary', 'figcaption', 'option', 'legend', 'caption'
+)
+# Text elements that say nothing without their text
+EMPTY_DROPPED_TAGS = ('p', 'li', 'td', 'th', 'summary', 'figcaption', 'option', 'legend', 'caption')
+# Elements rendered as a single line without text
+VOID_TAGS = ('meta', 'link', 'base', 'img', 'input', 'select', 'textarea', 'iframe', 'video', 'audio')
+# Runs of same-shaped siblings are cut after REPEAT_LIMIT: list rows always,
+# generic blocks only when they share a class (cards, tiles, teasers)
+REPEATED_ROW_TAGS = ('li', 'tr', 'option', 'dd', 'dt')
+REPEATED_BLOCK_TAGS = ('div', 'article', 'section', 'figure', 'span')
+REPEAT_LIMIT = 5
+
+KEPT_ATTRS = (
+    'id', 'class', 'role', 'lang', 'name', 'content', 'property', 'charset', 'http-equiv',
+    'rel', 'href', 'hreflang', 'src', 'alt', 'title', 'type', 'for', 'placeholder',
+    'action', 'method', 'media', 'width', 'height', 'loading', 'async', 'defer',
+    'required', 'autocomplete', 'tabindex'
+)
+MAX_ATTR_LENGTH = 100
+MAX_TEXT_LENGTH = {'title': 150, 'p': 200, 'li': 120, 'td': 80, 'th': 80}
+DEFAULT_MAX_TEXT_LENGTH = 100
+
+# Lower numbers survive the token budget longer
+PRIORITY_STRUCTURE = 0  # head metadata, landmarks, headings, forms
+PRIORITY_MEDIA = 1      # images, embeds, external resources, navigation
+PRIORITY_LINKS = 2      # links, list items, table cells
+PRIORITY_TEXT = 3       # paragraphs and loose text
+
+# Marks the frame of a subtree being dropped
+_SKIP_ROOT = object()
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def estimate_tokens(text):
+    """
+    Estimate LLM tokens locally: one per punctuation mark and one per
+    four characters of each word, which tracks BPE tokenizers on markup
+    """
+    return sum(
+        (len(piece) + 3) // 4 if piece[0].isalnum() or piece[0] == '_' else 1
+        for piece in _TOKEN_PATTERN.findall(text)
+    )
+
+
+def _shorten(value, limit):
+    return value if len(value) <= limit else value[:limit - 1] + '…'
+
+
+def _render_attrs(tag):
+    parts = []
+    for name in KEPT_ATTRS + tuple(a for a in tag.attrs if a.startswith('aria-')):
+        value = attr_text(tag, name)
+        if value is None:
+            continue
+        if name == 'class':
+            value = ' '.join(value.split()[:3])
+        if value.startswith('data:'):
+            # Inline images and fonts can be megabytes of base64
+            value = value.split(',', 1)[0] + ',…'
+        value = _shorten(_WHITESPACE.sub(' ', value).strip(), MAX_ATTR_LENGTH)
+        parts.append(f'{name}="{value}"' if value else name)
+    return (' ' + ' '.join(parts)) if parts else ''
+
+
+class HtmlCondenser(Collector):
+    """
+    Builds an indented HTML skeleton during a walk of the shared document.
+
+    Scripts, styles, SVG and similar subtrees are dropped, generic wrappers
+    are flattened, long text and attribute values are truncated and runs of
+    identically shaped siblings (cards, list items, table rows) are cut to
+    the first few. Every output line carries a priority so the result can
+    be trimmed to a token budget.
+    """
+
+    name = 'condensed_html'
+    tags = None
+    wants_text = True
+
+    def __init__(self):
+        self.lines = []  # [priority, depth, text] in document order
+        self.removed = Counter()
+        self._frames = [{'shapes': Counter(), 'collapsed': Counter(), 'kept': False, 'text': None}]
+        self._skipping = False
+        self._depth = 0
+        self._in_nav = 0
+        self._seen = set()
+
+    def _line(self, priority, text):
+        entry = [priority, self._depth, text]
+        self.lines.append(entry)
+        return entry
+
+    def start(self, tag):
+        name = tag.name
+        if self._skipping:
+            self._frames.append(None)
+            return
+        if name in SKIPPED_TAGS and not (name == 'script' and tag.get('src')):
+            self.removed[name] += 1
+            self._skip_subtree()
+            return
+
+        parent = self._frames[-1]
+        classes = tag.get('class') or []
+        if name in REPEATED_ROW_TAGS or (classes and name in REPEATED_BLOCK_TAGS):
+            shape = name + ''.join('.' + c for c in classes[:2])
+            parent['shapes'][shape] += 1
+            if parent['shapes'][shape] > REPEAT_LIMIT:
+                parent['collapsed'][shape] += 1
+                self._skip_subtree()
+                return
+
+        frame = {'shapes': Counter(), 'collapsed': Counter(), 'kept': False, 'text': None}
+        self._frames.append(frame)
+
+        if name == 'nav':
+            self._in_nav += 1
+        if name == 'html':
+            self._line(PRIORITY_STRUCTURE, f'<html{_render_attrs(tag)}>')
+        elif name in CONTAINER_TAGS:
+            self._open_container(tag, frame)
+        elif name in TEXT_TAGS:
+            if name in ('title', 'button', 'label', 'legend', 'caption', 'option') or name[0] == 'h' and name[1:].isdigit():
+                priority = PRIORITY_STRUCTURE
+            elif name == 'a':
+                priority = PRIORITY_MEDIA if self._in_nav else PRIORITY_LINKS
+            elif name == 'p':
+                priority = PRIORITY_TEXT
+            else:
+                priority = PRIORITY_LINKS
+            frame['text'] = [self._line(priority, ''), f'<{name}{_render_attrs(tag)}>', f'</{name}>', []]
+        elif name in VOID_TAGS or name == 'script':
+            if name in ('meta', 'base', 'input', 'select', 'textarea') or (
+                name == 'link' and attr_text(tag, 'rel') in ('canonical', 'alternate', 'manifest')
+            ):
+                priority = PRIORITY_STRUCTURE
+            else:
+                priority = PRIORITY_MEDIA
+            self._line(priority, f'<{name}{_render_attrs(tag)}>')
+        elif tag.get('role'):
+            self._open_container(tag, frame)
+
+    def _open_container(self, tag, frame):
+        self._line(PRIORITY_STRUCTURE, f'<{tag.name}{_render_attrs(tag)}>')
+        frame['kept'] = True
+        self._depth += 1
+
+    def _skip_subtree(self):
+        self._skipping = True
+        self._frames.append(_SKIP_ROOT)
+
+    def end(self, tag):
+        frame = self._frames.pop()
+        if frame is _SKIP_ROOT:
+            self._skipping = False
+            return
+        if frame is None:
+            return
+        if tag.name == 'nav':
+            self._in_nav -= 1
+        if frame['text'] is not None:
+            line, opening, closing, texts = frame['text']
+            text = _WHITESPACE.sub(' ', ' '.join(texts)).strip()
+            limit = MAX_TEXT_LENGTH.get(tag.name, DEFAULT_MAX_TEXT_LENGTH)
+            line[2] = opening + _shorten(text, limit) + closing
+            if not text and tag.name in EMPTY_DROPPED_TAGS:
+                line[0] = None
+            elif line[0] >= PRIORITY_LINKS:
+                # The same link or text repeated in header and footer adds nothing
+                if line[2] in self._seen:
+                    line[0] = None
+                self._seen.add(line[2])
+        for shape, count in frame['collapsed'].items():
+            self._line(PRIORITY_LINKS, f'<!-- {count} more {shape} -->')
+        if frame['kept']:
+            self._depth -= 1
+
+    def text(self, string):
+        if self._skipping:
+            return
+        for frame in reversed(self._frames):
+            if frame['text'] is not None:
+                frame['text'][3].append(string)
+                return
+        text = _WHITESPACE.sub(' ', string).strip()
+        if not text:
+            return
+        last = self.lines[-1] if self.lines else None
+        if last is not None and last[0] == PRIORITY_TEXT and last[1] == self._depth and last[2].startswith('"'):
+            # Merge adjacent loose text into one line
+            last[2] = '"' + _shorten(last[2][1:-1] + ' ' + text, 200) + '"'
+        else:
+            self._line(PRIORITY_TEXT, '"' + _shorten(text, 200) + '"')
+
+
+def condense_html(content, token_budget=LLM_HTML_TOKEN_BUDGET):
+    """
+    Condense a page into an HTML skeleton that fits a token budget
+
+    Lines are kept by priority: structure first (metadata, landmarks,
+    headings, forms), then media and navigation, then links and list
+    items, then paragraphs. The lowest priority that does not fully fit is
+    filled in document order until the budget runs out.
+
+    Args:
+        content: An HtmlDocument or raw HTML string
+        token_budget: Maximum estimated tokens of the result
+
+    Returns:
+        tuple: (condensed text, stats dict)
+    """
+    document = HtmlDocument.from_content(content)
+    condenser = HtmlCondenser()
+    DomWalker([condenser]).walk(document.soup)
+
+    lines = [(priority, depth, text) for priority, depth, text in condenser.lines if priority is not None]
+    costs = [estimate_tokens(text) + depth for _, depth, text in lines]
+    # Leave room for the trailing summary comment
+    remaining = token_budget - 40
+    keep = [False] * len(lines)
+    for level in (PRIORITY_STRUCTURE, PRIORITY_MEDIA, PRIORITY_LINKS, PRIORITY_TEXT):
+        indexes = [i for i, line in enumerate(lines) if line[0] == level]
+        level_cost = sum(costs[i] for i in indexes)
+        if level_cost <= remaining:
+            for i in indexes:
+                keep[i] = True
+            remaining -= level_cost
+            continue
+        for i in indexes:
+            if costs[i] <= remaining:
+                keep[i] = True
+                remaining -= costs[i]
+        break
+
+    output = ['  ' * depth + text for (_, depth, text), kept in zip(lines, keep) if kept]
+    omitted = len(lines) - len(output)
+    notes = [f"{count} {tag}" for tag, count in sorted(condenser.removed.items())]
+    if omitted:
+        notes.append(f"{omitted} lower-priority lines over the token budget")
+    if notes:
+        output.append(f"<!-- removed: {', '.join(notes)} -->")
+    condensed = '\n'.join(output)
+
+    return condensed, {
+        "html_chars": len(document.html),
+        "condensed_chars": len(condensed),
+        "condensed_tokens": estimate_tokens(condensed),
+        "omitted_lines": omitted
+    }
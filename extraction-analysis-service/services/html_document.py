@@ -0,0 +1,82 @@
+import os
+import time
+import threading
+from bs4 import BeautifulSoup
+from services.dom_walker import DomWalker, registered_collectors
+from services.rule_engine import RuleFacts, get_rule_set
+
+try:
+    import lxml  # noqa: F401
+    _DEFAULT_PARSER = 'lxml'
+except ImportError:
+    _DEFAULT_PARSER = 'html.parser'
+
+HTML_PARSER = os.getenv("HTML_PARSER", _DEFAULT_PARSER)
+
+
+class HtmlDocument:
+    """
+    Parsed HTML document shared by all analyzers of a single evaluation.
+
+    The page is parsed once (with lxml when it is installed) and every
+    analyzer reads from the same tree instead of building its own soup.
+    Analyzer facts are gathered by a single walk over the tree the first
+    time any analyzer asks for them. The element checks of the rules in
+    the document's rule profile (services/rule_engine.py) run in that walk.
+    """
+
+    def __init__(self, html_content, parser=None, rule_profile=None):
+        self.html = html_content or ''
+        self.parser = parser or HTML_PARSER
+        # Name of the rule profile the analyzers score with (None: default)
+        self.rule_profile = rule_profile
+        started = time.perf_counter()
+        self.soup = BeautifulSoup(self.html, self.parser)
+        # Seconds spent parsing and in the shared walk, for stage timings
+        self.parse_seconds = time.perf_counter() - started
+        self.walk_seconds = 0.0
+        self._facts = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_content(cls, content):
+        """
+        Return the given document as-is, or parse it if raw HTML was passed
+
+        Args:
+            content: An HtmlDocument or a raw HTML string
+
+        Returns:
+            HtmlDocument: The parsed document
+        """
+        if isinstance(content, cls):
+            return content
+        return cls(content)
+
+    def facts(self, name):
+        """
+        Return the collector registered under name after the shared walk
+
+        All registered collectors are fed in the same pass, so whichever
+        analyzer runs first pays for the walk and the others reuse it.
+        """
+        with self._lock:
+            if name not in self._facts:
+                self._walk()
+            return self._facts[name]
+
+    def walk(self):
+        """Run the shared walk now rather than on the first facts() call"""
+        with self._lock:
+            self._walk()
+
+    def _walk(self):
+        pending = [cls() for key, cls in registered_collectors().items() if key not in self._facts]
+        if RuleFacts.name not in self._facts:
+            pending.append(get_rule_set(self.rule_profile).collector())
+        if not pending:
+            return
+        started = time.perf_counter()
+        for collector in DomWalker(pending).walk(self.soup):
+            self._facts[collector.name] = collector
+        self.walk_seconds += time.perf_counter() - started
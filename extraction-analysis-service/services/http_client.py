@@ -0,0 +1,195 @@
+import os
+import time
+import socket
+import threading
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.util.connection import allowed_gai_family
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", 100))  # hosts with a kept-alive pool
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 10))  # kept-alive connections per host
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 30))
+HTTP_DNS_CACHE_SECONDS = int(os.getenv("HTTP_DNS_CACHE_SECONDS", 300))  # 0 disables the DNS cache
+# HTTP/2 needs the optional httpx[http2] package; without it the client stays on HTTP/1.1
+HTTP_CLIENT_HTTP2 = os.getenv("HTTP_CLIENT_HTTP2", "false").lower() == "true"
+
+
+class HttpClientError(Exception):
+    """Raised for transport failures and HTTP error statuses"""
+
+
+class _DnsCache:
+    """Thread-safe TTL cache of getaddrinfo results"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, host, port):
+        key = (host, port)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+        addresses = socket.getaddrinfo(host, port, allowed_gai_family(), socket.SOCK_STREAM)
+        with self._lock:
+            self._entries[key] = (now + self.ttl, addresses)
+        return addresses
+
+
+_dns_cache = _DnsCache(HTTP_DNS_CACHE_SECONDS)
+
+
+class _CachedDnsMixin:
+    """
+    Connect to an address from the DNS cache.
+
+    urllib3 resolves `_dns_host` only when opening the socket; TLS SNI and
+    certificate checks keep using `host`, so swapping in a cached address
+    changes nothing but the lookup.
+    """
+
+    def _new_conn(self):
+        hostname = self._dns_host
+        try:
+            self._dns_host = _dns_cache.resolve(hostname, self.port)[0][4][0]
+        except socket.gaierror:
+            pass  # Let urllib3 resolve again and report the failure itself
+        try:
+            return super()._new_conn()
+        finally:
+            self._dns_host = hostname
+
+
+class _CachedDnsHTTPConnection(_CachedDnsMixin, HTTPConnection):
+    pass
+
+
+class _CachedDnsHTTPSConnection(_CachedDnsMixin, HTTPSConnection):
+    pass
+
+
+class _CachedDnsHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CachedDnsHTTPConnection
+
+
+class _CachedDnsHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CachedDnsHTTPSConnection
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose per-host pools open connections through the DNS cache"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        if HTTP_DNS_CACHE_SECONDS > 0:
+            self.poolmanager.pool_classes_by_scheme = {
+                'http': _CachedDnsHTTPConnectionPool,
+                'https': _CachedDnsHTTPSConnectionPool,
+            }
+
+
+def _no_cookies():
+    # Pages from unrelated sites share the client, so never carry cookies between them
+    return CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))
+
+
+class HttpClient:
+    """
+    Process-wide HTTP client with kept-alive connection pools per host.
+
+    Uses a requests session (HTTP/1.1, with the DNS cache) by default, or
+    an httpx client speaking HTTP/2 where servers support it when
+    HTTP_CLIENT_HTTP2 is enabled and httpx[http2] is installed. Both are
+    safe to share between threads.
+    """
+
+    def __init__(self, http2=HTTP_CLIENT_HTTP2, pool_hosts=HTTP_POOL_HOSTS,
+                 pool_maxsize=HTTP_POOL_MAXSIZE, timeout=HTTP_TIMEOUT):
+        self.timeout = timeout
+        self.http2 = bool(http2 and httpx is not None)
+        if http2 and not self.http2:
+            print("HTTP_CLIENT_HTTP2 is set but httpx is not installed; using HTTP/1.1")
+
+        if self.http2:
+            self._client = httpx.Client(
+                http2=True,
+                follow_redirects=True,
+                timeout=timeout,
+                cookies=httpx.Cookies(_no_cookies()),
+                limits=httpx.Limits(
+                    max_connections=pool_hosts * pool_maxsize,
+                    max_keepalive_connections=pool_hosts * pool_maxsize
+                )
+            )
+        else:
+            self._client = requests.Session()
+            self._client.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            adapter = _PooledAdapter(pool_connections=pool_hosts, pool_maxsize=pool_maxsize)
+            self._client.mount('http://', adapter)
+            self._client.mount('https://', adapter)
+
+    def get(self, url, headers=None, timeout=None):
+        """
+        GET a URL, following redirects
+
+        Returns:
+            Response with status_code, headers, content, text and url (str)
+
+        Raises:
+            HttpClientError: On connection failures, timeouts and 4xx/5xx statuses
+        """
+        timeout = timeout or self.timeout
+        if self.http2:
+            try:
+                response = self._client.get(url, headers=headers, timeout=timeout)
+            except httpx.HTTPError as e:
+                raise HttpClientError(str(e)) from e
+            if response.status_code >= 400:
+                raise HttpClientError(f"{response.status_code} {response.reason_phrase} for url: {response.url}")
+            return _HttpxResponse(response)
+
+        try:
+            response = self._client.get(url, headers=headers, timeout=timeout)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            raise HttpClientError(str(e)) from e
+        return response
+
+    def close(self):
+        self._client.close()
+
+
+class _HttpxResponse:
+    """Present an httpx response with the attributes of a requests response"""
+
+    def __init__(self, response):
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.content = response.content
+        self.text = response.text
+        self.url = str(response.url)
+        self.http_version = response.http_version
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """Return the shared HTTP client, creating it on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
@@ -0,0 +1,319 @@
+import os
+import time
+import random
+import asyncio
+import atexit
+import threading
+import concurrent.futures
+from google.api_core import exceptions as google_exceptions
+from utils.metrics import metrics
+
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", 4))
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", 60))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", 1000000))
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", 120))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 5))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", 1))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", 60))
+LLM_CALLBACK_WORKERS = int(os.getenv("LLM_CALLBACK_WORKERS", 4))
+
+# Errors that mean "slow down" rather than "this request is wrong"
+RATE_LIMIT_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+)
+
+
+LLM_CALL_SECONDS = metrics.histogram(
+    'llm_call_duration_seconds',
+    'Duration of LLM calls through the gateway, including waits and retries',
+    ('outcome',)
+)
+
+
+class LLMGatewayError(Exception):
+    """Raised when an LLM call cannot be made within its limits"""
+
+
+class LLMDeadlineExceeded(LLMGatewayError):
+    """Raised when an LLM call would finish after its deadline"""
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute` tokens a minute.
+
+    Only used from the gateway's event loop. Waiters are served in
+    arrival order so a large request cannot be starved by small ones.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount, deadline):
+        """Take `amount` tokens, waiting for the refill; raise if that passes deadline"""
+        # A single request larger than the bucket waits for a full bucket
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+                if time.monotonic() + wait > deadline:
+                    raise LLMDeadlineExceeded("LLM rate limit would delay the call past its deadline")
+                await asyncio.sleep(wait)
+
+    def debit(self, amount):
+        """Charge tokens after the fact; the balance may go negative"""
+        self._refill()
+        self.tokens -= amount
+
+
+def _retry_delay_hint(error):
+    """Server-suggested retry delay in seconds from a Google RetryInfo detail, if any"""
+    try:
+        for detail in getattr(error, 'details', None) or []:
+            delay = getattr(detail, 'retry_delay', None)
+            if delay is not None and (delay.seconds or delay.nanos):
+                return delay.seconds + delay.nanos / 1e9
+    except Exception:
+        pass
+    return None
+
+
+class LLMGateway:
+    """
+    Process-wide gate in front of the LLM API.
+
+    Calls run on a dedicated event loop thread, so waiting on the API,
+    on a free slot or on the rate limits never holds a worker thread.
+    Each call takes one in-flight slot and draws from a requests-per-minute
+    and a tokens-per-minute bucket; rate limit errors are retried with
+    jittered exponential backoff (honouring the server's retry delay),
+    which also pauses every other call, until the call's deadline.
+
+    Futures returned by submit() complete on a small callback pool, so
+    done-callbacks may block (database writes) without stalling the loop.
+    """
+
+    def __init__(self, max_in_flight=None, requests_per_minute=None, tokens_per_minute=None,
+                 deadline_seconds=None, max_retries=None):
+        self.max_in_flight = max_in_flight or LLM_MAX_IN_FLIGHT
+        self.requests_per_minute = requests_per_minute or LLM_REQUESTS_PER_MINUTE
+        self.tokens_per_minute = tokens_per_minute or LLM_TOKENS_PER_MINUTE
+        self.deadline_seconds = deadline_seconds or LLM_DEADLINE_SECONDS
+        self.max_retries = LLM_MAX_RETRIES if max_retries is None else max_retries
+
+        self._loop = None
+        self._thread = None
+        self._callbacks = None
+        self._slots = None
+        self._requests = None
+        self._tokens = None
+        self._paused_until = 0.0
+        self._start_lock = threading.Lock()
+        self._closed = False
+        self._counters = {
+            "calls": 0, "succeeded": 0, "failed": 0, "retries": 0,
+            "rate_limited": 0, "deadline_exceeded": 0
+        }
+        self._waiting = 0
+        self._in_flight = 0
+
+    def start(self):
+        """Start the event loop thread (idempotent)"""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._callbacks = concurrent.futures.ThreadPoolExecutor(
+                max_workers=LLM_CALLBACK_WORKERS, thread_name_prefix="llm-callback"
+            )
+            self._thread = threading.Thread(
+                target=self._loop.run_forever, name="llm-gateway", daemon=True
+            )
+            self._thread.start()
+            asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+
+    async def _start(self):
+        # Loop-bound primitives have to be created on the loop
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._requests = TokenBucket(self.requests_per_minute)
+        self._tokens = TokenBucket(self.tokens_per_minute)
+
+    def _remaining(self, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMDeadlineExceeded("LLM call deadline exceeded")
+        return remaining
+
+    def _backoff(self, attempt, error):
+        hint = _retry_delay_hint(error)
+        ceiling = min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** attempt)
+        # Full jitter keeps callers that were throttled together from retrying together
+        delay = random.uniform(0, ceiling)
+        return max(delay, hint) if hint else delay
+
+    async def _call(self, fn, estimated_tokens, deadline):
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self._remaining(deadline))
+        except asyncio.TimeoutError:
+            raise LLMDeadlineExceeded("No LLM slot became free before the deadline")
+        finally:
+            self._waiting -= 1
+
+        self._in_flight += 1
+        try:
+            attempt = 0
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    if time.monotonic() + pause > deadline:
+                        raise LLMDeadlineExceeded("LLM API is rate limiting past the call's deadline")
+                    await asyncio.sleep(pause)
+                await self._requests.acquire(1, deadline)
+                await self._tokens.acquire(estimated_tokens, deadline)
+                try:
+                    result = await asyncio.wait_for(fn(), self._remaining(deadline))
+                except asyncio.TimeoutError:
+                    raise LLMDeadlineExceeded("LLM call did not finish before its deadline")
+                except RATE_LIMIT_ERRORS as e:
+                    self._counters["rate_limited"] += 1
+                    attempt += 1
+                    delay = self._backoff(attempt, e)
+                    if attempt > self.max_retries or time.monotonic() + delay > deadline:
+                        raise
+                    print(f"LLM API rate limited ({type(e).__name__}), retrying in {delay:.1f}s")
+                    self._counters["retries"] += 1
+                    self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                    continue
+
+                usage = getattr(result, 'usage_metadata', None)
+                used = getattr(usage, 'total_token_count', None)
+                if used:
+                    # Charge what the call really cost against the estimate
+                    self._tokens.debit(used - min(estimated_tokens, self._tokens.capacity))
+                return result
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+
+    async def _complete(self, future, fn, estimated_tokens, deadline):
+        self._counters["calls"] += 1
+        started = time.monotonic()
+        try:
+            result = await self._call(fn, estimated_tokens, deadline)
+        except BaseException as e:
+            if isinstance(e, LLMDeadlineExceeded):
+                self._counters["deadline_exceeded"] += 1
+                outcome = 'deadline_exceeded'
+            else:
+                outcome = 'rate_limited' if isinstance(e, RATE_LIMIT_ERRORS) else 'error'
+            self._counters["failed"] += 1
+            LLM_CALL_SECONDS.observe(time.monotonic() - started, outcome)
+            self._callbacks.submit(future.set_exception, e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        self._counters["succeeded"] += 1
+        LLM_CALL_SECONDS.observe(time.monotonic() - started, 'ok')
+        self._callbacks.submit(future.set_result, result)
+
+    def submit(self, fn, estimated_tokens=0, timeout=None):
+        """
+        Schedule an LLM call and return a future of its result
+
+        Args:
+            fn: Async callable making one API call; called again on retries.
+                A result with usage_metadata.total_token_count is charged
+                against the tokens-per-minute budget.
+            estimated_tokens: Tokens to reserve before the call is made
+            timeout: Deadline in seconds for the whole call including
+                waiting and retries (default LLM_DEADLINE_SECONDS)
+
+        Returns:
+            concurrent.futures.Future: Resolves to fn's result or raises its
+            error, LLMDeadlineExceeded or the final rate limit error
+        """
+        if self._closed:
+            raise LLMGatewayError("LLM gateway is closed")
+        self.start()
+        deadline = time.monotonic() + (timeout or self.deadline_seconds)
+        future = concurrent.futures.Future()
+        future.set_running_or_notify_cancel()
+        asyncio.run_coroutine_threadsafe(self._complete(future, fn, estimated_tokens, deadline), self._loop)
+        return future
+
+    async def call_async(self, fn, estimated_tokens=0, timeout=None):
+        """Awaitable form of submit() for callers running their own event loop"""
+        return await asyncio.wrap_future(self.submit(fn, estimated_tokens, timeout))
+
+    def call(self, fn, estimated_tokens=0, timeout=None):
+        """Blocking form of submit() for scripts and test endpoints"""
+        return self.submit(fn, estimated_tokens, timeout).result()
+
+    def stats(self):
+        """Return a snapshot of gateway usage"""
+        stats = dict(self._counters)
+        stats.update({
+            "in_flight": self._in_flight,
+            "waiting_for_slot": self._waiting,
+            "max_in_flight": self.max_in_flight,
+            "requests_per_minute": self.requests_per_minute,
+            "tokens_per_minute": self.tokens_per_minute,
+            "paused_seconds": round(max(0.0, self._paused_until - time.monotonic()), 1)
+        })
+        return stats
+
+    def close(self):
+        """Stop the event loop thread; calls still pending are abandoned"""
+        with self._start_lock:
+            self._closed = True
+            if self._thread is None:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(5)
+            self._thread = None
+            self._callbacks.shutdown(wait=False)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def _gateway_gauge(key):
+    # Read the gateway without creating it; None until the first LLM call
+    return lambda: _gateway.stats()[key] if _gateway is not None else None
+
+
+metrics.gauge('llm_calls_in_flight', 'LLM calls currently being made', _gateway_gauge('in_flight'))
+metrics.gauge('llm_calls_waiting', 'LLM calls waiting for an in-flight slot', _gateway_gauge('waiting_for_slot'))
+
+
+def get_llm_gateway(**options):
+    """
+    Return the process-wide LLM gateway, creating it on first use.
+
+    Like the browser pool it is created lazily so forked server workers
+    each start their own loop thread. Limits are per process: divide the
+    API quota by the number of API and worker processes.
+    """
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway(**options)
+            atexit.register(_gateway.close)
+        return _gateway
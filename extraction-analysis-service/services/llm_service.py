@@ -1,8 +1,20 @@
 import os
 import json
 import google.generativeai as genai
-import base64
 import datetime
+import concurrent.futures
+from services.html_condenser import condense_html, estimate_tokens
+from services.llm_gateway import get_llm_gateway
+from services.screenshot_preprocessor import prepare_screenshot
+from utils.llm_cache import llm_cache_key
+
+MODEL_NAME = 'gemini-2.0-flash'
+# Bump whenever the prompt below changes so cached reports are not reused
+PROMPT_VERSION = 2
+# Gemini bills an image of up to 768x768 pixels as a fixed number of tokens
+IMAGE_TOKENS = 258
+# Reserved for the response when charging the tokens-per-minute budget
+MAX_OUTPUT_TOKENS_ESTIMATE = 1024
 
 class LLMService:
     """
@@ -13,9 +25,17 @@ class LLMService:
     def __init__(self):
         # Configure the client with your Gemini API key
         genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
+        self.model_name = MODEL_NAME
+        self.model = genai.GenerativeModel(self.model_name)
 
-    def analyze(
+    def analyze(self, *args, **kwargs):
+        """
+        Produce the LLM report for a page and its analyzer results, blocking
+        until it is ready; takes the arguments of submit_analysis()
+        """
+        return self.submit_analysis(*args, **kwargs).result()
+
+    def submit_analysis(
         self,
         html_content,
         screenshot,
@@ -23,19 +43,57 @@ class LLMService:
         seo_analysis,
         mobile_analysis,
         performance_analysis,
-        accessibility_analysis
+        accessibility_analysis,
+        screenshot_mime_type="image/png",
+        cache=None,
+        condensed=None
     ):
-        if isinstance(screenshot, bytes):
-            screenshot_b64 = base64.b64encode(screenshot).decode("utf-8")
-        else:
-            # Assuming screenshot is already a base64 encoded string if not bytes
-            screenshot_b64 = screenshot
-        
-        image_bytes = base64.b64decode(screenshot_b64)
-        image_part = {
-            "mime_type": "image/png",
-            "data": image_bytes
-        }
+        """
+        Start the LLM report for a page and its analyzer results
+
+        The prompt is built on the calling thread; the Gemini call itself
+        goes through the process-wide LLM gateway (services.llm_gateway),
+        which limits concurrency and rate, applies a deadline and retries
+        rate limit errors, without holding the calling thread.
+
+        With a cache (see utils.llm_cache), identical inputs - same model,
+        prompt version, condensed HTML, analyses and screenshot - return
+        the stored report without calling Gemini.
+
+        condensed may carry the (text, stats) result of condense_html when
+        the page was already condensed, e.g. by an analysis worker process.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the report dict; its
+            done-callbacks run on the gateway's callback pool
+        """
+        # A few downscaled screenful tiles instead of the full-page capture,
+        # so image tokens and upload size do not grow with page length
+        image_parts, image_stats = prepare_screenshot(screenshot or b'', screenshot_mime_type)
+
+        # Send a skeleton of the page rather than the raw HTML, which on large
+        # pages costs more tokens than everything else combined
+        condensed_html, condense_stats = condensed or condense_html(html_content)
+        print(f"LLM prompt HTML condensed from {condense_stats['html_chars']} to "
+              f"{condense_stats['condensed_chars']} characters (~{condense_stats['condensed_tokens']} tokens)")
+        input_stats = dict(condense_stats, screenshot=image_stats)
+
+        cache_key = None
+        if cache is not None:
+            cache_key = llm_cache_key(
+                self.model_name,
+                PROMPT_VERSION,
+                url,
+                condensed_html,
+                [seo_analysis, mobile_analysis, performance_analysis, accessibility_analysis],
+                b''.join(part["data"] for part in image_parts)
+            )
+            cached = cache.get(cache_key)
+            if cached is not None:
+                cached["cache"] = {"hit": True, "key": cache_key}
+                report_future = concurrent.futures.Future()
+                report_future.set_result(cached)
+                return report_future
 
         # Build a structured prompt for Gemini
         prompt = f"""
@@ -45,7 +103,8 @@ class LLMService:
         - Mobile findings: {json.dumps(mobile_analysis)}
         - Performance findings: {json.dumps(performance_analysis)}
         - Accessibility findings: {json.dumps(accessibility_analysis)}
-        - Raw HTML: {html_content}
+        - Condensed HTML (scripts, styles, SVG and repeated blocks removed; long text truncated):
+        {condensed_html}
         
         Provide:
         1. A concise summary of the overall site health.
@@ -61,22 +120,43 @@ class LLMService:
                                      # Consider removing or adjusting if JSON output is truncated.
         )
 
-        # Call Gemini using the new API structure
-        # The content should be a list: [prompt_text, image_data]
-        response = self.model.generate_content(
-            [prompt, image_part],
-            generation_config=generation_config
+        # The content should be a list: [prompt_text, image_data, ...]; the
+        # gateway calls this again if Gemini answers with a rate limit error
+        def generate():
+            return self.model.generate_content_async(
+                [prompt] + image_parts,
+                generation_config=generation_config
+            )
+
+        report_future = concurrent.futures.Future()
+        response_future = get_llm_gateway().submit(
+            generate,
+            estimated_tokens=estimate_tokens(prompt) + IMAGE_TOKENS * len(image_parts) + MAX_OUTPUT_TOKENS_ESTIMATE
+        )
+        response_future.add_done_callback(
+            lambda future: self._finish_report(future, report_future, input_stats, cache, cache_key)
         )
+        return report_future
+
+    def _finish_report(self, response_future, report_future, input_stats, cache, cache_key):
+        """Resolve report_future with the report built from the Gemini response"""
+        try:
+            report_future.set_result(self._build_report(response_future, input_stats, cache, cache_key))
+        except Exception as e:
+            report_future.set_exception(e)
 
+    def _build_report(self, response_future, input_stats, cache, cache_key):
         # Access the response text
         # For non-streaming, response.text should contain the generated content.
         # If issues arise, or for more complex scenarios (e.g. multi-part response),
         # you might need to inspect response.candidates[0].content.parts.
-        content = response.text
+        content = response_future.result().text
         print(f"LLM Response: {content}")
+        parsed = True
         try:
             report = json.loads(content)
         except json.JSONDecodeError:
+            parsed = False
             # Fallback if response isn’t valid JSON
             report = {
                 "summary": f"Failed to parse LLM response as JSON. Raw response: {content}",
@@ -87,6 +167,11 @@ class LLMService:
         # Attach a timestamp and raw message
         report.update({
             "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
-            "raw": content
+            "raw": content,
+            "input_stats": input_stats
         })
-        return report
\ No newline at end of file
+        # Unparseable responses are not cached so the next run tries again
+        if cache_key is not None and parsed:
+            cache.put(cache_key, report)
+            report["cache"] = {"hit": False, "key": cache_key}
+        return report
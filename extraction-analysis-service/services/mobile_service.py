@@ -1,6 +1,160 @@
-from bs4 import BeautifulSoup
+import time
 from datetime import datetime
 import re
+from services.html_document import HtmlDocument
+from services.dom_walker import Collector, register_collector, attr_matches, attr_text
+from services.rule_engine import Rule, register_rule, score_rules
+
+FONT_SIZE_PATTERN = re.compile(r'font-size\s*:\s*(\d+)px')
+
+# Common responsive framework classes (Bootstrap-style grids and Tailwind prefixes)
+RESPONSIVE_CLASSES = [
+    'container', 'row', 'col', 'hidden-xs', 'visible-md',
+    'flex', 'grid', 'sm:', 'md:', 'lg:'
+]
+
+# Strings that give a framework away, as they would appear in the serialized page
+FRAMEWORK_SIGNATURES = {
+    'Bootstrap': [
+        'bootstrap.css', 'bootstrap.min.css', 'class="container"', 'class="row"', 'class="col'
+    ],
+    'Foundation': [
+        'foundation.css', 'foundation.min.css', 'class="small-'
+    ],
+    'Tailwind': [
+        'tailwind.css', 'class="sm:', 'class="md:', 'class="lg:'
+    ],
+    'Bulma': [
+        'bulma.css', 'bulma.min.css', 'class="column"', 'class="columns"'
+    ],
+    'Materialize': [
+        'materialize.css', 'materialize.min.css', 'class="container"', 'class="row"'
+    ]
+}
+
+CLASS_ATTRIBUTE = 'class="'
+
+
+class SignatureMatcher:
+    """
+    Multi-string search that scans a large string once per anchor
+
+    Every signature contains one of a few short anchors ('class="', '.css').
+    Each anchor is located with str.find, which runs at memory speed, and
+    the signatures are only compared at those positions, so a large page
+    costs a couple of passes instead of one per signature.
+    """
+
+    def __init__(self, signatures, anchors):
+        groups = {}  # anchor -> offset of the anchor in the signature -> signatures
+        for signature in signatures:
+            anchor = next((anchor for anchor in anchors if anchor in signature), None)
+            if anchor is None:
+                raise ValueError(f"Signature {signature!r} contains none of the anchors {anchors!r}")
+            groups.setdefault(anchor, {}).setdefault(signature.index(anchor), []).append(signature)
+        self._groups = [
+            (anchor, [(offset, tuple(sorted(group))) for offset, group in sorted(offsets.items())])
+            for anchor, offsets in groups.items()
+        ]
+
+    def search(self, text):
+        """
+        Return the first signature found in text, or None
+
+        Args:
+            text: String to scan
+
+        Returns:
+            str: A signature occurring in text, or None
+        """
+        for anchor, offsets in self._groups:
+            position = text.find(anchor)
+            while position != -1:
+                for offset, group in offsets:
+                    start = position - offset
+                    if start >= 0 and text.startswith(group, start):
+                        return next(signature for signature in group if text.startswith(signature, start))
+                position = text.find(anchor, position + 1)
+        return None
+
+
+_ALL_SIGNATURES = {signature for signatures in FRAMEWORK_SIGNATURES.values() for signature in signatures}
+FRAMEWORK_MATCHER = SignatureMatcher(_ALL_SIGNATURES, (CLASS_ATTRIBUTE, '.css'))
+
+# Class signatures as class attribute values: whole values ('class="row"')
+# and value prefixes ('class="col')
+_CLASS_SIGNATURES = [s[len(CLASS_ATTRIBUTE):] for s in _ALL_SIGNATURES if s.startswith(CLASS_ATTRIBUTE)]
+FRAMEWORK_CLASSES = frozenset(value[:-1] for value in _CLASS_SIGNATURES if value.endswith('"'))
+FRAMEWORK_CLASS_PREFIXES = tuple(sorted(value for value in _CLASS_SIGNATURES if not value.endswith('"')))
+
+
+@register_collector
+class MobileFacts(Collector):
+    """Mobile-friendliness facts gathered during the shared tree walk"""
+
+    name = 'mobile'
+    tags = None  # class and style attributes can appear on any element
+
+    def __init__(self):
+        self.viewport_tag = None
+        self.has_media_query_styles = False
+        self.stylesheet_media = []
+        self.class_values = set()
+        self.touch_dimensions = []
+        self.inline_font_sizes = []
+        self.font_tag_sizes = []
+        self.uses_flash = False
+
+    def start(self, tag):
+        name = tag.name
+        classes = attr_text(tag, 'class')
+        if classes:
+            self.class_values.add(classes)
+        style = tag.get('style')
+        if style is not None:
+            font_size_match = FONT_SIZE_PATTERN.search(style)
+            if font_size_match:
+                self.inline_font_sizes.append(int(font_size_match.group(1)))
+
+        if name == 'meta':
+            if self.viewport_tag is None and attr_matches(tag, 'name', 'viewport'):
+                self.viewport_tag = tag
+        elif name in ('a', 'button'):
+            width = tag.get('width')
+            height = tag.get('height')
+            if width and height:
+                self.touch_dimensions.append((width, height))
+        elif name == 'style':
+            if tag.string and '@media' in tag.string:
+                self.has_media_query_styles = True
+        elif name == 'link':
+            if attr_matches(tag, 'rel', 'stylesheet'):
+                self.stylesheet_media.append(tag.get('media'))
+        elif name == 'font':
+            self.font_tag_sizes.append(tag.get('size'))
+        elif name == 'object':
+            if attr_matches(tag, 'type', 'application/x-shockwave-flash'):
+                self.uses_flash = True
+
+
+for _rule in (
+    Rule('mobile.viewport-missing', 'mobile', 'high', 20, "Page is missing a viewport meta tag",
+         lambda v: not v['has_viewport']),
+    Rule('mobile.zoom-disabled', 'mobile', 'medium', 10, "Page prevents users from zooming, which hinders accessibility",
+         lambda v: v['has_viewport'] and v['viewport_content'] and 'user-scalable=no' in v['viewport_content']),
+    Rule('mobile.not-responsive', 'mobile', 'high', 15, "Page does not appear to use responsive design techniques",
+         lambda v: not v['is_responsive']),
+    Rule('mobile.small-touch-targets', 'mobile', 'medium', 5,
+         "Found {small_touch_elements} touch elements that may be too small for mobile users",
+         lambda v: v['small_touch_elements'] > 0),
+    Rule('mobile.small-fonts', 'mobile', 'medium', 5,
+         "Found {small_fonts} instances of font sizes that may be too small for mobile devices",
+         lambda v: v['small_fonts'] > 0),
+    Rule('mobile.flash', 'mobile', 'high', 20, "Page uses Flash, which is not supported on most mobile devices",
+         lambda v: v['uses_flash']),
+):
+    register_rule(_rule)
+
 
 class MobileService:
     """Service to analyze mobile-friendliness of a website"""
@@ -10,8 +164,8 @@ class MobileService:
         Analyze mobile friendliness of a website
         
         Args:
-            html_content: HTML content of the page
-            screenshot: Base64 encoded screenshot of the page (optional)
+            html_content: HTML content of the page, or a parsed HtmlDocument
+            screenshot: PNG bytes of a screenshot of the page (optional)
             url: URL of the page
             
         Returns:
@@ -19,82 +173,44 @@ class MobileService:
         """
         try:
             # Starting timestamp
-            start_time = datetime.utcnow()
+            start_time = time.perf_counter()
             
-            soup = BeautifulSoup(html_content, 'html.parser')
+            document = HtmlDocument.from_content(html_content)
+            facts = document.facts(MobileFacts.name)
             
             # Check for viewport meta tag
             has_viewport = False
             viewport_content = None
-            viewport_tag = soup.find('meta', attrs={'name': 'viewport'})
+            viewport_tag = facts.viewport_tag
             if viewport_tag and 'content' in viewport_tag.attrs:
                 has_viewport = True
                 viewport_content = viewport_tag['content']
             
             # Check for responsive design
-            is_responsive = self._check_responsive_design(soup, viewport_content)
+            is_responsive = self._check_responsive_design(facts, viewport_content)
             
             # Check for touch elements (buttons, links) size and spacing
-            touch_elements_issues = self._check_touch_elements(soup)
+            small_touch_elements = self._count_small_touch_elements(facts)
             
             # Check for font sizes
-            font_size_issues = self._check_font_sizes(soup)
+            small_fonts = self._count_small_fonts(facts)
             
             # Check for mobile-friendly frameworks (Bootstrap, Foundation, etc.)
-            uses_responsive_framework = self._check_responsive_frameworks(soup)
+            uses_responsive_framework = self._check_responsive_frameworks(document, facts)
             
             # Check if page uses flash (not mobile-friendly)
-            uses_flash = len(soup.find_all('object', attrs={'type': 'application/x-shockwave-flash'})) > 0
+            uses_flash = facts.uses_flash
             
-            # Finish timestamp
-            end_time = datetime.utcnow()
-            execution_time = (end_time - start_time).total_seconds()
-            
-            # Prepare analysis results
-            issues = []
-            mobile_score = 100  # Start with perfect score and subtract for issues
-            
-            # Viewport check
-            if not has_viewport:
-                issues.append({
-                    "severity": "high",
-                    "message": "Page is missing a viewport meta tag"
-                })
-                mobile_score -= 20
-            elif viewport_content and 'user-scalable=no' in viewport_content:
-                issues.append({
-                    "severity": "medium",
-                    "message": "Page prevents users from zooming, which hinders accessibility"
-                })
-                mobile_score -= 10
-                
-            # Responsive design check
-            if not is_responsive:
-                issues.append({
-                    "severity": "high",
-                    "message": "Page does not appear to use responsive design techniques"
-                })
-                mobile_score -= 15
-                
-            # Touch elements check
-            issues.extend(touch_elements_issues)
-            mobile_score -= len(touch_elements_issues) * 5
-            
-            # Font size check
-            issues.extend(font_size_issues)
-            mobile_score -= len(font_size_issues) * 5
-            
-            # Flash check
-            if uses_flash:
-                issues.append({
-                    "severity": "high",
-                    "message": "Page uses Flash, which is not supported on most mobile devices"
-                })
-                mobile_score -= 20
+            # Issues and score from the active rules of the document's profile
+            issues, mobile_score = score_rules(document, 'mobile', {
+                "has_viewport": has_viewport,
+                "viewport_content": viewport_content,
+                "is_responsive": is_responsive,
+                "small_touch_elements": small_touch_elements,
+                "small_fonts": small_fonts,
+                "uses_flash": uses_flash,
+            })
                 
-            # Cap score between 0 and 100
-            mobile_score = max(0, min(100, mobile_score))
-            
             # Generate mobile-friendliness rating
             if mobile_score >= 90:
                 mobile_rating = "Excellent"
@@ -110,7 +226,7 @@ class MobileService:
             # Compile the results
             return {
                 "timestamp": datetime.utcnow().isoformat(),
-                "execution_time": execution_time,
+                "execution_time": time.perf_counter() - start_time,
                 "score": mobile_score,
                 "rating": mobile_rating,
                 "viewport": {
@@ -136,127 +252,71 @@ class MobileService:
                 }]
             }
     
-    def _check_responsive_design(self, soup, viewport_content):
+    def _check_responsive_design(self, facts, viewport_content):
         """Check if the page uses responsive design techniques"""
         # Check for media queries in style tags
-        has_media_queries = False
-        for style in soup.find_all('style'):
-            if style.string and '@media' in style.string:
-                has_media_queries = True
-                break
+        has_media_queries = facts.has_media_query_styles
                 
         # Check for media attributes in link tags
-        for link in soup.find_all('link', rel='stylesheet'):
-            if link.get('media') and ('screen' in link.get('media') or 'max-width' in link.get('media')):
+        for media in facts.stylesheet_media:
+            if media and ('screen' in media or 'max-width' in media):
                 has_media_queries = True
                 break
                 
         # Check for common responsive framework classes
-        responsive_classes = [
-            'container', 'row', 'col', 'hidden-xs', 'visible-md',
-            'flex', 'grid', 'sm:', 'md:', 'lg:' # Tailwind classes
-        ]
-        
-        has_responsive_classes = False
-        for class_name in responsive_classes:
-            elements = soup.find_all(class_=re.compile(class_name))
-            if elements:
-                has_responsive_classes = True
-                break
+        has_responsive_classes = any(
+            class_name in classes
+            for classes in facts.class_values
+            for class_name in RESPONSIVE_CLASSES
+        )
                 
         # Check viewport content for width=device-width
         has_device_width = viewport_content and 'width=device-width' in viewport_content
                 
         return has_media_queries or has_responsive_classes or has_device_width
     
-    def _check_touch_elements(self, soup):
-        """Check if touch elements (buttons, links) are large enough and well-spaced"""
-        issues = []
-        
+    def _count_small_touch_elements(self, facts):
+        """Count touch elements (buttons, links) that are too small to tap"""
         # This is a simplified approach - ideally we would analyze CSS and rendered size
         # Find links and buttons with small dimensions
         small_touch_elements = 0
         
-        for element in soup.find_all(['a', 'button']):
-            # Check for inline width and height
-            width = element.get('width')
-            height = element.get('height')
-            
-            if width and height:
-                try:
-                    # Convert to integers (removing 'px' if present)
-                    width_val = int(width.replace('px', '')) if 'px' in width else int(width)
-                    height_val = int(height.replace('px', '')) if 'px' in height else int(height)
-                    
-                    if width_val < 44 or height_val < 44:
-                        small_touch_elements += 1
-                except (ValueError, TypeError):
-                    # Can't parse the dimensions
-                    pass
-                    
-        if small_touch_elements > 0:
-            issues.append({
-                "severity": "medium",
-                "message": f"Found {small_touch_elements} touch elements that may be too small for mobile users"
-            })
+        for width, height in facts.touch_dimensions:
+            try:
+                # Convert to integers (removing 'px' if present)
+                width_val = int(width.replace('px', '')) if 'px' in width else int(width)
+                height_val = int(height.replace('px', '')) if 'px' in height else int(height)
+                
+                if width_val < 44 or height_val < 44:
+                    small_touch_elements += 1
+            except (ValueError, TypeError):
+                # Can't parse the dimensions
+                pass
             
         # Real implementation would analyze CSS more thoroughly
                 
-        return issues
+        return small_touch_elements
     
-    def _check_font_sizes(self, soup):
-        """Check if font sizes are readable on mobile devices"""
-        issues = []
-        
+    def _count_small_fonts(self, facts):
+        """Count font sizes that are too small to read on mobile devices"""
         # Look for font-size in inline styles
-        small_fonts = 0
-        for element in soup.find_all(style=True):
-            style = element.get('style', '')
-            font_size_match = re.search(r'font-size\s*:\s*(\d+)px', style)
-            if font_size_match:
-                size = int(font_size_match.group(1))
-                if size < 14:  # Too small for mobile readability
-                    small_fonts += 1
+        small_fonts = sum(1 for size in facts.inline_font_sizes if size < 14)  # Too small for mobile readability
                     
         # Check for small font tags
-        small_fonts += len(soup.find_all('font', size=lambda s: s and int(s) < 3))
-            
-        if small_fonts > 0:
-            issues.append({
-                "severity": "medium",
-                "message": f"Found {small_fonts} instances of font sizes that may be too small for mobile devices"
-            })
+        small_fonts += sum(1 for size in facts.font_tag_sizes if size and int(size) < 3)
             
-        return issues
+        return small_fonts
     
-    def _check_responsive_frameworks(self, soup):
+    def _check_responsive_frameworks(self, document, facts):
         """Check if the page uses a responsive design framework"""
-        # Look for common framework signatures
-        frameworks = {
-            'Bootstrap': [
-                'bootstrap.css', 'bootstrap.min.css', 'class="container"', 'class="row"', 'class="col'
-            ],
-            'Foundation': [
-                'foundation.css', 'foundation.min.css', 'class="small-'
-            ],
-            'Tailwind': [
-                'tailwind.css', 'class="sm:', 'class="md:', 'class="lg:'
-            ],
-            'Bulma': [
-                'bulma.css', 'bulma.min.css', 'class="column"', 'class="columns"'
-            ],
-            'Materialize': [
-                'materialize.css', 'materialize.min.css', 'class="container"', 'class="row"'
-            ]
-        }
-        
-        page_html = str(soup)
-        detected_frameworks = []
-        
-        for framework, signatures in frameworks.items():
-            for signature in signatures:
-                if signature in page_html:
-                    detected_frameworks.append(framework)
-                    break
-        
-        return bool(detected_frameworks)
\ No newline at end of file
+        # Signatures in the page source: stylesheet names, and class
+        # attributes in markup, inline templates and scripts
+        if FRAMEWORK_MATCHER.search(document.html):
+            return True
+
+        # The parser normalizes class attributes (quoting, whitespace), so
+        # also match class signatures against the values as serialized
+        return any(
+            classes in FRAMEWORK_CLASSES or classes.startswith(FRAMEWORK_CLASS_PREFIXES)
+            for classes in facts.class_values
+        )
@@ -1,7 +1,76 @@
-from bs4 import BeautifulSoup
+import time
 from datetime import datetime
 import re
 from urllib.parse import urlparse, urljoin
+from services.html_document import HtmlDocument
+from services.dom_walker import Collector, register_collector, attr_matches
+from services.rule_engine import Rule, register_rule, score_rules
+
+
+@register_collector
+class PerformanceFacts(Collector):
+    """Resource facts gathered during the shared tree walk"""
+
+    name = 'performance'
+    tags = ('head', 'link', 'script', 'img', 'iframe')
+
+    def __init__(self):
+        self.stylesheets = []
+        self.scripts = []
+        self.images = []
+        self.iframe_count = 0
+        self.head_stylesheets = []
+        self.head_scripts = []
+        self._head = None
+        self._in_head = False
+
+    def start(self, tag):
+        name = tag.name
+        if name == 'link':
+            if attr_matches(tag, 'rel', 'stylesheet'):
+                self.stylesheets.append(tag)
+                if self._in_head:
+                    self.head_stylesheets.append(tag)
+        elif name == 'script':
+            if tag.get('src') is not None:
+                self.scripts.append(tag)
+                if self._in_head:
+                    self.head_scripts.append(tag)
+        elif name == 'img':
+            if tag.get('src') is not None:
+                self.images.append(tag)
+        elif name == 'iframe':
+            self.iframe_count += 1
+        elif name == 'head' and self._head is None:
+            # Only the first <head> counts, like soup.find('head')
+            self._head = tag
+            self._in_head = True
+
+    def end(self, tag):
+        if tag is self._head:
+            self._in_head = False
+
+
+for _rule in (
+    Rule('performance.large-html', 'performance', 'medium', 5, "HTML document is large ({html_size_kb:.1f}KB).",
+         lambda v: v['html_size_kb'] > 100),
+    Rule('performance.resources-high', 'performance', 'high', 10,
+         "High number of resources detected ({total_resources}).",
+         lambda v: v['total_resources'] > 50),
+    Rule('performance.resources-many', 'performance', 'medium', 5, "Too many resources detected ({total_resources}).",
+         lambda v: 30 < v['total_resources'] <= 50),
+    Rule('performance.render-blocking', 'performance', 'high', 2,
+         "{render_blocking_count} render-blocking resources detected.",
+         lambda v: v['render_blocking_count'] > 0, scale='render_blocking_count'),
+    Rule('performance.no-lazy-images', 'performance', 'medium', 5, "No images use lazy loading.",
+         lambda v: v['image_count'] > 3 and v['lazy_loaded_images'] == 0),
+    Rule('performance.unminified-js', 'performance', 'medium', 5, "JavaScript files are not minified.",
+         lambda v: not v['minified_js']),
+    Rule('performance.unminified-css', 'performance', 'medium', 5, "CSS files are not minified.",
+         lambda v: not v['minified_css']),
+):
+    register_rule(_rule)
+
 
 class PerformanceService:
     def __init__(self):
@@ -12,46 +81,46 @@ class PerformanceService:
         Analyze performance aspects of a website.
 
         Args:
-            html_content (str): The HTML content of the page.
+            html_content (str | HtmlDocument): The HTML content of the page, or a
+                parsed document shared with the other analyzers.
             url (str): URL of the page.
 
         Returns:
             dict: Performance analysis results.
         """
         # Start timer
-        start_time = datetime.utcnow()
+        start_time = time.perf_counter()
 
-        # Create BeautifulSoup object
-        soup = BeautifulSoup(html_content, 'html.parser')
+        # Reuse the shared parsed document when one is given
+        document = HtmlDocument.from_content(html_content)
+        facts = document.facts(PerformanceFacts.name)
         parsed_url = urlparse(url)
         base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
 
         # Calculate HTML size
-        html_size = len(html_content)
+        html_size = len(document.html)
         html_size_kb = html_size / 1024
 
         # Count resources by type
-        stylesheets = soup.find_all('link', rel='stylesheet')
-        scripts = soup.find_all('script', src=True)
-        images = soup.find_all('img', src=True)
-        iframes = soup.find_all('iframe')
+        stylesheets = facts.stylesheets
+        scripts = facts.scripts
+        images = facts.images
+        iframe_count = facts.iframe_count
 
         # Collect render-blocking resources
         render_blocking = []
-        head = soup.find('head')
-        if head:
-            for css in head.find_all('link', rel='stylesheet'):
-                if not css.get('media') or css.get('media') == 'all':
-                    render_blocking.append({
-                        'type': 'css',
-                        'url': css.get('href')
-                    })
-            for script in head.find_all('script', src=True):
-                if not script.get('async') and not script.get('defer'):
-                    render_blocking.append({
-                        'type': 'js',
-                        'url': script.get('src')
-                    })
+        for css in facts.head_stylesheets:
+            if not css.get('media') or css.get('media') == 'all':
+                render_blocking.append({
+                    'type': 'css',
+                    'url': css.get('href')
+                })
+        for script in facts.head_scripts:
+            if not script.get('async') and not script.get('defer'):
+                render_blocking.append({
+                    'type': 'js',
+                    'url': script.get('src')
+                })
 
         # Lazy loading check for images
         lazy_loaded_images = 0
@@ -64,65 +133,18 @@ class PerformanceService:
         has_minified_css = self._check_minification(stylesheets, 'href')
 
         # Total resource count
-        total_resources = len(stylesheets) + len(scripts) + len(images) + len(iframes)
-
-        # End timer for performance analysis
-        end_time = datetime.utcnow()
-        execution_time = (end_time - start_time).total_seconds()
-
-        # Prepare heuristic scoring
-        issues = []
-        performance_score = 100
-
-        if html_size_kb > 100:
-            issues.append({
-                "severity": "medium",
-                "message": f"HTML document is large ({html_size_kb:.1f}KB)."
-            })
-            performance_score -= 5
-
-        if total_resources > 50:
-            issues.append({
-                "severity": "high",
-                "message": f"High number of resources detected ({total_resources})."
-            })
-            performance_score -= 10
-        elif total_resources > 30:
-            issues.append({
-                "severity": "medium",
-                "message": f"Too many resources detected ({total_resources})."
-            })
-            performance_score -= 5
-
-        if render_blocking:
-            issues.append({
-                "severity": "high",
-                "message": f"{len(render_blocking)} render-blocking resources detected."
-            })
-            performance_score -= len(render_blocking) * 2
-
-        if len(images) > 3 and lazy_loaded_images == 0:
-            issues.append({
-                "severity": "medium",
-                "message": "No images use lazy loading."
-            })
-            performance_score -= 5
-
-        if not has_minified_js:
-            issues.append({
-                "severity": "medium",
-                "message": "JavaScript files are not minified."
-            })
-            performance_score -= 5
-
-        if not has_minified_css:
-            issues.append({
-                "severity": "medium",
-                "message": "CSS files are not minified."
-            })
-            performance_score -= 5
-
-        performance_score = max(0, min(100, performance_score))
+        total_resources = len(stylesheets) + len(scripts) + len(images) + iframe_count
+
+        # Issues and score from the active rules of the document's profile
+        issues, performance_score = score_rules(document, 'performance', {
+            "html_size_kb": html_size_kb,
+            "total_resources": total_resources,
+            "render_blocking_count": len(render_blocking),
+            "image_count": len(images),
+            "lazy_loaded_images": lazy_loaded_images,
+            "minified_js": has_minified_js,
+            "minified_css": has_minified_css,
+        })
 
         if performance_score >= 90:
             performance_rating = "Excellent"
@@ -137,13 +159,13 @@ class PerformanceService:
 
         return {
             "timestamp": datetime.utcnow().isoformat(),
-            "execution_time": execution_time,
+            "execution_time": time.perf_counter() - start_time,
             "html_size_kb": round(html_size_kb, 2),
             "resource_counts": {
                 "stylesheets": len(stylesheets),
                 "scripts": len(scripts),
                 "images": len(images),
-                "iframes": len(iframes)
+                "iframes": iframe_count
             },
             "total_resources": total_resources,
             "render_blocking_count": len(render_blocking),
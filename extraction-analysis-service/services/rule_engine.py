@@ -0,0 +1,296 @@
+import os
+import json
+import threading
+from fnmatch import fnmatchcase
+from dotenv import load_dotenv
+from services.dom_walker import Collector, attr_text
+
+load_dotenv()
+
+# JSON file of rule profiles selectable per request (see README)
+RULE_PROFILES_PATH = os.getenv("RULE_PROFILES_PATH", "rule_profiles.json")
+DEFAULT_PROFILE = 'default'
+
+# Rules in declaration order, which is the order their issues are reported in
+_RULES = []
+_rules_lock = threading.Lock()
+
+
+class ElementCheck:
+    """
+    A query over the elements of a page, answered by the shared tree walk
+
+    Counts the elements with one of `tags` (total) and those for which
+    predicate(attributes) is true (count), where attributes maps each of
+    `attributes` to the element's value (multi-valued ones space-joined,
+    None when absent). The predicate may only read those attributes; it is
+    called once with all of them absent when the check is declared. Checks
+    are named so rules of several analyzers can share one.
+    """
+
+    def __init__(self, name, tags, attributes, predicate):
+        self.name = name
+        self.tags = tuple(tags)
+        self.attributes = tuple(attributes)
+        self.predicate = predicate
+        # Verdict on elements that have none of the attributes
+        self.matches_bare = bool(predicate(dict.fromkeys(self.attributes)))
+
+
+# Element checks used by the rules of more than one analyzer
+IMAGES_WITHOUT_ALT = ElementCheck(
+    'images-without-alt', ('img',), ('alt',), lambda attributes: not (attributes['alt'] or '').strip()
+)
+
+
+class Rule:
+    """
+    One scored check of an analyzer
+
+    When `when(values)` is true the rule reports an issue with its severity
+    and message (formatted with the values) and deducts its weight from the
+    analyzer's score of 100. values are the figures the analyzer computed
+    for the page; a rule with an ElementCheck also gets its `count` and
+    `total`. With `scale`, the weight is multiplied by that value, and
+    `max_weight` caps the deduction. Rules with enabled=False only run in
+    profiles that enable them.
+    """
+
+    def __init__(self, id, analyzer, severity, weight, message, when,
+                 elements=None, scale=None, max_weight=None, enabled=True):
+        self.id = id
+        self.analyzer = analyzer
+        self.severity = severity
+        self.weight = weight
+        self.message = message
+        self.when = when
+        self.elements = elements
+        self.scale = scale
+        self.max_weight = max_weight
+        self.enabled = enabled
+
+
+def register_rule(rule):
+    """Add a rule to the registry; ids must be unique"""
+    with _rules_lock:
+        if any(existing.id == rule.id for existing in _RULES):
+            raise ValueError(f"Rule {rule.id} is already registered")
+        _RULES.append(rule)
+    return rule
+
+
+def registered_rules():
+    with _rules_lock:
+        return list(_RULES)
+
+
+class RuleProfile:
+    """
+    Which rules run and how much they weigh
+
+    Rules are matched by id or by a shell-style pattern ('performance.*').
+    `enable` switches on rules registered with enabled=False, `disable`
+    switches rules off, and `weights` and `severities` override them.
+    """
+
+    def __init__(self, name, enable=(), disable=(), weights=None, severities=None):
+        self.name = name
+        self.enable = tuple(enable)
+        self.disable = tuple(disable)
+        self.weights = dict(weights or {})
+        self.severities = dict(severities or {})
+
+    @staticmethod
+    def _lookup(overrides, rule_id):
+        for pattern, value in overrides.items():
+            if fnmatchcase(rule_id, pattern):
+                return value
+        return None
+
+    def applies_to(self, rule):
+        enabled = rule.enabled or any(fnmatchcase(rule.id, pattern) for pattern in self.enable)
+        return enabled and not any(fnmatchcase(rule.id, pattern) for pattern in self.disable)
+
+    def weight(self, rule):
+        weight = self._lookup(self.weights, rule.id)
+        return rule.weight if weight is None else weight
+
+    def severity(self, rule):
+        return self._lookup(self.severities, rule.id) or rule.severity
+
+
+class RuleSet:
+    """
+    A profile's active rules, compiled for one walk
+
+    The element checks of all active rules are merged into one tag index,
+    so each element is read once, for the union of the attributes its
+    checks need, however many rules there are. Page-level rules only read
+    the values the analyzers compute anyway.
+    """
+
+    def __init__(self, profile, rules):
+        self.profile = profile.name
+        self.rules = {}  # analyzer -> [(rule, severity, weight)]
+        checks = {}
+        for rule in rules:
+            if not profile.applies_to(rule):
+                continue
+            self.rules.setdefault(rule.analyzer, []).append((rule, profile.severity(rule), profile.weight(rule)))
+            if rule.elements is not None:
+                checks[rule.elements.name] = rule.elements
+
+        self.checks = checks  # name -> ElementCheck
+        self.index = {}  # tag -> ([checks], attribute names read from the tag)
+        for check in checks.values():
+            for tag in check.tags:
+                tag_checks, attributes = self.index.setdefault(tag, ([], []))
+                tag_checks.append(check)
+                attributes.extend(name for name in check.attributes if name not in attributes)
+
+    def collector(self):
+        return RuleFacts(self)
+
+    def evaluate(self, analyzer, values, facts):
+        """
+        Run an analyzer's active rules on its values
+
+        Returns:
+            tuple: (issues, score clamped to 0-100)
+        """
+        issues = []
+        score = 100
+        for rule, severity, weight in self.rules.get(analyzer, ()):
+            rule_values = values
+            if rule.elements is not None:
+                count, total = facts.counts(rule.elements.name)
+                rule_values = dict(values, count=count, total=total)
+            if not rule.when(rule_values):
+                continue
+            deduction = weight * rule_values[rule.scale] if rule.scale else weight
+            if rule.max_weight is not None:
+                deduction = min(rule.max_weight, deduction)
+            issues.append({
+                "severity": severity,
+                "message": rule.message.format(**rule_values),
+                "rule": rule.id
+            })
+            score -= deduction
+        return issues, max(0, min(100, score))
+
+
+class RuleFacts(Collector):
+    """
+    Element check counts gathered during the shared tree walk
+
+    Predicates must depend only on the attributes they declare. That lets
+    elements carrying none of a tag's attributes skip the predicates: they
+    are only counted, and each check's verdict on an element without its
+    attributes is computed once.
+    """
+
+    name = 'rules'
+
+    def __init__(self, rule_set):
+        self.rule_set = rule_set
+        self.tags = tuple(rule_set.index)
+        self._matches = {name: [0] for name in rule_set.checks}
+        self._tag_counts = dict.fromkeys(self.tags, 0)
+        self._bare_counts = dict.fromkeys(self.tags, 0)
+        # tag -> (attributes to read, [(predicate, match counter)])
+        self._dispatch = {
+            tag: (frozenset(attributes), [(check.predicate, self._matches[check.name]) for check in checks])
+            for tag, (checks, attributes) in rule_set.index.items()
+        }
+
+    def start(self, tag):
+        name = tag.name
+        attributes, checks = self._dispatch[name]
+        attrs = tag.attrs
+        if attrs.keys().isdisjoint(attributes):
+            self._bare_counts[name] += 1
+            return
+        self._tag_counts[name] += 1
+        get = attrs.get
+        values = {attribute: get(attribute) for attribute in attributes}
+        for attribute, value in values.items():
+            # Multi-valued attributes (class, rel) are lists; rules see one string
+            if value is not None and value.__class__ is not str:
+                values[attribute] = attr_text(tag, attribute)
+        for predicate, matches in checks:
+            if predicate(values):
+                matches[0] += 1
+
+    def counts(self, check_name):
+        """(matching elements, elements checked) of a check"""
+        matches = self._matches.get(check_name)
+        if matches is None:
+            return 0, 0
+        check = self.rule_set.checks[check_name]
+        bare = sum(self._bare_counts[tag] for tag in check.tags)
+        count = matches[0] + (bare if check.matches_bare else 0)
+        return count, sum(self._tag_counts[tag] for tag in check.tags) + bare
+
+
+_profiles = None
+_rule_sets = {}
+_profiles_lock = threading.Lock()
+
+
+def _load_profiles():
+    profiles = {DEFAULT_PROFILE: RuleProfile(DEFAULT_PROFILE)}
+    if RULE_PROFILES_PATH and os.path.exists(RULE_PROFILES_PATH):
+        with open(RULE_PROFILES_PATH, encoding='utf-8') as handle:
+            for name, settings in json.load(handle).items():
+                try:
+                    profiles[name] = RuleProfile(name, **settings)
+                except TypeError as e:
+                    raise ValueError(f"Invalid rule profile {name} in {RULE_PROFILES_PATH}: {str(e)}")
+    return profiles
+
+
+def get_rule_profiles():
+    """Profiles by name: the built-in default plus those in RULE_PROFILES_PATH, loaded once"""
+    global _profiles
+    with _profiles_lock:
+        if _profiles is None:
+            _profiles = _load_profiles()
+        return _profiles
+
+
+def get_rule_set(profile=None):
+    """
+    Return the compiled rule set of a profile (the default one if None)
+
+    Compiled once per profile and recompiled if rules are registered
+    afterwards.
+
+    Raises:
+        ValueError: If there is no profile of that name
+    """
+    name = profile or DEFAULT_PROFILE
+    profiles = get_rule_profiles()
+    if name not in profiles:
+        raise ValueError(f"Unknown rule profile: {name}")
+    rules = registered_rules()
+    with _profiles_lock:
+        cached = _rule_sets.get(name)
+        if cached is None or cached[0] != len(rules):
+            cached = _rule_sets[name] = (len(rules), RuleSet(profiles[name], rules))
+        return cached[1]
+
+
+def score_rules(document, analyzer, values):
+    """
+    Score an analyzer's values against the document's rule profile
+
+    Args:
+        document: HtmlDocument whose walk gathered the element checks
+        analyzer: Analyzer name ('seo', 'mobile', 'performance', 'accessibility')
+        values: Figures the analyzer computed for the page
+
+    Returns:
+        tuple: (issues, score)
+    """
+    facts = document.facts(RuleFacts.name)
+    return facts.rule_set.evaluate(analyzer, values, facts)
@@ -0,0 +1,101 @@
+import os
+import io
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# tiles: the fold plus evenly spaced viewport-sized tiles further down,
+# fold: only what is visible without scrolling, original: send as captured
+LLM_SCREENSHOT_MODE = os.getenv("LLM_SCREENSHOT_MODE", "tiles")
+LLM_SCREENSHOT_MAX_TILES = int(os.getenv("LLM_SCREENSHOT_MAX_TILES", 3))
+LLM_SCREENSHOT_MAX_DIMENSION = int(os.getenv("LLM_SCREENSHOT_MAX_DIMENSION", 768))
+LLM_SCREENSHOT_FORMAT = os.getenv("LLM_SCREENSHOT_FORMAT", "JPEG").upper()  # JPEG | WEBP | PNG
+LLM_SCREENSHOT_QUALITY = int(os.getenv("LLM_SCREENSHOT_QUALITY", 75))
+
+# Height / width of the capture viewport (SiteService uses 1280x800), so a
+# tile shows one screenful whatever the device scale factor was
+FOLD_ASPECT = 800 / 1280
+
+_MIME_TYPES = {'JPEG': 'image/jpeg', 'WEBP': 'image/webp', 'PNG': 'image/png'}
+
+
+def _tile_boxes(width, height, mode, max_tiles):
+    """
+    Crop boxes of screenful-sized tiles: the first at the top of the page,
+    the rest spread evenly down to the bottom
+    """
+    tile_height = max(1, round(width * FOLD_ASPECT))
+    if mode == 'fold' or height <= tile_height:
+        return [(0, 0, width, min(height, tile_height))]
+    count = min(max_tiles, -(-height // tile_height))
+    if count <= 1:
+        return [(0, 0, width, tile_height)]
+    step = (height - tile_height) / (count - 1)
+    tops = [round(index * step) for index in range(count)]
+    return [(0, top, width, top + tile_height) for top in tops]
+
+
+def prepare_screenshot(image_bytes, mime_type="image/png", mode=None, max_tiles=None,
+                       max_dimension=None, image_format=None, quality=None):
+    """
+    Turn a full-page screenshot into a few small images for the LLM prompt
+
+    Long captures cost upload time and image tokens in proportion to the
+    page length. Cropping to a bounded number of screenful tiles,
+    downscaling each so its longer side is at most max_dimension and
+    re-encoding keeps the cost of the image parts constant.
+
+    Args:
+        image_bytes: Raw screenshot bytes (PNG, or the stored WebP/JPEG)
+        mime_type: MIME type of image_bytes
+        mode: tiles | fold | original (default LLM_SCREENSHOT_MODE)
+        max_tiles: Upper bound on tiles in tiles mode
+        max_dimension: Longest side in pixels of each tile sent
+        image_format: JPEG | WEBP | PNG
+        quality: Encoder quality for JPEG and WebP
+
+    Returns:
+        tuple: (list of {"mime_type", "data"} image parts, stats dict)
+    """
+    mode = mode or LLM_SCREENSHOT_MODE
+    max_tiles = max_tiles or LLM_SCREENSHOT_MAX_TILES
+    max_dimension = max_dimension or LLM_SCREENSHOT_MAX_DIMENSION
+    image_format = (image_format or LLM_SCREENSHOT_FORMAT).upper()
+    quality = quality or LLM_SCREENSHOT_QUALITY
+
+    stats = {"mode": mode, "original_bytes": len(image_bytes)}
+    if not image_bytes:
+        stats.update({"tiles": 0, "sent_bytes": 0})
+        return [], stats
+    if mode == 'original' or Image is None:
+        stats.update({"mode": 'original', "tiles": 1, "sent_bytes": len(image_bytes)})
+        return [{"mime_type": mime_type, "data": image_bytes}], stats
+
+    try:
+        parts = _encode_tiles(image_bytes, stats, mode, max_tiles, max_dimension, image_format, quality)
+    except Exception as e:
+        # The report can still be written from the HTML and analyzer results
+        print(f"Error preparing screenshot for the LLM: {str(e)}")
+        stats.update({"error": str(e), "tiles": 0, "sent_bytes": 0})
+        return [], stats
+
+    stats.update({"tiles": len(parts), "sent_bytes": sum(len(part["data"]) for part in parts)})
+    return parts, stats
+
+
+def _encode_tiles(image_bytes, stats, mode, max_tiles, max_dimension, image_format, quality):
+    parts = []
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        stats["original_size"] = list(image.size)
+        if image_format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        for box in _tile_boxes(image.width, image.height, mode, max_tiles):
+            tile = image.crop(box)
+            tile.thumbnail((max_dimension, max_dimension), Image.LANCZOS, reducing_gap=2.0)
+            output = io.BytesIO()
+            tile.save(output, format=image_format, quality=quality)
+            parts.append({"mime_type": _MIME_TYPES[image_format], "data": output.getvalue()})
+        stats["tile_size"] = list(tile.size)
+    return parts
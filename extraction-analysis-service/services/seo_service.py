@@ -1,7 +1,109 @@
-from bs4 import BeautifulSoup
+import time
 from datetime import datetime
 from urllib.parse import urlparse, urljoin
 import re
+from services.html_document import HtmlDocument
+from services.dom_walker import Collector, register_collector, attr_matches
+from services.rule_engine import Rule, register_rule, score_rules, IMAGES_WITHOUT_ALT
+
+WORD_PATTERN = re.compile(r'\b\w+\b')
+ROBOTS_PATTERN = re.compile('robots', re.I)
+
+
+@register_collector
+class SeoFacts(Collector):
+    """SEO facts gathered during the shared tree walk"""
+
+    name = 'seo'
+    tags = ('title', 'meta', 'h1', 'h2', 'h3', 'link', 'script', 'img', 'a')
+    wants_text = True
+
+    def __init__(self):
+        self.title_tag = None
+        self.og_title_tag = None
+        self.description_tag = None
+        self.og_description_tag = None
+        self.robots_tag = None
+        self.viewport_tag = None
+        self.canonical_tag = None
+        self.h1_tags = []
+        self.h2_count = 0
+        self.h3_count = 0
+        self.structured_data_count = 0
+        self.images = []
+        self.link_hrefs = []
+        self.word_count = 0
+
+    def start(self, tag):
+        name = tag.name
+        if name == 'meta':
+            # Keep only the first match of each kind, like soup.find()
+            if self.og_title_tag is None and attr_matches(tag, 'property', 'og:title'):
+                self.og_title_tag = tag
+            if self.og_description_tag is None and attr_matches(tag, 'property', 'og:description'):
+                self.og_description_tag = tag
+            if self.description_tag is None and attr_matches(tag, 'name', 'description'):
+                self.description_tag = tag
+            if self.viewport_tag is None and attr_matches(tag, 'name', 'viewport'):
+                self.viewport_tag = tag
+            if self.robots_tag is None and isinstance(tag.get('name'), str) and ROBOTS_PATTERN.search(tag['name']):
+                self.robots_tag = tag
+        elif name == 'a':
+            href = tag.get('href')
+            if href is not None:
+                self.link_hrefs.append(href)
+        elif name == 'img':
+            self.images.append(tag)
+        elif name == 'h1':
+            self.h1_tags.append(tag)
+        elif name == 'h2':
+            self.h2_count += 1
+        elif name == 'h3':
+            self.h3_count += 1
+        elif name == 'link':
+            if self.canonical_tag is None and attr_matches(tag, 'rel', 'canonical'):
+                self.canonical_tag = tag
+        elif name == 'script':
+            if attr_matches(tag, 'type', 'application/ld+json'):
+                self.structured_data_count += 1
+        elif name == 'title':
+            if self.title_tag is None:
+                self.title_tag = tag
+
+    def text(self, string):
+        stripped = string.strip()
+        if stripped:
+            self.word_count += len(WORD_PATTERN.findall(stripped))
+
+
+for _rule in (
+    Rule('seo.title-missing', 'seo', 'high', 15, "Page is missing a title tag.",
+         lambda v: not v['title']),
+    Rule('seo.title-short', 'seo', 'medium', 5, "Title is too short (less than 30 characters).",
+         lambda v: v['title'] and v['title_length'] < 30),
+    Rule('seo.title-long', 'seo', 'medium', 5, "Title is too long (more than 60 characters).",
+         lambda v: v['title'] and v['title_length'] > 60),
+    Rule('seo.meta-description-missing', 'seo', 'medium', 10, "Missing meta description.",
+         lambda v: not v['meta_description']),
+    Rule('seo.meta-description-short', 'seo', 'low', 3, "Meta description is too short (less than 100 characters).",
+         lambda v: v['meta_description'] and v['meta_description_length'] < 100),
+    Rule('seo.meta-description-long', 'seo', 'low', 3, "Meta description is too long (more than 160 characters).",
+         lambda v: v['meta_description'] and v['meta_description_length'] > 160),
+    Rule('seo.h1-missing', 'seo', 'high', 10, "Missing H1 heading.",
+         lambda v: v['h1_count'] == 0),
+    Rule('seo.h1-multiple', 'seo', 'medium', 5, "Multiple H1 tags found: {h1_count}.",
+         lambda v: v['h1_count'] > 1),
+    Rule('seo.images-missing-alt', 'seo', 'medium', 1, "{count} of {total} images lack alt text.",
+         lambda v: v['count'] > 0, elements=IMAGES_WITHOUT_ALT, scale='count', max_weight=10),
+    Rule('seo.canonical-missing', 'seo', 'low', 3, "Missing canonical URL.",
+         lambda v: not v['canonical_url']),
+    Rule('seo.viewport-missing', 'seo', 'medium', 8, "Missing viewport meta tag for mobile-friendliness.",
+         lambda v: not v['has_viewport']),
+    Rule('seo.thin-content', 'seo', 'medium', 7, "Thin content detected ({word_count} words).",
+         lambda v: v['word_count'] < 300),
+):
+    register_rule(_rule)
+
 
 class SeoService:
     """Service to analyze SEO aspects of a website robustly"""
@@ -11,47 +113,50 @@ class SeoService:
         Analyze SEO aspects of a website robustly for modern frameworks.
         
         Args:
-            html_content (str): HTML content of the page (preferably rendered HTML).
+            html_content (str | HtmlDocument): HTML content of the page (preferably rendered HTML),
+                or an already parsed document shared with the other analyzers.
             url (str): URL of the page.
             
         Returns:
             dict: SEO analysis results.
         """
         try:
-            start_time = datetime.utcnow()
-            soup = BeautifulSoup(html_content, 'html.parser')
+            start_time = time.perf_counter()
+            document = HtmlDocument.from_content(html_content)
+            facts = document.facts(SeoFacts.name)
 
             # Parse the URL details
             parsed_url = urlparse(url)
             base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
 
             # Get title: try <title> first, then Open Graph if missing
-            title = soup.title.text.strip() if soup.title and soup.title.text.strip() else None
+            title_tag = facts.title_tag
+            title = title_tag.text.strip() if title_tag and title_tag.text.strip() else None
             if not title:
-                og_title_tag = soup.find('meta', property='og:title')
+                og_title_tag = facts.og_title_tag
                 if og_title_tag and og_title_tag.get('content'):
                     title = og_title_tag['content'].strip()
             title_length = len(title) if title else 0
 
             # Get meta description: try standard meta then Open Graph description
             meta_description = None
-            desc_tag = soup.find('meta', attrs={'name': 'description'})
+            desc_tag = facts.description_tag
             if desc_tag and desc_tag.get('content'):
                 meta_description = desc_tag['content'].strip()
             else:
-                og_desc_tag = soup.find('meta', property='og:description')
+                og_desc_tag = facts.og_description_tag
                 if og_desc_tag and og_desc_tag.get('content'):
                     meta_description = og_desc_tag['content'].strip()
             meta_description_length = len(meta_description) if meta_description else 0
 
             # Get headings
-            h1_tags = soup.find_all('h1')
-            h2_tags = soup.find_all('h2')
-            h3_tags = soup.find_all('h3')
+            h1_tags = facts.h1_tags
+            h2_count = facts.h2_count
+            h3_count = facts.h3_count
 
             # Check for canonical URL
             canonical_url = None
-            canonical_tag = soup.find('link', attrs={'rel': 'canonical'})
+            canonical_tag = facts.canonical_tag
             if canonical_tag and canonical_tag.get('href'):
                 canonical_url = canonical_tag['href'].strip()
                 if not canonical_url.startswith(('http://', 'https://')):
@@ -59,24 +164,23 @@ class SeoService:
 
             # Check for robots meta tag
             robots_content = None
-            robots_tag = soup.find('meta', attrs={'name': re.compile('robots', re.I)})
+            robots_tag = facts.robots_tag
             if robots_tag and robots_tag.get('content'):
                 robots_content = robots_tag['content'].strip()
 
             # Check for structured data
-            structured_data_count = len(soup.find_all('script', attrs={'type': 'application/ld+json'}))
+            structured_data_count = facts.structured_data_count
 
             # Check for image alt text
-            images = soup.find_all('img')
+            images = facts.images
             images_with_alt = [img for img in images if img.get('alt') and img.get('alt').strip()]
             images_without_alt = [img for img in images if not (img.get('alt') and img.get('alt').strip())]
 
             # Check for broken links (simplified)
-            links = soup.find_all('a', href=True)
             internal_links = []
             external_links = []
-            for link in links:
-                href = link['href'].strip()
+            for href in facts.link_hrefs:
+                href = href.strip()
                 if href.startswith(('#', 'javascript:', 'mailto:')):
                     continue
                 if not href.startswith(('http://', 'https://')):
@@ -88,72 +192,25 @@ class SeoService:
 
             # Check meta viewport for responsiveness
             has_viewport = False
-            viewport_tag = soup.find('meta', attrs={'name': 'viewport'})
+            viewport_tag = facts.viewport_tag
             if viewport_tag and viewport_tag.get('content'):
                 has_viewport = True
 
-            # Calculate word count (approximate)
-            text_content = soup.get_text(separator=' ', strip=True)
-            word_count = len(re.findall(r'\b\w+\b', text_content))
-
-            end_time = datetime.utcnow()
-            execution_time = (end_time - start_time).total_seconds()
+            # Word count (approximate), gathered from the text nodes during the walk
+            word_count = facts.word_count
 
-            # Prepare analysis result variables
-            seo_issues = []
-            seo_score = 100
+            # Issues and score from the active rules of the document's profile
+            seo_issues, seo_score = score_rules(document, 'seo', {
+                "title": title,
+                "title_length": title_length,
+                "meta_description": meta_description,
+                "meta_description_length": meta_description_length,
+                "h1_count": len(h1_tags),
+                "canonical_url": canonical_url,
+                "has_viewport": has_viewport,
+                "word_count": word_count,
+            })
 
-            # Title checks
-            if not title:
-                seo_issues.append({"severity": "high", "message": "Page is missing a title tag."})
-                seo_score -= 15
-            elif title_length < 30:
-                seo_issues.append({"severity": "medium", "message": "Title is too short (less than 30 characters)."})
-                seo_score -= 5
-            elif title_length > 60:
-                seo_issues.append({"severity": "medium", "message": "Title is too long (more than 60 characters)."})
-                seo_score -= 5
-
-            # Meta description checks
-            if not meta_description:
-                seo_issues.append({"severity": "medium", "message": "Missing meta description."})
-                seo_score -= 10
-            elif meta_description_length < 100:
-                seo_issues.append({"severity": "low", "message": "Meta description is too short (less than 100 characters)."})
-                seo_score -= 3
-            elif meta_description_length > 160:
-                seo_issues.append({"severity": "low", "message": "Meta description is too long (more than 160 characters)."})
-                seo_score -= 3
-
-            # Headings check
-            if not h1_tags:
-                seo_issues.append({"severity": "high", "message": "Missing H1 heading."})
-                seo_score -= 10
-            elif len(h1_tags) > 1:
-                seo_issues.append({"severity": "medium", "message": f"Multiple H1 tags found: {len(h1_tags)}."})
-                seo_score -= 5
-
-            # Image alt text check
-            if images and images_without_alt:
-                seo_issues.append({"severity": "medium", "message": f"{len(images_without_alt)} of {len(images)} images lack alt text."})
-                seo_score -= min(10, len(images_without_alt))
-
-            # Canonical URL check
-            if not canonical_url:
-                seo_issues.append({"severity": "low", "message": "Missing canonical URL."})
-                seo_score -= 3
-
-            # Viewport check for mobile-friendliness
-            if not has_viewport:
-                seo_issues.append({"severity": "medium", "message": "Missing viewport meta tag for mobile-friendliness."})
-                seo_score -= 8
-
-            # Content length check
-            if word_count < 300:
-                seo_issues.append({"severity": "medium", "message": f"Thin content detected ({word_count} words)."})
-                seo_score -= 7
-
-            seo_score = max(0, min(100, seo_score))
             if seo_score >= 90:
                 seo_rating = "Excellent"
             elif seo_score >= 80:
@@ -167,7 +224,7 @@ class SeoService:
 
             return {
                 "timestamp": datetime.utcnow().isoformat(),
-                "execution_time": execution_time,
+                "execution_time": time.perf_counter() - start_time,
                 "score": seo_score,
                 "rating": seo_rating,
                 "title": {"text": title, "length": title_length},
@@ -175,8 +232,8 @@ class SeoService:
                 "headings": {
                     "h1_count": len(h1_tags),
                     "h1_text": [h1.get_text(strip=True) for h1 in h1_tags],
-                    "h2_count": len(h2_tags),
-                    "h3_count": len(h3_tags)
+                    "h2_count": h2_count,
+                    "h3_count": h3_count
                 },
                 "images": {"total": len(images), "with_alt": len(images_with_alt), "without_alt": len(images_without_alt)},
                 "links": {"internal_count": len(internal_links), "external_count": len(external_links)},
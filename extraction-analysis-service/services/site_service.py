@@ -1,13 +1,32 @@
-import requests
 import asyncio
-from playwright.async_api import async_playwright
-import base64
+import hashlib
 import os
 import subprocess
+import contextvars
+import concurrent.futures
 from datetime import datetime
+from services.browser_pool import get_browser_pool
+from services.http_client import get_http_client, HttpClientError
+from utils.tracing import span
+
+# How evaluate_site gets the page:
+#   parallel   - plain HTTP fetch and browser screenshot run at the same time
+#   sequential - fetch, then screenshot (previous behaviour)
+#   single     - one browser navigation yields rendered HTML, headers and
+#                screenshot; opt-in, as the analyzers then score the rendered
+#                DOM rather than the server's response and scores change
+SITE_FETCH_MODE = os.getenv("SITE_FETCH_MODE", "parallel")
+
+# Small shared pool for the HTTP half of parallel mode
+_fetch_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.getenv("SITE_FETCH_WORKERS", 4)),
+    thread_name_prefix="site-fetch"
+)
 
 
 class SiteService:
+    _browsers_installed = False
+    
     def __init__(self):
         # Configure headers to mimic a browser request
         self.headers = {
@@ -17,35 +36,62 @@ class SiteService:
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         }
+        self.viewport = {'width': 1280, 'height': 800}
     
-    def fetch_html(self, url):
+    def fetch_html(self, url, etag=None, last_modified=None):
         """
         Fetch the HTML content of a given URL
+        
+        When validators from a previous fetch are given the request is
+        conditional, and an unchanged page comes back with status
+        'not_modified' and no body.
         """
-        try:
-            response = requests.get(url, headers=self.headers, timeout=30)
-            response.raise_for_status()
+        with span('fetch_html') as fetch_span:
+            try:
+                headers = dict(self.headers)
+                if etag:
+                    headers['If-None-Match'] = etag
+                if last_modified:
+                    headers['If-Modified-Since'] = last_modified
+                
+                # Shared client: keep-alive pools per host, so repeat hosts skip DNS, TCP and TLS setup
+                response = get_http_client().get(url, headers=headers)
+                
+                if response.status_code == 304:
+                    fetch_span.outcome = 'not_modified'
+                    return {
+                        'status': 'not_modified',
+                        'status_code': response.status_code,
+                        'headers': dict(response.headers),
+                        'url': response.url,
+                        'timestamp': datetime.utcnow().isoformat()
+                    }
+                
+                fetch_span.bytes = len(response.content)
+                return {
+                    'status': 'success',
+                    'html': response.text,
+                    'content_hash': hashlib.sha256(response.content).hexdigest(),
+                    'status_code': response.status_code,
+                    'headers': dict(response.headers),
+                    'url': response.url,  # Final URL after any redirects
+                    'timestamp': datetime.utcnow().isoformat()
+                }
             
-            return {
-                'status': 'success',
-                'html': response.text,
-                'status_code': response.status_code,
-                'headers': dict(response.headers),
-                'url': response.url,  # Final URL after any redirects
-                'timestamp': datetime.utcnow().isoformat()
-            }
-        
-        except requests.exceptions.RequestException as e:
-            return {
-                'status': 'error',
-                'error': str(e),
-                'timestamp': datetime.utcnow().isoformat()
-            }
+            except HttpClientError as e:
+                fetch_span.outcome = 'error'
+                return {
+                    'status': 'error',
+                    'error': str(e),
+                    'timestamp': datetime.utcnow().isoformat()
+                }
     
     def _ensure_playwright_browsers_installed(self):
         """
         Check if Playwright browsers are installed and install them if needed
         """
+        if SiteService._browsers_installed:
+            return True
         try:
             # Check if the browser directory exists
             browser_path = "/Users/dakshpokar/Library/Caches/ms-playwright/chromium-1105/chrome-mac/Chromium.app/Contents/MacOS/Chromium"
@@ -53,6 +99,8 @@ class SiteService:
                 print("Installing Playwright browsers...")
                 subprocess.run(["playwright", "install", "chromium"], check=True)
                 print("Playwright browsers installed successfully.")
+            # Only checked once per process now that browsers are pooled
+            SiteService._browsers_installed = True
             return True
         except subprocess.CalledProcessError as e:
             print(f"Error installing Playwright browsers: {str(e)}")
@@ -61,66 +109,166 @@ class SiteService:
             print(f"Unexpected error when checking/installing Playwright browsers: {str(e)}")
             return False
     
-    async def capture_screenshot_async(self, url):
+    async def _screenshot_page(self, page, url):
         """
-        Capture a screenshot of the given URL using Playwright
-        Returns a base64 encoded image
+        Navigate a pooled page to the URL and return the full-page PNG bytes
         """
-        try:
-            # Ensure browsers are installed before launching
-            if not self._ensure_playwright_browsers_installed():
-                return {
-                    'status': 'error',
-                    'error': 'Failed to install Playwright browsers',
-                    'timestamp': datetime.utcnow().isoformat()
-                }
-                
-            async with async_playwright() as p:
-                browser = await p.chromium.launch()
-                context = await browser.new_context(
-                    viewport={'width': 1280, 'height': 800}
-                )
-                page = await context.new_page()
-                
-                # Navigate to the URL with timeout of 30 seconds
-                await page.goto(url, wait_until='networkidle', timeout=30000)
-                
-                # Wait a bit for any lazy-loaded content
-                await asyncio.sleep(2)
-                
-                # Take a screenshot
-                screenshot_bytes = await page.screenshot(full_page=True)
-                
-                # Convert screenshot to base64 for easier transport/storage
-                screenshot_base64 = base64.b64encode(screenshot_bytes).decode('utf-8')
+        # Navigate to the URL with timeout of 30 seconds
+        await page.goto(url, wait_until='networkidle', timeout=30000)
+        
+        # Wait a bit for any lazy-loaded content
+        await asyncio.sleep(2)
+        
+        # Take a screenshot
+        return await page.screenshot(full_page=True)
+    
+    def capture_screenshot(self, url):
+        """
+        Capture a screenshot of the given URL on a page borrowed from the
+        shared browser pool. The result carries the raw PNG bytes; callers
+        that return it as JSON encode it themselves
+        """
+        with span('screenshot') as screenshot_span:
+            try:
+                # Ensure browsers are installed before launching
+                if not self._ensure_playwright_browsers_installed():
+                    screenshot_span.outcome = 'error'
+                    return {
+                        'status': 'error',
+                        'error': 'Failed to install Playwright browsers',
+                        'timestamp': datetime.utcnow().isoformat()
+                    }
                 
-                await browser.close()
+                pool = get_browser_pool(context_options={'viewport': self.viewport})
+                screenshot_bytes = pool.run(lambda page: self._screenshot_page(page, url))
+                screenshot_span.bytes = len(screenshot_bytes)
                 
                 return {
                     'status': 'success',
-                    'screenshot': screenshot_base64,
+                    'screenshot': screenshot_bytes,
+                    'timestamp': datetime.utcnow().isoformat()
+                }
+            
+            except Exception as e:
+                screenshot_span.outcome = 'error'
+                return {
+                    'status': 'error',
+                    'error': str(e),
                     'timestamp': datetime.utcnow().isoformat()
                 }
+    
+    async def _capture_page_on(self, page, url):
+        """
+        Navigate a pooled page once and collect everything the analysis needs
+        """
+        response = await page.goto(url, wait_until='networkidle', timeout=30000)
+        
+        # Wait a bit for any lazy-loaded content
+        await asyncio.sleep(2)
         
+        # Hash the raw document bytes so it is comparable with fetch_html's
+        content_hash = None
+        if response:
+            try:
+                content_hash = hashlib.sha256(await response.body()).hexdigest()
+            except Exception:
+                # Some responses (e.g. served from the memory cache) have no retrievable body
+                pass
+        
+        return {
+            'html': await page.content(),
+            'content_hash': content_hash,
+            'url': page.url,  # Final URL after any redirects
+            'status_code': response.status if response else None,
+            'headers': await response.all_headers() if response else {},
+            'screenshot': await page.screenshot(full_page=True)
+        }
+    
+    def capture_page(self, url):
+        """
+        Take the rendered HTML, final URL, response headers and screenshot
+        from a single browser navigation
+        
+        Returns:
+            tuple: (html_result, screenshot_result) shaped like the results of
+            fetch_html and capture_screenshot
+        """
+        try:
+            # One navigation yields both, so it is a single span
+            with span('capture_page') as capture_span:
+                if not self._ensure_playwright_browsers_installed():
+                    raise RuntimeError('Failed to install Playwright browsers')
+                
+                pool = get_browser_pool(context_options={'viewport': self.viewport})
+                page_data = pool.run(lambda page: self._capture_page_on(page, url))
+                capture_span.bytes = len(page_data['html'].encode('utf-8')) + len(page_data['screenshot'])
         except Exception as e:
-            return {
+            error = {
                 'status': 'error',
                 'error': str(e),
                 'timestamp': datetime.utcnow().isoformat()
             }
+            return error, dict(error)
+        
+        timestamp = datetime.utcnow().isoformat()
+        status_code = page_data['status_code']
+        if status_code is not None and status_code >= 400:
+            html_result = {
+                'status': 'error',
+                'error': f"{status_code} Error for url: {page_data['url']}",
+                'status_code': status_code,
+                'timestamp': timestamp
+            }
+        else:
+            html_result = {
+                'status': 'success',
+                'html': page_data['html'],
+                'content_hash': page_data['content_hash'],
+                'status_code': status_code,
+                'headers': page_data['headers'],
+                'url': page_data['url'],
+                'source': 'browser',
+                'timestamp': timestamp
+            }
+        screenshot_result = {
+            'status': 'success',
+            'screenshot': page_data['screenshot'],
+            'timestamp': timestamp
+        }
+        return html_result, screenshot_result
     
-    def capture_screenshot(self, url):
-        """
-        Synchronous wrapper for the async screenshot capture function
-        """
-        return asyncio.run(self.capture_screenshot_async(url))
-    
-    def evaluate_site(self, url):
+    def evaluate_site(self, url, mode=None, html_result=None):
         """
         Get both HTML and screenshot for a URL
+        
+        Args:
+            url: Website URL to evaluate
+            mode: 'single', 'parallel' or 'sequential' (defaults to SITE_FETCH_MODE)
+            html_result: A fetch_html result just obtained for the URL (e.g. by
+                a conditional re-evaluation); the HTTP fetch modes use it
+                instead of fetching the page again. Single mode ignores it:
+                it analyzes the HTML rendered by the navigation that takes
+                the screenshot, which a plain HTTP response cannot stand in for
         """
-        html_result = self.fetch_html(url)
-        screenshot_result = self.capture_screenshot(url)
+        mode = mode or SITE_FETCH_MODE
+        
+        if mode == 'single':
+            fetched = html_result
+            html_result, screenshot_result = self.capture_page(url)
+            if html_result['status'] == 'error' and 'status_code' not in html_result:
+                # The navigation itself failed (browser unavailable, timeout);
+                # a plain HTTP fetch still gives the analyzers something to work with
+                html_result = fetched or self.fetch_html(url)
+        elif html_result is not None:
+            screenshot_result = self.capture_screenshot(url)
+        elif mode == 'parallel':
+            # Run the fetch in this thread's context so it joins the evaluation's trace
+            html_future = _fetch_executor.submit(contextvars.copy_context().run, self.fetch_html, url)
+            screenshot_result = self.capture_screenshot(url)
+            html_result = html_future.result()
+        else:
+            html_result = self.fetch_html(url)
+            screenshot_result = self.capture_screenshot(url)
         
         result = {
             'url': url,
@@ -130,3 +278,14 @@ class SiteService:
         }
         
         return result
+    
+    @staticmethod
+    def cache_validators(html_result):
+        """
+        Extract the ETag and Last-Modified validators from a fetch result
+        """
+        headers = {key.lower(): value for key, value in (html_result.get('headers') or {}).items()}
+        return {
+            'etag': headers.get('etag'),
+            'last_modified': headers.get('last-modified')
+        }
@@ -0,0 +1,88 @@
+"""
+Form control counting in AccessibilityService.
+
+Every input, select and textarea on the page is a form control, inside a
+<form> or not, except hidden, submit and reset inputs. A control is labelled
+by an enclosing <label>, a <label for> its id, aria-labelledby, aria-label or
+title, and button and image inputs by their value and alt text.
+"""
+import pytest
+
+from services.accessibility_service import AccessibilityService
+
+URL = 'https://example.com/'
+
+
+def analyze(body):
+    return AccessibilityService().analyze(f'<html lang="en"><body>{body}</body></html>', URL)
+
+
+def form_label_issues(result):
+    return [issue for issue in result['issues'] if issue['rule'] == 'accessibility.form-labels']
+
+
+def test_controls_outside_forms_are_counted():
+    result = analyze('<input type="text" name="q"><select name="s"></select><textarea></textarea>')
+
+    assert result['form_controls'] == 3
+    assert result['form_issue_count'] == 3
+    assert form_label_issues(result)[0]['message'] == "3 form elements are missing associated labels."
+
+
+def test_controls_inside_and_outside_forms_count_alike():
+    inside = analyze('<form><input name="a"></form>')
+    outside = analyze('<input name="a">')
+
+    assert inside['form_controls'] == outside['form_controls'] == 1
+    assert inside['form_issue_count'] == outside['form_issue_count'] == 1
+
+
+@pytest.mark.parametrize('input_type', ['hidden', 'submit', 'reset', ' SUBMIT '])
+def test_inputs_that_need_no_label_are_not_controls(input_type):
+    result = analyze(f'<form><input type="{input_type}" name="x"></form>')
+
+    assert result['form_controls'] == 0
+    assert result['form_issue_count'] == 0
+    assert not form_label_issues(result)
+
+
+@pytest.mark.parametrize('body', [
+    '<label>Name <input name="n"></label>',
+    '<label><span>Name</span><select name="n"></select></label>',
+    '<label for="n">Name</label><input id="n">',
+    '<input id="n"><label for="n">Name</label>',
+    '<span id="caption">Name</span><input aria-labelledby="other caption">',
+    '<input aria-labelledby="caption"><span id="caption">Name</span>',
+    '<input aria-label="Name">',
+    '<textarea title="Comment"></textarea>',
+    '<input type="button" value="Go">',
+    '<input type="image" src="/go.png" alt="Go">',
+])
+def test_labelled_controls(body):
+    result = analyze(body)
+
+    assert result['form_controls'] == 1
+    assert result['form_issue_count'] == 0
+
+
+@pytest.mark.parametrize('body', [
+    '<label>Name</label><input name="n">',
+    '<label for="other">Name</label><input id="n">',
+    '<input aria-labelledby="nowhere">',
+    '<input aria-label="  ">',
+    '<input value="Go">',
+    '<input type="button">',
+    '<input type="image" src="/go.png">',
+])
+def test_unlabelled_controls(body):
+    result = analyze(body)
+
+    assert result['form_controls'] == 1
+    assert result['form_issue_count'] == 1
+
+
+def test_unlabelled_controls_lower_the_score():
+    labelled = analyze('<label>Name <input name="n"></label>')
+    unlabelled = analyze('<input name="n">')
+
+    assert labelled['score'] - unlabelled['score'] == 10
@@ -0,0 +1,106 @@
+"""
+Analyzer output must not change with how the page is walked or scored.
+
+fixtures/analyzer_baseline.json holds the output of the four analyzers
+from before the single-pass tree walk and the rule engine (commit e3140c0),
+for the small and median corpus pages and the pages in fixtures/pages. The
+only intended differences since are AccessibilityService's form label rules
+(see test_accessibility_forms.py), listed in LABEL_RULE_CHANGES.
+"""
+import os
+import json
+
+import pytest
+
+from benchmarks.corpus import load_corpus
+from services.analysis_pool import analyze_document
+from services.html_document import HtmlDocument
+from services.seo_service import SeoService
+from services.mobile_service import MobileService
+from services.performance_service import PerformanceService
+from services.accessibility_service import AccessibilityService
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+URL = 'https://example.com/'
+VOLATILE_FIELDS = ('timestamp', 'execution_time')
+# Fields added since the baseline
+NEW_FIELDS = ('form_controls',)
+FORM_LABELS_MESSAGE = "form elements are missing associated labels."
+
+# Unlabelled form control counts under the current rules, where they differ:
+# hidden and submit inputs no longer need labels, and enclosing labels,
+# aria-labelledby and aria-label name a control
+LABEL_RULE_CHANGES = {
+    'storefront': {'form_issue_count': 0, 'score': 85, 'rating': 'Good'},
+    'signup': {'form_issue_count': 3},
+}
+
+with open(os.path.join(FIXTURES, 'analyzer_baseline.json'), encoding='utf-8') as handle:
+    BASELINE = json.load(handle)
+
+
+def load_pages():
+    pages = {fixture.name: fixture.html for fixture in load_corpus(['small', 'median'])}
+    pages_dir = os.path.join(FIXTURES, 'pages')
+    for filename in sorted(os.listdir(pages_dir)):
+        with open(os.path.join(pages_dir, filename), encoding='utf-8') as handle:
+            pages[filename[:-len('.html')]] = handle.read()
+    return pages
+
+
+PAGES = load_pages()
+
+
+def comparable(result):
+    result = {key: value for key, value in result.items() if key not in VOLATILE_FIELDS + NEW_FIELDS}
+    if 'issues' in result:
+        result['issues'] = [{key: value for key, value in issue.items() if key != 'rule'} for issue in result['issues']]
+    return result
+
+
+def expected(page, stage):
+    result = dict(BASELINE[page][stage])
+    changes = LABEL_RULE_CHANGES.get(page) if stage == 'accessibility' else None
+    if changes:
+        result.update(changes)
+        count = changes['form_issue_count']
+        issues = []
+        for issue in result['issues']:
+            if issue['message'].endswith(FORM_LABELS_MESSAGE):
+                if not count:
+                    continue
+                issue = dict(issue, message=f"{count} {FORM_LABELS_MESSAGE}")
+            issues.append(issue)
+        result['issues'] = issues
+    return result
+
+
+def test_baseline_covers_every_page():
+    assert sorted(BASELINE) == sorted(PAGES)
+
+
+@pytest.mark.parametrize('page', sorted(PAGES))
+def test_analyzers_on_raw_html_match_baseline(page):
+    html = PAGES[page]
+    results = {
+        'seo': SeoService().analyze(html, URL),
+        'mobile': MobileService().analyze(html, None, URL),
+        'performance': PerformanceService().analyze(html, URL),
+        'accessibility': AccessibilityService().analyze(html, URL),
+    }
+    for stage, result in results.items():
+        assert comparable(result) == expected(page, stage), stage
+
+
+@pytest.mark.parametrize('page', sorted(PAGES))
+def test_shared_document_matches_baseline(page):
+    results, _, _ = analyze_document(HtmlDocument(PAGES[page]), URL)
+    for stage, (result, _) in results.items():
+        assert comparable(result) == expected(page, stage), stage
+
+
+def test_issues_name_their_rules():
+    results, _, _ = analyze_document(HtmlDocument(PAGES['article']), URL)
+    for stage, (result, _) in results.items():
+        assert result['issues']
+        assert all(issue['rule'].startswith(f"{stage}.") for issue in result['issues'])
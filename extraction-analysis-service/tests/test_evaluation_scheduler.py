@@ -0,0 +1,115 @@
+"""
+EvaluationScheduler admission: bounded lanes, all-or-none reservations and
+the Retry-After estimate, and the 429 the evaluation routes answer with.
+"""
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from api.controllers.evaluation_controller import register_evaluation_routes
+from utils.evaluation_scheduler import (
+    BATCH, DEFAULT_JOB_SECONDS, INTERACTIVE, EvaluationScheduler, SchedulerSaturated
+)
+
+
+def make_scheduler(max_workers=2, max_queue_depth=1, batch_max_queue_depth=2,
+                   batch_max_concurrency=1, batch_per_host_concurrency=1):
+    return EvaluationScheduler(max_workers, max_queue_depth, batch_max_queue_depth,
+                               batch_max_concurrency, batch_per_host_concurrency)
+
+
+def test_full_lane_rejects_with_retry_after():
+    scheduler = make_scheduler()
+    scheduler.reserve(INTERACTIVE)
+
+    with pytest.raises(SchedulerSaturated) as excinfo:
+        scheduler.reserve(INTERACTIVE)
+
+    error = excinfo.value
+    assert error.lane == INTERACTIVE
+    # Nothing has finished yet: 2 workers at DEFAULT_JOB_SECONDS each drain
+    # the one excess job in 7.5 seconds
+    assert DEFAULT_JOB_SECONDS == 15
+    assert error.retry_after == 8
+    assert scheduler.stats()['lanes'][INTERACTIVE]['rejected'] == 1
+
+
+def test_batch_reservations_are_all_or_none():
+    scheduler = make_scheduler()
+
+    with pytest.raises(SchedulerSaturated) as excinfo:
+        scheduler.reserve(BATCH, 3)
+
+    # Batch jobs get one of the two workers, so one excess job takes 15 seconds
+    assert excinfo.value.lane == BATCH
+    assert excinfo.value.retry_after == 15
+    assert scheduler.stats()['lanes'][BATCH]['reserved'] == 0
+    scheduler.reserve(BATCH, 2)
+    assert scheduler.stats()['lanes'][BATCH]['reserved'] == 2
+
+
+def test_cancelled_reservation_frees_its_slots():
+    scheduler = make_scheduler()
+    reservation = scheduler.reserve(INTERACTIVE)
+    reservation.cancel()
+
+    scheduler.reserve(INTERACTIVE)
+
+
+def test_retry_after_is_clamped():
+    scheduler = make_scheduler(batch_max_queue_depth=0)
+
+    with pytest.raises(SchedulerSaturated) as excinfo:
+        scheduler.reserve(BATCH, 10000)
+
+    assert excinfo.value.retry_after == 3600
+
+
+def test_retry_after_follows_observed_job_time():
+    scheduler = make_scheduler()
+    done = threading.Event()
+    scheduler.reserve(INTERACTIVE).submit('user', 'example.com', done.set)
+    assert done.wait(5)
+    # The job time is recorded before the worker is handed back
+    deadline = time.monotonic() + 5
+    while scheduler.stats()['active'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    scheduler.reserve(INTERACTIVE)
+    with pytest.raises(SchedulerSaturated) as excinfo:
+        scheduler.reserve(INTERACTIVE)
+
+    # A job that takes microseconds drains the queue at once
+    assert excinfo.value.retry_after == 1
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.config.update(EVALUATION_DISPATCH='executor', BATCH_MAX_URLS=10)
+    app.scheduler = make_scheduler(max_queue_depth=0, batch_max_queue_depth=0)
+    # Saturated requests are rejected before the database is touched
+    app.db = None
+    register_evaluation_routes(app)
+    return app.test_client()
+
+
+def test_evaluate_answers_429_with_retry_after(client):
+    response = client.post('/api/evaluate', json={'url': 'https://example.com/'})
+
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '8'
+    assert response.json == {
+        'error': 'The interactive evaluation queue is full',
+        'retryAfter': 8,
+    }
+
+
+def test_batch_answers_429_with_retry_after(client):
+    response = client.post('/api/evaluate/batch', json={'urls': ['https://a.example/', 'https://b.example/']})
+
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '30'
+    assert response.json['retryAfter'] == 30
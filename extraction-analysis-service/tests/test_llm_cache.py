@@ -0,0 +1,91 @@
+import io
+import json
+import shutil
+import tempfile
+import unittest
+
+from PIL import Image
+
+from services.accessibility_service import AccessibilityService
+from services.html_document import HtmlDocument
+from services.llm_service import LLMService
+from services.mobile_service import MobileService
+from services.performance_service import PerformanceService
+from services.seo_service import SeoService
+from utils.llm_cache import FileSystemLLMCache
+
+PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head><title>Cache test</title><meta name="viewport" content="width=device-width"></head>
+<body><header><nav><a href="/">Home</a></nav></header>
+<main><h1>Cache test</h1><p>Some text</p><img src="a.png"><input type="text"></main>
+</body></html>"""
+
+
+class FakeResponse:
+    text = json.dumps({"summary": "ok", "recommendations": [], "snippets": {}})
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = 0
+
+    async def generate_content_async(self, parts, generation_config=None):
+        self.calls += 1
+        return FakeResponse()
+
+
+def screenshot_bytes():
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), 'white').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class LLMCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.cache = FileSystemLLMCache(self.root)
+        self.service = LLMService.__new__(LLMService)
+        self.service.model_name = 'test-model'
+        self.service.model = FakeModel()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def evaluate(self, url, screenshot):
+        """Analyze the page from scratch and ask for its LLM report"""
+        document = HtmlDocument(PAGE)
+        analyses = [
+            SeoService().analyze(document, url),
+            MobileService().analyze(document, screenshot, url),
+            PerformanceService().analyze(document, url),
+            AccessibilityService().analyze(document, url),
+        ]
+        return self.service.analyze(PAGE, screenshot, url, *analyses, cache=self.cache)
+
+    def test_same_page_twice_hits_cache(self):
+        url = 'https://example.com/'
+        screenshot = screenshot_bytes()
+
+        first = self.evaluate(url, screenshot)
+        second = self.evaluate(url, screenshot)
+
+        self.assertFalse(first["cache"]["hit"])
+        self.assertTrue(second["cache"]["hit"])
+        self.assertEqual(first["cache"]["key"], second["cache"]["key"])
+        self.assertEqual(self.service.model.calls, 1)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_changed_page_misses_cache(self):
+        screenshot = screenshot_bytes()
+
+        first = self.evaluate('https://example.com/', screenshot)
+        second = self.evaluate('https://example.com/other', screenshot)
+
+        self.assertNotEqual(first["cache"]["key"], second["cache"]["key"])
+        self.assertEqual(self.service.model.calls, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
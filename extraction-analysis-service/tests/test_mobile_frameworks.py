@@ -0,0 +1,81 @@
+"""
+Responsive framework detection in MobileService.
+
+Framework signatures are matched in the page source with SignatureMatcher,
+and class signatures also against class attribute values as the parser
+serializes them, so detection does not depend on how the markup is quoted.
+"""
+import random
+
+import pytest
+
+from services.mobile_service import FRAMEWORK_MATCHER, MobileService, SignatureMatcher
+
+URL = 'https://example.com/'
+
+
+def uses_framework(body, head=''):
+    html = f'<html><head>{head}</head><body>{body}</body></html>'
+    return MobileService().analyze(html, None, URL)['uses_responsive_framework']
+
+
+def test_signature_matcher_finds_each_signature():
+    matcher = SignatureMatcher(['class="row"', 'class="col', 'bootstrap.css'], ('class="', '.css'))
+
+    assert matcher.search('<div class="col-md-6">') == 'class="col'
+    assert matcher.search('<div class="row">') == 'class="row"'
+    assert matcher.search('<link href="/bootstrap.css">') == 'bootstrap.css'
+    assert matcher.search('<div class="rowdy"><link href="/site.css">') is None
+    assert matcher.search('') is None
+
+
+def test_signature_matcher_requires_an_anchor():
+    with pytest.raises(ValueError):
+        SignatureMatcher(['container'], ('class="', '.css'))
+
+
+def test_signature_matcher_agrees_with_substring_search():
+    signatures = ['class="row"', 'class="col', 'class="sm:', 'bootstrap.css', 'bulma.min.css']
+    matcher = SignatureMatcher(signatures, ('class="', '.css'))
+    pieces = ['class="', 'row', 'col', 'sm:', '"', '.css', 'bootstrap', 'bulma.min', 'x', ' ', '<div ']
+    generator = random.Random(23)
+    for _ in range(2000):
+        text = ''.join(generator.choice(pieces) for _ in range(generator.randint(0, 12)))
+        found = matcher.search(text)
+        if any(signature in text for signature in signatures):
+            assert found in signatures and found in text, text
+        else:
+            assert found is None, text
+
+
+@pytest.mark.parametrize('head, body', [
+    ('<link rel="stylesheet" href="/css/bootstrap.min.css">', ''),
+    ('<link rel="stylesheet" href="/foundation.css">', ''),
+    ('', '<div class="container"></div>'),
+    ('', '<div class="col-md-6"></div>'),
+    ('', '<div class="md:flex"></div>'),
+    ('', '<div class="columns"></div>'),
+    # Class values normalized by the parser
+    ('', "<div class='row'></div>"),
+    ('', '<div class=row></div>'),
+    ('', '<div class="col-sm-4\n  col-md-6"></div>'),
+    # Class attributes in templates are only visible in the source
+    ('', '<script type="text/template"><div class="row"></div></script>'),
+])
+def test_frameworks_detected(head, body):
+    assert uses_framework(body, head)
+
+
+@pytest.mark.parametrize('head, body', [
+    ('<link rel="stylesheet" href="/site.css">', ''),
+    ('', '<div class="rowdy"></div>'),
+    ('', '<div class="main container"></div>'),
+    ('', '<p>Bootstrap and Tailwind are both popular.</p>'),
+])
+def test_no_framework_detected(head, body):
+    assert not uses_framework(body, head)
+
+
+def test_framework_matcher_covers_every_framework():
+    for stylesheet in ('bootstrap.css', 'foundation.css', 'tailwind.css', 'bulma.css', 'materialize.css'):
+        assert FRAMEWORK_MATCHER.search(f'<link href="/{stylesheet}">') == stylesheet
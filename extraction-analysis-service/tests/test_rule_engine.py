@@ -0,0 +1,148 @@
+"""
+Rule engine: profiles choosing and reweighting rules, element checks run in
+the shared walk, and profiles loaded from RULE_PROFILES_PATH.
+"""
+import json
+
+import pytest
+from bs4 import BeautifulSoup
+
+from services import rule_engine
+from services.dom_walker import DomWalker
+from services.html_document import HtmlDocument
+from services.rule_engine import ElementCheck, Rule, RuleProfile, RuleSet, get_rule_set
+from services.seo_service import SeoService
+
+LINKS_WITHOUT_REL = ElementCheck(
+    'test-links-without-rel', ('a', 'link'), ('rel',), lambda attributes: not attributes['rel']
+)
+
+RULES = [
+    Rule('test.title', 'test', 'high', 20, "Title missing", lambda v: not v['title']),
+    Rule('test.words', 'test', 'low', 5, "{words} short words", lambda v: v['words'] > 0,
+         scale='words', max_weight=12),
+    Rule('test.links', 'test', 'medium', 10, "{count} of {total} links have no rel",
+         lambda v: v['count'] > 0, elements=LINKS_WITHOUT_REL),
+    Rule('test.optional', 'test', 'low', 50, "Optional check", lambda v: True, enabled=False),
+    Rule('other.check', 'other', 'low', 1, "Other analyzer", lambda v: True),
+]
+
+VALUES = {'title': None, 'words': 2}
+HTML = '<a href="/a">a</a><a href="/b" rel="nofollow">b</a><a href="/c" rel="">c</a><link href="/x.css">'
+
+
+def evaluate(profile, values=VALUES, html=HTML):
+    rule_set = RuleSet(profile, RULES)
+    facts, = DomWalker([rule_set.collector()]).walk(BeautifulSoup(html, 'html.parser'))
+    return rule_set.evaluate('test', values, facts)
+
+
+def test_default_profile_runs_enabled_rules():
+    issues, score = evaluate(RuleProfile('default'))
+
+    assert issues == [
+        {'severity': 'high', 'message': "Title missing", 'rule': 'test.title'},
+        {'severity': 'low', 'message': "2 short words", 'rule': 'test.words'},
+        {'severity': 'medium', 'message': "3 of 4 links have no rel", 'rule': 'test.links'},
+    ]
+    assert score == 100 - 20 - 10 - 10
+
+
+def test_scaled_deduction_is_capped():
+    _, score = evaluate(RuleProfile('default'), {'title': 'Home', 'words': 5})
+
+    assert score == 100 - 12 - 10
+
+
+def test_score_is_clamped_at_zero():
+    _, score = evaluate(RuleProfile('heavy', weights={'test.title': 500}))
+
+    assert score == 0
+
+
+def test_profile_disables_rules_by_pattern():
+    issues, score = evaluate(RuleProfile('lenient', disable=['test.w*', 'test.links']))
+
+    assert [issue['rule'] for issue in issues] == ['test.title']
+    assert score == 80
+
+
+def test_profile_enables_rules_registered_disabled():
+    issues, score = evaluate(RuleProfile('strict', enable=['test.optional']))
+
+    assert issues[-1] == {'severity': 'low', 'message': "Optional check", 'rule': 'test.optional'}
+    assert score == 100 - 20 - 10 - 10 - 50
+
+
+def test_disable_wins_over_enable():
+    issues, _ = evaluate(RuleProfile('both', enable=['test.*'], disable=['test.optional']))
+
+    assert 'test.optional' not in [issue['rule'] for issue in issues]
+
+
+def test_profile_overrides_weights_and_severities():
+    issues, score = evaluate(RuleProfile(
+        'custom', weights={'test.*': 1}, severities={'test.title': 'low'}
+    ))
+
+    assert issues[0]['severity'] == 'low'
+    assert score == 100 - 1 - 2 - 1
+
+
+def test_element_checks_skip_disabled_rules():
+    rule_set = RuleSet(RuleProfile('lenient', disable=['test.links']), RULES)
+
+    assert rule_set.checks == {}
+    assert rule_set.collector().tags == ()
+
+
+def test_unknown_profile_raises_value_error():
+    with pytest.raises(ValueError, match="Unknown rule profile: nope"):
+        get_rule_set('nope')
+
+
+def test_duplicate_rule_ids_are_rejected():
+    existing = rule_engine.registered_rules()[0]
+
+    with pytest.raises(ValueError):
+        rule_engine.register_rule(Rule(existing.id, existing.analyzer, 'low', 1, "Duplicate", lambda v: True))
+
+
+@pytest.fixture
+def profiles_file(tmp_path, monkeypatch):
+    path = tmp_path / 'rule_profiles.json'
+    monkeypatch.setattr(rule_engine, 'RULE_PROFILES_PATH', str(path))
+    monkeypatch.setattr(rule_engine, '_profiles', None)
+    monkeypatch.setattr(rule_engine, '_rule_sets', {})
+    return path
+
+
+def test_profiles_file_is_loaded(profiles_file):
+    profiles_file.write_text(json.dumps({
+        'lenient': {'disable': ['seo.canonical-*'], 'severities': {'seo.*': 'low'}}
+    }))
+
+    assert sorted(rule_engine.get_rule_profiles()) == ['default', 'lenient']
+    rule_set = get_rule_set('lenient')
+    assert rule_set.rules['seo']
+    assert not [rule for rule, _, _ in rule_set.rules['seo'] if rule.id.startswith('seo.canonical-')]
+    assert {severity for _, severity, _ in rule_set.rules['seo']} == {'low'}
+
+
+def test_invalid_profile_in_file_raises_value_error(profiles_file):
+    profiles_file.write_text(json.dumps({'broken': {'disabled': ['seo.*']}}))
+
+    with pytest.raises(ValueError, match="Invalid rule profile broken"):
+        rule_engine.get_rule_profiles()
+
+
+def test_document_scores_with_its_profile(profiles_file):
+    profiles_file.write_text(json.dumps({'no-title-check': {'disable': ['seo.title-missing']}}))
+    html = '<html><body><h1>Page</h1></body></html>'
+
+    default = SeoService().analyze(HtmlDocument(html), 'https://example.com/')
+    profiled = SeoService().analyze(HtmlDocument(html, rule_profile='no-title-check'), 'https://example.com/')
+
+    assert 'seo.title-missing' in [issue['rule'] for issue in default['issues']]
+    assert 'seo.title-missing' not in [issue['rule'] for issue in profiled['issues']]
+    assert profiled['score'] > default['score']
@@ -0,0 +1,219 @@
+import os
+import io
+import zlib
+import hashlib
+import threading
+import gridfs
+from dotenv import load_dotenv
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+load_dotenv()
+
+BLOB_STORE = os.getenv("BLOB_STORE", "gridfs")  # gridfs | filesystem
+BLOB_STORE_PATH = os.getenv("BLOB_STORE_PATH", "blobs")
+BLOB_ZSTD_LEVEL = int(os.getenv("BLOB_ZSTD_LEVEL", 10))
+SCREENSHOT_FORMAT = os.getenv("SCREENSHOT_FORMAT", "WEBP").upper()  # WEBP | JPEG | PNG
+SCREENSHOT_QUALITY = int(os.getenv("SCREENSHOT_QUALITY", 80))
+
+# WebP cannot encode images taller or wider than this
+WEBP_MAX_DIMENSION = 16383
+
+HTML_CONTENT_TYPE = 'text/html; charset=utf-8'
+_CONTENT_TYPES = {
+    'WEBP': ('image/webp', 'webp'),
+    'JPEG': ('image/jpeg', 'jpg'),
+    'PNG': ('image/png', 'png'),
+}
+
+
+def _compress(data):
+    """Compress with zstd when available, zlib otherwise"""
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=BLOB_ZSTD_LEVEL).compress(data), 'zstd'
+    return zlib.compress(data, 6), 'zlib'
+
+
+def _decompress(data, encoding):
+    if encoding == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(data)
+    if encoding == 'zlib':
+        return zlib.decompress(data)
+    return data
+
+
+def _encode_screenshot(png_bytes):
+    """
+    Re-encode a PNG screenshot to the configured format
+
+    Returns:
+        tuple: (encoded bytes, image format name)
+    """
+    if Image is None or SCREENSHOT_FORMAT == 'PNG':
+        return png_bytes, 'PNG'
+    with Image.open(io.BytesIO(png_bytes)) as image:
+        image_format = SCREENSHOT_FORMAT
+        if image_format == 'WEBP' and max(image.size) > WEBP_MAX_DIMENSION:
+            # Very long full-page captures do not fit in WebP
+            image_format = 'JPEG'
+        if image_format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        output = io.BytesIO()
+        image.save(output, format=image_format, quality=SCREENSHOT_QUALITY)
+    encoded = output.getvalue()
+    # Flat, mostly blank pages can compress better as the original PNG
+    if len(encoded) >= len(png_bytes):
+        return png_bytes, 'PNG'
+    return encoded, image_format
+
+
+class BlobStore:
+    """
+    Content-addressed storage for large evaluation payloads.
+
+    Blobs are keyed by the SHA-256 of the original content plus the stored
+    format, so identical HTML or screenshots across evaluations are written
+    once. Evaluations keep only the small reference returned by the store_*
+    methods.
+    """
+
+    name = None
+
+    def stored_size(self, key):
+        """Return the stored size of a blob, or None if it does not exist"""
+        raise NotImplementedError
+
+    def put_bytes(self, key, data):
+        raise NotImplementedError
+
+    def get_bytes(self, key):
+        raise NotImplementedError
+
+    def _put(self, key, data, size, content_type, encoding=None):
+        if self.stored_size(key) is None:
+            self.put_bytes(key, data)
+        return self._ref(key, content_type, encoding, size, len(data))
+
+    def _ref(self, key, content_type, encoding, size, stored_size):
+        return {
+            "key": key,
+            "sha256": key.split('.', 1)[0],
+            "store": self.name,
+            "content_type": content_type,
+            "encoding": encoding,
+            "size": size,
+            "stored_size": stored_size
+        }
+
+    def store_html(self, html):
+        """Compress and store page HTML, returning its reference"""
+        raw = html.encode('utf-8')
+        digest = hashlib.sha256(raw).hexdigest()
+        encoding = 'zstd' if zstandard is not None else 'zlib'
+        key = f"{digest}.html.{encoding}"
+        stored_size = self.stored_size(key)
+        if stored_size is not None:
+            return self._ref(key, HTML_CONTENT_TYPE, encoding, len(raw), stored_size)
+        compressed, encoding = _compress(raw)
+        return self._put(key, compressed, len(raw), HTML_CONTENT_TYPE, encoding)
+
+    def load_html(self, ref):
+        """Return the HTML string for a reference created by store_html"""
+        return _decompress(self.get_bytes(ref['key']), ref.get('encoding')).decode('utf-8')
+
+    def store_screenshot(self, png_bytes):
+        """Re-encode and store PNG screenshot bytes, returning its reference"""
+        digest = hashlib.sha256(png_bytes).hexdigest()
+        # Skip the re-encode entirely when this screenshot is already stored
+        for image_format in dict.fromkeys((SCREENSHOT_FORMAT, 'JPEG', 'PNG')):
+            if image_format in _CONTENT_TYPES:
+                content_type, extension = _CONTENT_TYPES[image_format]
+                key = f"{digest}.{extension}"
+                stored_size = self.stored_size(key)
+                if stored_size is not None:
+                    return self._ref(key, content_type, None, len(png_bytes), stored_size)
+        encoded, image_format = _encode_screenshot(png_bytes)
+        content_type, extension = _CONTENT_TYPES[image_format]
+        return self._put(f"{digest}.{extension}", encoded, len(png_bytes), content_type)
+
+    def load_screenshot(self, ref):
+        """Return the stored image bytes for a reference created by store_screenshot"""
+        return self.get_bytes(ref['key'])
+
+
+class GridFSBlobStore(BlobStore):
+    """Blob store backed by a GridFS bucket in the evaluations database"""
+
+    name = 'gridfs'
+
+    def __init__(self, db, collection='blobs'):
+        self.fs = gridfs.GridFS(db, collection=collection)
+
+    def stored_size(self, key):
+        grid_out = self.fs.find_one({"_id": key})
+        return grid_out.length if grid_out is not None else None
+
+    def put_bytes(self, key, data):
+        try:
+            self.fs.put(data, _id=key)
+        except gridfs.errors.FileExists:
+            # Another evaluation stored the same content first
+            pass
+
+    def get_bytes(self, key):
+        return self.fs.get(key).read()
+
+
+class FileSystemBlobStore(BlobStore):
+    """Blob store backed by a local directory, sharded by key prefix"""
+
+    name = 'filesystem'
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def stored_size(self, key):
+        try:
+            return os.path.getsize(self._path(key))
+        except OSError:
+            return None
+
+    def put_bytes(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a partial blob
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get_bytes(self, key):
+        with open(self._path(key), 'rb') as f:
+            return f.read()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_blob_store(db):
+    """Return the process-wide blob store configured by BLOB_STORE"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if BLOB_STORE == 'filesystem':
+                _store = FileSystemBlobStore(BLOB_STORE_PATH)
+            else:
+                _store = GridFSBlobStore(db)
+        return _store
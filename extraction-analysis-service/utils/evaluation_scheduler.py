@@ -0,0 +1,270 @@
+import math
+import time
+import threading
+import concurrent.futures
+from collections import OrderedDict, deque
+from utils.metrics import metrics
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+
+# Completions counted when estimating the service rate
+SERVICE_RATE_WINDOW_SECONDS = 60
+# Assumed duration of one evaluation before any has finished
+DEFAULT_JOB_SECONDS = 15
+# Queue waits kept per lane for the percentiles in stats()
+WAIT_SAMPLES = 500
+
+
+class SchedulerSaturated(Exception):
+    """Raised when a lane's queue is full; retry_after is a wait estimate in seconds"""
+
+    def __init__(self, lane, retry_after):
+        super().__init__(f"The {lane} evaluation queue is full")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class _Lane:
+    """
+    Pending jobs of one priority, fair across users and, within a user, hosts
+
+    Users are served round-robin and so are each user's hosts, so one user
+    (or one site in a user's portfolio) cannot hold up everyone else.
+    """
+
+    def __init__(self, name, max_depth, max_active=None, per_host=None):
+        self.name = name
+        self.max_depth = max_depth
+        self.max_active = max_active
+        self.per_host = per_host
+        self.pending = OrderedDict()  # user -> OrderedDict(host -> deque of jobs)
+        self.depth = 0
+        self.reserved = 0
+        self.active = 0
+        self.active_by_host = {}
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+        self.rejected = 0
+
+    def push(self, user, host, job):
+        self.pending.setdefault(user, OrderedDict()).setdefault(host, deque()).append(job)
+        self.depth += 1
+
+    def pop(self):
+        """Take the next job the caps allow, or None"""
+        if self.max_active is not None and self.active >= self.max_active:
+            return None
+        for user in list(self.pending):
+            hosts = self.pending[user]
+            for host in list(hosts):
+                if self.per_host is not None and self.active_by_host.get(host, 0) >= self.per_host:
+                    continue
+                queue = hosts.pop(host)
+                job = queue.popleft()
+                if queue:
+                    # Re-append so the host goes to the back of the user's rotation
+                    hosts[host] = queue
+                # ...and the user to the back of the lane's rotation
+                del self.pending[user]
+                if hosts:
+                    self.pending[user] = hosts
+                self.depth -= 1
+                self.active += 1
+                self.active_by_host[host] = self.active_by_host.get(host, 0) + 1
+                return job
+        return None
+
+    def finish(self, host):
+        self.active -= 1
+        remaining = self.active_by_host[host] - 1
+        if remaining:
+            self.active_by_host[host] = remaining
+        else:
+            del self.active_by_host[host]
+
+
+class _Job:
+    __slots__ = ('lane', 'host', 'fn', 'args', 'queued_at')
+
+    def __init__(self, lane, host, fn, args):
+        self.lane = lane
+        self.host = host
+        self.fn = fn
+        self.args = args
+        self.queued_at = time.monotonic()
+
+
+class Reservation:
+    """Queue slots admitted by EvaluationScheduler.reserve and not yet submitted"""
+
+    def __init__(self, scheduler, lane, count):
+        self._scheduler = scheduler
+        self._lane = lane
+        self._remaining = count
+
+    def submit(self, user, host, fn, *args):
+        """Queue fn(*args) in one of the reserved slots"""
+        if self._remaining <= 0:
+            raise RuntimeError("Reservation is used up")
+        self._remaining -= 1
+        self._scheduler._enqueue(self._lane, user, host, fn, args)
+
+    def cancel(self):
+        """Give back the slots that were not used"""
+        self._scheduler._release(self._lane, self._remaining)
+        self._remaining = 0
+
+
+class EvaluationScheduler:
+    """
+    Runs in-process evaluations on one worker pool with two priority lanes.
+
+    Interactive jobs always start before batch jobs, and batch jobs never
+    take more than `batch_max_concurrency` of the `max_workers` threads, so
+    single submissions keep a short queue even during large batch runs.
+    Batch jobs additionally respect `batch_per_host_concurrency`. Each lane
+    has a bounded queue: reserve() raises SchedulerSaturated with a
+    Retry-After estimate from the observed completion rate instead of
+    letting the backlog grow without limit. Jobs are started from the
+    completion callback of the job they replace, so no dispatcher thread
+    is needed.
+    """
+
+    def __init__(self, max_workers, max_queue_depth, batch_max_queue_depth,
+                 batch_max_concurrency, batch_per_host_concurrency):
+        self.max_workers = max_workers
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="evaluation"
+        )
+        self._lanes = OrderedDict((
+            (INTERACTIVE, _Lane(INTERACTIVE, max_queue_depth)),
+            (BATCH, _Lane(BATCH, batch_max_queue_depth, batch_max_concurrency, batch_per_host_concurrency)),
+        ))
+        self._active = 0
+        self._completions = deque()
+        self._average_seconds = None
+        self._lock = threading.Lock()
+
+        metrics.gauge('evaluation_queue_depth', 'Evaluations queued per priority lane',
+                      lambda: self._lane_values('depth'), ('lane',))
+        metrics.gauge('evaluations_running', 'Evaluations running per priority lane',
+                      lambda: self._lane_values('active'), ('lane',))
+
+    def reserve(self, lane, count=1):
+        """
+        Admit count jobs to a lane, all or none
+
+        Returns:
+            Reservation: Slots to submit the jobs into
+
+        Raises:
+            SchedulerSaturated: When the lane's queue cannot take them
+        """
+        with self._lock:
+            queue = self._lanes[lane]
+            if queue.depth + queue.reserved + count > queue.max_depth:
+                queue.rejected += 1
+                raise SchedulerSaturated(lane, self._retry_after(queue, count))
+            queue.reserved += count
+        return Reservation(self, lane, count)
+
+    def _enqueue(self, lane, user, host, fn, args):
+        with self._lock:
+            queue = self._lanes[lane]
+            queue.reserved -= 1
+            queue.push(user or '', host or '', _Job(lane, host or '', fn, args))
+        self._pump()
+
+    def _release(self, lane, count):
+        with self._lock:
+            self._lanes[lane].reserved -= count
+
+    def _service_rate(self, now):
+        """Completed jobs per second over the recent window"""
+        while self._completions and self._completions[0] < now - SERVICE_RATE_WINDOW_SECONDS:
+            self._completions.popleft()
+        if len(self._completions) >= 2:
+            span = max(now - self._completions[0], 1.0)
+            return len(self._completions) / span
+        seconds = self._average_seconds or DEFAULT_JOB_SECONDS
+        return self.max_workers / seconds
+
+    def _retry_after(self, queue, count):
+        """Seconds until the lane has drained enough to admit count more jobs"""
+        rate = self._service_rate(time.monotonic())
+        if queue.name == BATCH:
+            # Batch jobs only get their own share of the workers
+            rate *= min(queue.max_active, self.max_workers) / self.max_workers
+        excess = queue.depth + queue.reserved + count - queue.max_depth
+        return max(1, min(3600, math.ceil(excess / rate)))
+
+    def _pump(self):
+        """Start as many queued jobs as there are free workers"""
+        started = []
+        with self._lock:
+            while self._active < self.max_workers:
+                job = None
+                for queue in self._lanes.values():
+                    job = queue.pop()
+                    if job is not None:
+                        break
+                if job is None:
+                    break
+                self._active += 1
+                self._lanes[job.lane].waits.append(time.monotonic() - job.queued_at)
+                started.append(job)
+
+        for job in started:
+            future = self._executor.submit(self._run, job)
+            future.add_done_callback(lambda _, job=job: self._on_done(job))
+
+    def _run(self, job):
+        started = time.monotonic()
+        try:
+            return job.fn(*job.args)
+        except Exception as e:
+            print(f"Error in scheduled evaluation: {str(e)}")
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self._average_seconds = elapsed if self._average_seconds is None else (
+                    0.9 * self._average_seconds + 0.1 * elapsed
+                )
+
+    def _on_done(self, job):
+        with self._lock:
+            self._active -= 1
+            self._lanes[job.lane].finish(job.host)
+            self._completions.append(time.monotonic())
+        self._pump()
+
+    def _lane_values(self, attribute):
+        with self._lock:
+            return [((name,), getattr(queue, attribute)) for name, queue in self._lanes.items()]
+
+    def stats(self):
+        """Queue depth, running jobs and queue wait percentiles per lane"""
+        with self._lock:
+            now = time.monotonic()
+            lanes = {}
+            for name, queue in self._lanes.items():
+                waits = sorted(queue.waits)
+                # The head of each queue is its oldest job
+                oldest = [jobs[0].queued_at for hosts in queue.pending.values() for jobs in hosts.values()]
+                lanes[name] = {
+                    "queued": queue.depth,
+                    "reserved": queue.reserved,
+                    "max_queue_depth": queue.max_depth,
+                    "active": queue.active,
+                    "users_queued": len(queue.pending),
+                    "rejected": queue.rejected,
+                    "oldest_wait_seconds": round(now - min(oldest), 3) if oldest else 0.0,
+                    "wait_p50_seconds": round(waits[len(waits) // 2], 3) if waits else None,
+                    "wait_p95_seconds": round(waits[int(len(waits) * 0.95)], 3) if waits else None,
+                }
+            return {
+                "workers": self.max_workers,
+                "active": self._active,
+                "service_rate_per_minute": round(self._service_rate(now) * 60, 1),
+                "lanes": lanes
+            }
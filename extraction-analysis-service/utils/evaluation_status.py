@@ -0,0 +1,154 @@
+from datetime import datetime
+from utils.event_bus import event_bus
+
+# Analysis stages and the evaluation fields that hold their results
+ANALYSIS_FIELDS = {
+    'seo': 'seo_analysis',
+    'mobile': 'mobile_analysis',
+    'performance': 'performance_analysis',
+    'accessibility': 'accessibility_analysis',
+    'llm': 'llm_analysis',
+}
+
+
+def _status_collection(db):
+    return db.evaluation_status
+
+
+def create_status(db, evaluation_id, url, timestamp):
+    """
+    Create the compact progress record for a new evaluation
+
+    The record lives in its own small collection, so polling clients can
+    learn what is finished without reading the evaluation document.
+    """
+    _status_collection(db).insert_one({
+        "_id": evaluation_id,
+        "url": url,
+        "status": "processing",
+        "stages": {},
+        "analysis_complete": False,
+        "updated_at": timestamp
+    })
+
+
+def create_statuses(db, evaluations):
+    """
+    Create progress records for a batch of newly inserted evaluations
+
+    Args:
+        db: MongoDB database
+        evaluations: Inserted evaluation documents (with _id, url,
+            timestamp and batch_id)
+    """
+    _status_collection(db).insert_many([
+        {
+            "_id": evaluation["_id"],
+            "url": evaluation["url"],
+            "batch_id": evaluation["batch_id"],
+            "status": "processing",
+            "stages": {},
+            "analysis_complete": False,
+            "updated_at": evaluation["timestamp"]
+        }
+        for evaluation in evaluations
+    ], ordered=False)
+
+
+def get_batch_progress(db, batch_id):
+    """
+    Count a batch's evaluations by status with one query on the batch_id index
+
+    Returns:
+        dict: Status -> count, empty if the batch does not exist
+    """
+    counts = _status_collection(db).aggregate([
+        {"$match": {"batch_id": batch_id}},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ])
+    return {entry["_id"]: entry["count"] for entry in counts}
+
+
+def mark_stages_complete(db, evaluation_id, stages, analysis_complete=False):
+    """Record that the given stages have finished and notify event stream subscribers"""
+    now = datetime.utcnow().isoformat()
+    update = {f"stages.{stage}": now for stage in stages}
+    update["updated_at"] = now
+    if analysis_complete:
+        update["status"] = "complete"
+        update["analysis_complete"] = True
+    _status_collection(db).update_one({"_id": evaluation_id}, {"$set": update})
+    event_bus.publish(evaluation_id, {
+        "stages": {stage: now for stage in stages},
+        "status": "complete" if analysis_complete else None
+    })
+
+
+def mark_failed(db, evaluation_id, error):
+    """Record that the evaluation stopped with an error"""
+    _status_collection(db).update_one(
+        {"_id": evaluation_id},
+        {"$set": {
+            "status": "error",
+            "error": error,
+            "analysis_complete": False,
+            "updated_at": datetime.utcnow().isoformat()
+        }}
+    )
+    event_bus.publish(evaluation_id, {"stages": {}, "status": "error", "error": error})
+
+
+def claim_stage_retry(db, evaluation_id, stage, requires=()):
+    """
+    Atomically move a failed evaluation back to processing so one of its
+    stages can be re-run
+
+    Args:
+        db: MongoDB database
+        evaluation_id: ObjectId of the evaluation
+        stage: Stage to re-run
+        requires: Stages that must already be complete
+
+    Returns:
+        bool: False if the evaluation has not failed, the stage already
+            completed, a required stage is missing or another retry
+            claimed it first
+    """
+    query = {"_id": evaluation_id, "status": "error", f"stages.{stage}": {"$exists": False}}
+    query.update({f"stages.{required}": {"$exists": True} for required in requires})
+    result = _status_collection(db).update_one(
+        query,
+        {
+            "$set": {"status": "processing", "updated_at": datetime.utcnow().isoformat()},
+            "$unset": {"error": ""}
+        }
+    )
+    return result.modified_count == 1
+
+
+def get_status(db, evaluation_id):
+    """
+    Return the progress record for an evaluation, or None if it does not exist
+
+    Evaluations created before progress records existed are summarised from
+    the evaluation document, projecting away the page HTML and screenshot.
+    """
+    status = _status_collection(db).find_one({"_id": evaluation_id})
+    if status is not None:
+        return status
+
+    projection = dict.fromkeys(ANALYSIS_FIELDS.values(), 1)
+    projection.update({"url": 1, "analysis_complete": 1, "analysis_error": 1})
+    evaluation = db.evaluations.find_one({"_id": evaluation_id}, projection)
+    if evaluation is None:
+        return None
+
+    return {
+        "_id": evaluation_id,
+        "url": evaluation.get("url"),
+        "status": "error" if evaluation.get("analysis_error") else (
+            "complete" if evaluation.get("analysis_complete") else "processing"
+        ),
+        "stages": {stage: True for stage, field in ANALYSIS_FIELDS.items() if field in evaluation},
+        "analysis_complete": bool(evaluation.get("analysis_complete")),
+    }
@@ -0,0 +1,142 @@
+import os
+import time
+import queue
+import threading
+from pymongo.errors import OperationFailure, PyMongoError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# auto: follow evaluation_status through a change stream when MongoDB supports
+# it (replica sets), on: keep retrying until it does, off: in-process events only
+EVENT_CHANGE_STREAM = os.getenv("EVENT_CHANGE_STREAM", "auto")
+
+
+class EventBus:
+    """
+    In-process pub/sub of evaluation progress keyed by evaluation id.
+
+    Events are dicts of the form
+    {"stages": {stage: completed_at}, "status": "complete" | "error" | None, "error": str}.
+    Every subscriber gets its own queue, so a slow client never holds up
+    the publisher.
+
+    The change stream that relays other processes' progress is started by
+    the first subscription in each process rather than when the app is
+    created: under gunicorn --preload the app is created in the master,
+    whose threads do not survive the fork into the workers.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        # (db, mode) set by relay_changes; the listener runs in _listener_pid
+        self._source = None
+        self._listener_pid = None
+        # Process whose change stream is currently relaying events
+        self._relaying_pid = None
+
+    @property
+    def cross_process(self):
+        """True while a change stream in this process relays other processes' events"""
+        return self._relaying_pid == os.getpid()
+
+    @cross_process.setter
+    def cross_process(self, relaying):
+        self._relaying_pid = os.getpid() if relaying else None
+
+    def relay_changes(self, db, mode=EVENT_CHANGE_STREAM):
+        """Follow db's progress records from each process that subscribes"""
+        self._source = (db, mode)
+
+    def _ensure_listener(self):
+        pid = os.getpid()
+        if self._source is None or self._listener_pid == pid:
+            return
+        with self._lock:
+            if self._listener_pid == pid:
+                return
+            self._listener_pid = pid
+        start_change_stream_listener(*self._source)
+
+    def subscribe(self, evaluation_id):
+        self._ensure_listener()
+        subscription = queue.Queue()
+        with self._lock:
+            self._subscribers.setdefault(str(evaluation_id), set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, evaluation_id, subscription):
+        key = str(evaluation_id)
+        with self._lock:
+            subscribers = self._subscribers.get(key)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[key]
+
+    def publish(self, evaluation_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(str(evaluation_id), ()))
+        for subscription in subscribers:
+            subscription.put_nowait(event)
+
+
+event_bus = EventBus()
+
+
+def _event_from_change(change):
+    """Translate an evaluation_status update into a bus event"""
+    updated = change.get('updateDescription', {}).get('updatedFields', {})
+    stages = {
+        field.split('.', 1)[1]: completed_at
+        for field, completed_at in updated.items()
+        if field.startswith('stages.')
+    }
+    status = updated.get('status')
+    if not stages and status not in ('complete', 'error'):
+        return None
+    return {"stages": stages, "status": status, "error": updated.get('error')}
+
+
+def _follow_change_stream(collection, mode):
+    resume_token = None
+    while True:
+        try:
+            with collection.watch([{"$match": {"operationType": "update"}}], resume_after=resume_token) as stream:
+                event_bus.cross_process = True
+                print("Following evaluation progress through a MongoDB change stream")
+                for change in stream:
+                    resume_token = stream.resume_token
+                    event = _event_from_change(change)
+                    if event is not None:
+                        event_bus.publish(change['documentKey']['_id'], event)
+        except OperationFailure as e:
+            event_bus.cross_process = False
+            if mode == 'auto':
+                # Standalone servers have no change streams; stay in-process
+                print(f"Change streams unavailable, progress events are in-process only: {str(e)}")
+                return
+            print(f"Change stream failed, retrying: {str(e)}")
+        except PyMongoError as e:
+            event_bus.cross_process = False
+            print(f"Change stream interrupted, retrying: {str(e)}")
+        time.sleep(5)
+
+
+def start_change_stream_listener(db, mode=EVENT_CHANGE_STREAM):
+    """
+    Relay progress written by other processes (queue workers, other API
+    workers) into this process's event bus through one change stream
+    """
+    if mode == 'off':
+        return None
+    thread = threading.Thread(
+        target=_follow_change_stream,
+        args=(db.evaluation_status, mode),
+        name="evaluation-change-stream",
+        daemon=True
+    )
+    thread.start()
+    return thread
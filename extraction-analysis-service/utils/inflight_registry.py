@@ -0,0 +1,239 @@
+import os
+import time
+import threading
+import concurrent.futures
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from pymongo.errors import DuplicateKeyError
+from dotenv import load_dotenv
+from utils.evaluation_status import mark_failed
+
+load_dotenv()
+
+COALESCE_REGISTRY = os.getenv("COALESCE_REGISTRY", "memory")  # memory | mongo | off
+# A leader that has not finished within this window is presumed dead and the
+# next submission of the URL takes over its followers
+COALESCE_LEASE_SECONDS = int(os.getenv("COALESCE_LEASE_SECONDS", 600))
+# How often followers of a leader in another process check for its results
+COALESCE_POLL_SECONDS = float(os.getenv("COALESCE_POLL_SECONDS", 2))
+
+
+class InflightRegistry:
+    """
+    Tracks which evaluation is currently running for each normalized URL.
+
+    The first evaluation to join a key becomes its leader and does the work;
+    evaluations joining while it runs become followers and do nothing. When
+    the leader finishes it removes the key and receives the follower ids so
+    it can copy its results to them.
+    """
+
+    def join(self, key, evaluation_id):
+        """
+        Register an evaluation for a key
+
+        Returns:
+            str: None if the caller is the leader, otherwise the leader's id
+        """
+        raise NotImplementedError
+
+    def finish(self, key, evaluation_id):
+        """
+        Release a key held by the given leader
+
+        Returns:
+            list: Follower evaluation ids that attached while it ran
+        """
+        raise NotImplementedError
+
+
+class NullInflightRegistry(InflightRegistry):
+    """Registry used when coalescing is disabled: everyone leads"""
+
+    def join(self, key, evaluation_id):
+        return None
+
+    def finish(self, key, evaluation_id):
+        return []
+
+
+class MemoryInflightRegistry(InflightRegistry):
+    """Coalesces evaluations running in this process"""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def join(self, key, evaluation_id):
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                self._jobs[key] = {"leader": evaluation_id, "followers": []}
+                return None
+            job["followers"].append(evaluation_id)
+            return job["leader"]
+
+    def finish(self, key, evaluation_id):
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or job["leader"] != evaluation_id:
+                return []
+            del self._jobs[key]
+            return job["followers"]
+
+
+class MongoInflightRegistry(InflightRegistry):
+    """
+    Coalesces evaluations across API processes and queue workers.
+
+    Each in-flight URL is one document keyed by the normalized URL, so the
+    unique _id index arbitrates between concurrent leaders.
+    """
+
+    def __init__(self, db, lease_seconds=COALESCE_LEASE_SECONDS):
+        self.collection = db.inflight_evaluations
+        self.lease = timedelta(seconds=lease_seconds)
+
+    def join(self, key, evaluation_id):
+        now = datetime.utcnow()
+        try:
+            self.collection.insert_one({
+                "_id": key,
+                "leader": evaluation_id,
+                "followers": [],
+                "expires_at": now + self.lease
+            })
+            return None
+        except DuplicateKeyError:
+            pass
+
+        job = self.collection.find_one_and_update(
+            {"_id": key, "expires_at": {"$gt": now}},
+            {"$addToSet": {"followers": evaluation_id}},
+            projection={"leader": 1}
+        )
+        if job is not None:
+            return job["leader"]
+
+        # The previous leader's lease ran out; take over the key and its followers
+        job = self.collection.find_one_and_update(
+            {"_id": key, "expires_at": {"$lte": now}},
+            {"$set": {"leader": evaluation_id, "expires_at": now + self.lease}},
+            projection={"_id": 1}
+        )
+        if job is not None:
+            return None
+
+        # The key was released in between; start over as a fresh leader
+        return self.join(key, evaluation_id)
+
+    def finish(self, key, evaluation_id):
+        job = self.collection.find_one_and_delete(
+            {"_id": key, "leader": evaluation_id},
+            projection={"followers": 1}
+        )
+        return job["followers"] if job else []
+
+
+class FollowerWaits:
+    """
+    Futures of follower evaluations that resolve once the leader's outcome
+    has been copied to them.
+
+    A leader in this process resolves its followers right after fanning
+    out. A follower whose leader runs elsewhere (COALESCE_REGISTRY=mongo)
+    is resolved by one thread polling the followers' progress records. If
+    the leader has not fanned out within the lease, the follower is marked
+    failed and its future raises, so a queue worker requeues the message
+    rather than acknowledging an evaluation nobody is working on.
+    """
+
+    def __init__(self, db, lease_seconds=COALESCE_LEASE_SECONDS, poll_seconds=COALESCE_POLL_SECONDS):
+        self.db = db
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self._waits = {}  # follower id -> (future, deadline)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def wait(self, follower_id):
+        """Return a future resolving when follower_id has the leader's outcome"""
+        future = concurrent.futures.Future()
+        with self._lock:
+            self._waits[str(follower_id)] = (future, time.monotonic() + self.lease_seconds)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._poll, name="coalesce-followers", daemon=True)
+                self._thread.start()
+        return future
+
+    def resolve(self, follower_ids, error=None):
+        """Settle the futures of followers waiting in this process"""
+        with self._lock:
+            waits = [self._waits.pop(str(follower_id), None) for follower_id in follower_ids]
+        for wait in waits:
+            if wait is None:
+                continue
+            if error is None:
+                wait[0].set_result(None)
+            else:
+                wait[0].set_exception(error)
+
+    def _poll(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            with self._lock:
+                if not self._waits:
+                    self._thread = None
+                    return
+                waits = dict(self._waits)
+            try:
+                settled = {
+                    str(status["_id"]) for status in self.db.evaluation_status.find(
+                        {
+                            "_id": {"$in": [ObjectId(follower_id) for follower_id in waits]},
+                            "status": {"$in": ["complete", "error"]}
+                        },
+                        {"_id": 1}
+                    )
+                }
+            except Exception as e:
+                print(f"Error checking coalesced evaluations: {str(e)}")
+                continue
+            self.resolve(settled)
+            now = time.monotonic()
+            expired = [
+                follower_id for follower_id, (_, deadline) in waits.items()
+                if follower_id not in settled and deadline <= now
+            ]
+            for follower_id in expired:
+                mark_failed(self.db, ObjectId(follower_id), "Coalesced evaluation did not complete")
+            if expired:
+                self.resolve(expired, RuntimeError("Coalesced evaluation's leader did not finish within its lease"))
+
+
+_registry = None
+_registry_lock = threading.Lock()
+_follower_waits = None
+
+
+def get_inflight_registry(db):
+    """Return the process-wide registry configured by COALESCE_REGISTRY"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            if COALESCE_REGISTRY == 'mongo':
+                _registry = MongoInflightRegistry(db)
+            elif COALESCE_REGISTRY == 'off':
+                _registry = NullInflightRegistry()
+            else:
+                _registry = MemoryInflightRegistry()
+        return _registry
+
+
+def get_follower_waits(db):
+    """Return the process-wide FollowerWaits"""
+    global _follower_waits
+    with _registry_lock:
+        if _follower_waits is None:
+            _follower_waits = FollowerWaits(db)
+        return _follower_waits
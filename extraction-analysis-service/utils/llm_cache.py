@@ -0,0 +1,276 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_CACHE = os.getenv("LLM_CACHE", "mongo")  # mongo | filesystem | off
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache")
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 60 * 60))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# Eviction frees space down to this fraction of the size limit, so a full
+# cache is not trimmed again on the very next store
+EVICT_TO_FRACTION = 0.9
+
+# Keys that differ between otherwise identical analyses
+_VOLATILE_KEYS = ('timestamp', 'execution_time')
+
+
+def _stable(value):
+    """Drop volatile keys recursively so equal analyses hash equally"""
+    if isinstance(value, dict):
+        return {k: _stable(v) for k, v in value.items() if k not in _VOLATILE_KEYS}
+    if isinstance(value, (list, tuple)):
+        return [_stable(v) for v in value]
+    return value
+
+
+def llm_cache_key(model_name, prompt_version, url, condensed_html, analyses, screenshot_bytes):
+    """
+    Hash everything that determines an LLM report
+
+    Args:
+        model_name: Model the prompt is sent to
+        prompt_version: Version of the prompt template
+        url: Page URL (it appears in the prompt)
+        condensed_html: Condensed page HTML sent in the prompt
+        analyses: Analyzer results sent in the prompt
+        screenshot_bytes: Screenshot image bytes
+
+    Returns:
+        str: Hex SHA-256 cache key
+    """
+    payload = json.dumps({
+        "model": model_name,
+        "prompt_version": prompt_version,
+        "url": url,
+        "html": condensed_html,
+        "analyses": _stable(analyses),
+        "screenshot": hashlib.sha256(screenshot_bytes or b'').hexdigest()
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """
+    Persistent cache of LLM reports with a TTL and a total size limit.
+
+    Subclasses implement _load/_store/_evict; hit and miss counters are
+    kept per process.
+    """
+
+    name = None
+
+    def __init__(self, ttl_seconds=LLM_CACHE_TTL_SECONDS, max_bytes=LLM_CACHE_MAX_BYTES):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached report for key, or None"""
+        try:
+            report = self._load(key)
+        except Exception as e:
+            print(f"Error reading LLM cache: {str(e)}")
+            report = None
+        with self._lock:
+            if report is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return report
+
+    def put(self, key, report):
+        """Store a report; failures are logged, never raised"""
+        try:
+            body = json.dumps(report, default=str)
+            self._store(key, body)
+            self._evict()
+        except Exception as e:
+            print(f"Error writing LLM cache: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "store": self.name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "ttl_seconds": self.ttl_seconds,
+                "max_bytes": self.max_bytes
+            }
+
+    def _load(self, key):
+        raise NotImplementedError
+
+    def _store(self, key, body):
+        raise NotImplementedError
+
+    def _evict(self):
+        raise NotImplementedError
+
+
+class NullLLMCache(LLMCache):
+    """Cache used when LLM_CACHE=off"""
+
+    name = 'off'
+
+    def _load(self, key):
+        return None
+
+    def _store(self, key, body):
+        pass
+
+    def _evict(self):
+        pass
+
+
+class MongoLLMCache(LLMCache):
+    """
+    Cache stored in the llm_cache collection
+
+    Expiry is left to a TTL index; the size limit evicts least recently
+    used entries first.
+
+    The total size is kept in a counter document, incremented on each
+    store, so a put costs one extra single-document update rather than a
+    pass over the collection. Entries the TTL monitor removes and entries
+    replaced in place are not subtracted, which makes the counter an upper
+    bound: only when it passes max_bytes is the exact total summed, and
+    the counter corrected along with the eviction. Eviction goes down to
+    EVICT_TO_FRACTION of max_bytes, so a full cache is summed once per
+    that much newly stored data rather than on every store.
+    """
+
+    name = 'mongo'
+
+    def __init__(self, db, collection='llm_cache', **options):
+        super().__init__(**options)
+        self.collection = db[collection]
+        self.collection.create_index("expires_at", expireAfterSeconds=0)
+        self.collection.create_index("last_used")
+        self.counters = db[f"{collection}_size"]
+        self.counter_id = collection
+
+    def _load(self, key):
+        now = datetime.utcnow()
+        entry = self.collection.find_one_and_update(
+            {"_id": key, "expires_at": {"$gt": now}},
+            {"$set": {"last_used": now}},
+            projection={"body": 1}
+        )
+        return json.loads(entry["body"]) if entry else None
+
+    def _store(self, key, body):
+        now = datetime.utcnow()
+        self.collection.replace_one(
+            {"_id": key},
+            {
+                "body": body,
+                "size": len(body),
+                "created_at": now,
+                "last_used": now,
+                "expires_at": now + timedelta(seconds=self.ttl_seconds)
+            },
+            upsert=True
+        )
+        self.counters.update_one({"_id": self.counter_id}, {"$inc": {"bytes": len(body)}}, upsert=True)
+
+    def _evict(self):
+        counter = self.counters.find_one({"_id": self.counter_id})
+        estimate = counter["bytes"] if counter else 0
+        if estimate <= self.max_bytes:
+            return
+        totals = list(self.collection.aggregate([{"$group": {"_id": None, "bytes": {"$sum": "$size"}}}]))
+        total = totals[0]["bytes"] if totals else 0
+        excess = total - int(self.max_bytes * EVICT_TO_FRACTION)
+        if total > self.max_bytes:
+            for entry in self.collection.find({}, {"size": 1}).sort("last_used", 1):
+                self.collection.delete_one({"_id": entry["_id"]})
+                total -= entry["size"]
+                excess -= entry["size"]
+                if excess <= 0:
+                    break
+        # Subtract rather than overwrite, keeping concurrent stores' increments
+        self.counters.update_one({"_id": self.counter_id}, {"$inc": {"bytes": total - estimate}})
+
+
+class FileSystemLLMCache(LLMCache):
+    """
+    Cache stored as one JSON file per key
+
+    File modification times track last use, so eviction removes expired
+    and then least recently used files.
+    """
+
+    name = 'filesystem'
+
+    def __init__(self, root, **options):
+        super().__init__(**options)
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.json")
+
+    def _load(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as handle:
+                entry = json.load(handle)
+        except FileNotFoundError:
+            return None
+        if entry["expires_at"] <= time.time():
+            os.remove(path)
+            return None
+        os.utime(path)
+        return json.loads(entry["body"])
+
+    def _store(self, key, body):
+        entry = json.dumps({"expires_at": time.time() + self.ttl_seconds, "body": body})
+        fd, temp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+            handle.write(entry)
+        os.replace(temp_path, self._path(key))
+
+    def _evict(self):
+        now = time.time()
+        files = []
+        for entry in os.scandir(self.root):
+            if entry.name.endswith('.json'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for mtime, size, path in sorted(files):
+            if total <= self.max_bytes and mtime + self.ttl_seconds > now:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache(db):
+    """Return the process-wide LLM cache configured by LLM_CACHE"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            if LLM_CACHE == 'filesystem':
+                _cache = FileSystemLLMCache(LLM_CACHE_PATH)
+            elif LLM_CACHE == 'off':
+                _cache = NullLLMCache()
+            else:
+                _cache = MongoLLMCache(db)
+        return _cache
@@ -1,5 +1,6 @@
 import os
 import json
+import threading
 import pika
 from dotenv import load_dotenv
 
@@ -8,22 +9,84 @@ load_dotenv()
 RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "localhost")
 QUEUE_NAME = os.getenv("EVALUATION_QUEUE", "evaluation_queue")
 
-def publish_evaluation(evaluation_id, url, user_id=None):
-    connection = pika.BlockingConnection(pika.ConnectionParameters(host=RABBITMQ_HOST))
-    channel = connection.channel()
-    channel.queue_declare(queue=QUEUE_NAME, durable=True)
-    
+
+class QueuePublisher:
+    """
+    Publishes evaluation messages over one long-lived connection.
+
+    pika's BlockingConnection is not thread-safe, so publishes from
+    request threads are serialized with a lock. The connection and channel
+    are opened on first use and reopened after any connection error.
+    """
+
+    def __init__(self, host=RABBITMQ_HOST, queue=QUEUE_NAME):
+        self.host = host
+        self.queue = queue
+        self._connection = None
+        self._channel = None
+        self._lock = threading.Lock()
+
+    def _ensure_channel(self):
+        if self._channel is not None and self._channel.is_open and self._connection.is_open:
+            # Service heartbeats that arrived while the connection sat idle
+            self._connection.process_data_events(time_limit=0)
+            return self._channel
+        self._close()
+        self._connection = pika.BlockingConnection(pika.ConnectionParameters(host=self.host))
+        self._channel = self._connection.channel()
+        self._channel.queue_declare(queue=self.queue, durable=True)
+        # Have the broker confirm each message so a publish never silently drops
+        self._channel.confirm_delivery()
+        return self._channel
+
+    def _close(self):
+        try:
+            if self._connection is not None and self._connection.is_open:
+                self._connection.close()
+        except Exception:
+            pass
+        self._connection = None
+        self._channel = None
+
+    def publish(self, message):
+        """Publish a persistent JSON message, reconnecting once on failure"""
+        body = json.dumps(message)
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    self._ensure_channel().basic_publish(
+                        exchange='',
+                        routing_key=self.queue,
+                        body=body,
+                        properties=pika.BasicProperties(
+                            delivery_mode=2,  # Make message persistent
+                            content_type='application/json'
+                        )
+                    )
+                    return
+                except pika.exceptions.AMQPError:
+                    self._close()
+                    if attempt:
+                        raise
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+_publisher = QueuePublisher()
+
+
+def publish_evaluation(evaluation_id, url, user_id=None, force_refresh=False, stage=None, rule_profile=None):
+    """Queue an evaluation; with stage='llm' only that stage is re-run"""
     message = {
         "evaluation_id": evaluation_id,
         "url": url,
-        "user_id": user_id
+        "user_id": user_id,
+        "force_refresh": force_refresh
     }
-    channel.basic_publish(
-        exchange='',
-        routing_key=QUEUE_NAME,
-        body=json.dumps(message),
-        properties=pika.BasicProperties(
-            delivery_mode=2,  # Make message persistent
-        )
-    )
-    connection.close()
\ No newline at end of file
+    if stage:
+        message["stage"] = stage
+    if rule_profile:
+        message["rule_profile"] = rule_profile
+    _publisher.publish(message)
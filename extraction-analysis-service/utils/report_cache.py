@@ -0,0 +1,73 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class CachedReport:
+    """A serialized report kept gzip-compressed with its strong ETag"""
+
+    __slots__ = ('etag', 'body_gzip', 'size')
+
+    def __init__(self, body):
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.body_gzip = gzip.compress(body, compresslevel=6)
+        self.size = len(self.body_gzip)
+
+    def body(self):
+        return gzip.decompress(self.body_gzip)
+
+
+class ReportCache:
+    """
+    Bounded, thread-safe LRU cache of completed reports keyed by evaluation id.
+
+    A completed evaluation never changes, so its serialized report can be
+    served from memory indefinitely; the cache is bounded by the total
+    compressed size of its entries rather than by entry count.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body):
+        """Cache a serialized report (bytes) and return its entry"""
+        entry = CachedReport(body)
+        if entry.size > self.max_bytes:
+            # Too large to cache; still hand back an entry for this response
+            return entry
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+        return entry
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
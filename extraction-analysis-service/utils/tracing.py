@@ -0,0 +1,189 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from pymongo import monitoring
+from utils.metrics import metrics, SIZE_BUCKETS
+
+STAGE_SECONDS = metrics.histogram(
+    'evaluation_stage_duration_seconds',
+    'Duration of evaluation pipeline stages (fetch, screenshot, parse, analyzers, LLM)',
+    ('stage', 'outcome')
+)
+STAGE_BYTES = metrics.histogram(
+    'evaluation_stage_bytes',
+    'Bytes fetched, captured, parsed or sent by evaluation pipeline stages',
+    ('stage',),
+    SIZE_BUCKETS
+)
+MONGO_WRITE_SECONDS = metrics.histogram(
+    'mongo_write_duration_seconds',
+    'Duration of MongoDB write commands',
+    ('command', 'collection', 'outcome')
+)
+
+WRITE_COMMANDS = frozenset(('insert', 'update', 'delete', 'findAndModify'))
+
+# Trace of the evaluation the current thread (or task) is working on
+_current_trace = contextvars.ContextVar('evaluation_trace', default=None)
+
+
+class Span:
+    """What a timed block reports besides its duration; set by the block itself"""
+
+    __slots__ = ('bytes', 'outcome')
+
+    def __init__(self):
+        self.bytes = None
+        self.outcome = 'ok'
+
+
+class Trace:
+    """
+    Stage timing breakdown of one evaluation.
+
+    Spans finished anywhere in the pipeline are collected here, along with
+    the time spent in MongoDB writes made while the trace was active.
+    flush() hands over what finished since the last flush as update
+    operators, so the breakdown rides along with the evaluation writes the
+    pipeline makes anyway instead of costing writes of its own.
+    """
+
+    def __init__(self):
+        self._spans = {}
+        self._unflushed = set()
+        self._mongo_writes = 0
+        self._mongo_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, size=None, outcome='ok'):
+        """Add a finished span; spans of the same name add up (e.g. retries)"""
+        observe(name, seconds, size, outcome)
+        with self._lock:
+            span = self._spans.get(name)
+            if span is None:
+                span = self._spans[name] = {"seconds": 0.0, "count": 0}
+            span["seconds"] = round(span["seconds"] + seconds, 4)
+            span["count"] += 1
+            span["outcome"] = outcome
+            if size is not None:
+                span["bytes"] = span.get("bytes", 0) + size
+            self._unflushed.add(name)
+
+    def add_mongo_write(self, seconds):
+        with self._lock:
+            self._mongo_writes += 1
+            self._mongo_seconds += seconds
+
+    @contextmanager
+    def activate(self):
+        """Attribute spans and Mongo writes in this block to the trace"""
+        token = _current_trace.set(self)
+        try:
+            yield self
+        finally:
+            _current_trace.reset(token)
+
+    def flush(self):
+        """
+        Spans and Mongo write time recorded since the last flush
+
+        Returns:
+            tuple: ($set fields, $inc fields) for the evaluation document
+        """
+        with self._lock:
+            updates = {f"trace.{name}": dict(self._spans[name]) for name in self._unflushed}
+            increments = {}
+            if self._mongo_writes:
+                increments = {
+                    "trace_mongo.writes": self._mongo_writes,
+                    "trace_mongo.seconds": round(self._mongo_seconds, 4)
+                }
+            self._unflushed.clear()
+            self._mongo_writes = 0
+            self._mongo_seconds = 0.0
+        return updates, increments
+
+
+def observe(name, seconds, size=None, outcome='ok'):
+    """Record a stage in the process-wide histograms only"""
+    STAGE_SECONDS.observe(seconds, name, outcome)
+    if size is not None:
+        STAGE_BYTES.observe(size, name)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name):
+    """
+    Time a block on the monotonic clock and record it as a stage
+
+    The block may set span.bytes and span.outcome; an exception escaping
+    it is recorded as outcome 'error'. The span goes to the histograms and
+    to the active evaluation trace, if any.
+    """
+    current = Span()
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException:
+        current.outcome = 'error'
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.record(name, seconds, current.bytes, current.outcome)
+        else:
+            observe(name, seconds, current.bytes, current.outcome)
+
+
+def update_with_trace(update, trace):
+    """Merge a trace's unflushed breakdown into a MongoDB update document"""
+    if trace is None:
+        return update
+    fields, increments = trace.flush()
+    if fields:
+        update.setdefault("$set", {}).update(fields)
+    if increments:
+        update.setdefault("$inc", {}).update(increments)
+    return update
+
+
+class MongoWriteListener(monitoring.CommandListener):
+    """
+    Times MongoDB write commands on the monotonic clock
+
+    pymongo's own command durations come from the wall clock, so the
+    listener keeps its own start time per request. Events are published on
+    the thread running the command, so the trace active there is the
+    evaluation the write belongs to.
+    """
+
+    def __init__(self):
+        self._started = {}
+
+    def started(self, event):
+        if event.command_name in WRITE_COMMANDS:
+            self._started[(event.connection_id, event.request_id)] = (
+                time.perf_counter(), event.command.get(event.command_name), _current_trace.get()
+            )
+
+    def _finish(self, event, outcome):
+        entry = self._started.pop((event.connection_id, event.request_id), None)
+        if entry is None:
+            return
+        started, collection, trace = entry
+        seconds = time.perf_counter() - started
+        MONGO_WRITE_SECONDS.observe(seconds, event.command_name, collection, outcome)
+        if trace is not None:
+            trace.add_mongo_write(seconds)
+
+    def succeeded(self, event):
+        self._finish(event, 'ok')
+
+    def failed(self, event):
+        self._finish(event, 'error')
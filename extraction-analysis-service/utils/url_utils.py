@@ -0,0 +1,29 @@
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url):
+    """
+    Normalize a URL so that equivalent spellings map to the same key
+
+    Lower-cases the scheme and host, drops default ports and fragments,
+    sorts query parameters and gives empty paths a trailing slash.
+
+    Raises:
+        ValueError: If the URL cannot be parsed, e.g. its port is out of range
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if ':' in host:
+        # hostname drops the brackets of IPv6 literals
+        host = f"[{host}]"
+    port = parts.port
+    netloc = host if port is None or _DEFAULT_PORTS.get(scheme) == port else f"{host}:{port}"
+    if parts.username:
+        credentials = parts.username + (f":{parts.password}" if parts.password else '')
+        netloc = f"{credentials}@{netloc}"
+    path = parts.path or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ''))
@@ -0,0 +1,214 @@
+"""
+Standalone evaluation worker.
+
+Consumes evaluation messages from RabbitMQ and runs the analysis pipeline
+outside the API process, so evaluations survive API restarts and workers
+can be scaled across nodes. Run from the service root:
+
+    python worker.py --processes 2 --concurrency 4 --prefetch 4
+"""
+import os
+import json
+import signal
+import argparse
+import functools
+import threading
+import multiprocessing
+import concurrent.futures
+import pika
+from bson.objectid import ObjectId
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "localhost")
+QUEUE_NAME = os.getenv("EVALUATION_QUEUE", "evaluation_queue")
+MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", 1))
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", 4))
+WORKER_PREFETCH = int(os.getenv("WORKER_PREFETCH", WORKER_CONCURRENCY))
+# Port of the first worker process's /metrics endpoint; process N uses port + N (0 disables)
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", 0))
+
+
+class EvaluationWorker:
+    """
+    Consumes EVALUATION_QUEUE in one process.
+
+    Messages are handed to a thread pool of `concurrency` workers and the
+    broker never delivers more than `prefetch` unacknowledged messages. A
+    message is acknowledged only after its results (or its error) have been
+    written to MongoDB; if processing itself blows up it is requeued once
+    and then dropped.
+
+    The LLM stage runs through the LLM gateway after the worker thread is
+    released, so a prefetch above concurrency keeps the threads fetching
+    and analysing while earlier evaluations wait on the LLM.
+    """
+
+    def __init__(self, concurrency, prefetch):
+        # Imported here so each worker process builds its own services,
+        # browser pool and Mongo client after the fork
+        from config.mongodb import init_db
+        from api.services.analysis_service import AnalysisService
+        from services.analysis_pool import get_analysis_pool
+        from utils.metrics import metrics
+
+        self.concurrency = concurrency
+        self.prefetch = prefetch
+        self.db = init_db(MONGODB_URI)
+        self.analysis_service = AnalysisService()
+        # Start the analysis processes before the first message arrives
+        analysis_pool = get_analysis_pool()
+        if analysis_pool is not None:
+            analysis_pool.start()
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="evaluation-worker"
+        )
+        self.connection = None
+        self.channel = None
+        self._stopping = threading.Event()
+        # Evaluations whose worker thread returned but whose LLM stage is pending
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+
+        metrics.gauge('worker_queue_depth', 'Delivered evaluations waiting for a worker thread',
+                      lambda: self.executor._work_queue.qsize())
+        metrics.gauge('worker_llm_pending', 'Evaluations released by their worker thread and waiting on the LLM',
+                      lambda: len(self._pending))
+
+    def _is_already_complete(self, evaluation_id):
+        status = self.db.evaluation_status.find_one(
+            {"_id": ObjectId(evaluation_id)}, {"analysis_complete": 1}
+        )
+        return bool(status and status.get("analysis_complete"))
+
+    def _process(self, message):
+        evaluation_id = message["evaluation_id"]
+        # Redelivered messages for finished evaluations need no work
+        if self._is_already_complete(evaluation_id):
+            return None
+        if message.get("stage") == "llm":
+            return self.analysis_service.retry_llm_stage(evaluation_id, self.db.evaluations)
+        return self.analysis_service.analyze_site_background(
+            message["url"],
+            evaluation_id,
+            message.get("user_id"),
+            self.db.evaluations,
+            message.get("force_refresh", False),
+            message.get("rule_profile")
+        )
+
+    def _on_done(self, delivery_tag, redelivered, future):
+        # Runs on a pool thread; channel calls must happen on the connection's thread
+        error = future.exception()
+        pending = future.result() if error is None else None
+        if isinstance(pending, concurrent.futures.Future):
+            # Acknowledge once the evaluation's LLM stage has been recorded
+            with self._pending_lock:
+                self._pending.add(pending)
+            pending.add_done_callback(functools.partial(self._on_llm_done, delivery_tag, redelivered))
+            return
+        if error is None:
+            callback = functools.partial(self.channel.basic_ack, delivery_tag)
+        else:
+            print(f"Error processing evaluation message: {str(error)}")
+            callback = functools.partial(
+                self.channel.basic_nack, delivery_tag, requeue=not redelivered
+            )
+        self.connection.add_callback_threadsafe(callback)
+
+    def _on_llm_done(self, delivery_tag, redelivered, future):
+        with self._pending_lock:
+            self._pending.discard(future)
+        self._on_done(delivery_tag, redelivered, future)
+
+    def _on_message(self, channel, method, properties, body):
+        try:
+            message = json.loads(body)
+        except (ValueError, TypeError):
+            print(f"Dropping malformed evaluation message: {body!r}")
+            channel.basic_nack(method.delivery_tag, requeue=False)
+            return
+        future = self.executor.submit(self._process, message)
+        future.add_done_callback(
+            functools.partial(self._on_done, method.delivery_tag, method.redelivered)
+        )
+
+    def stop(self, *args):
+        """Stop consuming; in-flight evaluations finish and are acknowledged"""
+        self._stopping.set()
+        if self.connection is not None and self.connection.is_open:
+            self.connection.add_callback_threadsafe(self.channel.stop_consuming)
+
+    def run(self):
+        self.connection = pika.BlockingConnection(pika.ConnectionParameters(host=RABBITMQ_HOST))
+        self.channel = self.connection.channel()
+        self.channel.queue_declare(queue=QUEUE_NAME, durable=True)
+        self.channel.basic_qos(prefetch_count=self.prefetch)
+        self.channel.basic_consume(queue=QUEUE_NAME, on_message_callback=self._on_message)
+        print(f"Worker {os.getpid()} consuming '{QUEUE_NAME}' "
+              f"(concurrency={self.concurrency}, prefetch={self.prefetch})")
+        try:
+            self.channel.start_consuming()
+        finally:
+            # Let in-flight work finish, then flush the acks it scheduled
+            self.executor.shutdown(wait=True)
+            with self._pending_lock:
+                pending = list(self._pending)
+            concurrent.futures.wait(pending)
+            if self.connection.is_open:
+                self.connection.process_data_events(time_limit=1)
+                self.connection.close()
+
+
+def run_worker(concurrency, prefetch, metrics_port=0):
+    worker = EvaluationWorker(concurrency, prefetch)
+    if metrics_port:
+        from utils.metrics import start_metrics_server
+        start_metrics_server(metrics_port)
+        print(f"Worker {os.getpid()} serving metrics on port {metrics_port}")
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=WORKER_PROCESSES, help='Worker processes to start')
+    parser.add_argument('--concurrency', type=int, default=WORKER_CONCURRENCY, help='Evaluations in flight per process')
+    parser.add_argument('--prefetch', type=int, default=WORKER_PREFETCH, help='Unacknowledged messages per process')
+    parser.add_argument('--metrics-port', type=int, default=WORKER_METRICS_PORT,
+                        help='Serve /metrics on this port, +1 for each further process (0 disables)')
+    args = parser.parse_args()
+    # Each worker process runs an analysis pool; size them to share the cores
+    os.environ.setdefault("ANALYSIS_POOLS_PER_HOST", str(max(1, args.processes)))
+
+    if args.processes <= 1:
+        run_worker(args.concurrency, args.prefetch, args.metrics_port)
+        return
+
+    processes = [
+        multiprocessing.Process(
+            target=run_worker,
+            args=(args.concurrency, args.prefetch, args.metrics_port + index if args.metrics_port else 0),
+            name=f"worker-{index}"
+        )
+        for index in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    def forward(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for process in processes:
+        process.join()
+
+
+if __name__ == '__main__':
+    main()